@@ -0,0 +1,8 @@
+# 各页面模块只在被选中时由 airbnb_app 导入，页面所需的重依赖（folium、pyecharts、sklearn 等）随之按需加载
+
+# 数据文件（与应用同目录）
+DATA_FILE = "清洗并聚类后的房源数据.xlsx"
+
+# 共享数据集及其索引（按 (数据文件, 数据版本) 缓存）各自最多保留的份数：
+# 不同会话可能同时查看分区存储中的不同城市与快照，只保留 1 份会使它们相互驱逐、反复重建
+SHARED_CACHE_ENTRIES = 8
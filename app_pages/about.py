@@ -0,0 +1,25 @@
+import streamlit as st
+
+
+def render() -> None:
+    st.header("关于我们")
+    st.markdown("""
+    ### 项目介绍
+    本项目是纽约市Airbnb开放数据的分析与可视化系统，旨在提供深入的数据洞察和决策支持。
+    
+    ### 功能特点
+    - 房源空间分布可视化
+    - 价格特征分析
+    - 用户评价分析
+    - 价格预测模型
+    
+    ### 技术栈
+    - 前端: Streamlit,Folium
+    - 数据处理: Pandas
+    - 机器学习: Scikit-learn, 
+    - 数据可视化: pyecharts
+    
+    """)
+
+    st.info("最后数据更新: 2023年10月")
+    st.info("系统版本: v1.0")
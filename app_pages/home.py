@@ -0,0 +1,62 @@
+import streamlit as st
+
+import dataset_summary
+from app_pages.source import select_data_source
+
+
+def render() -> None:
+    st.header("欢迎使用纽约市Airbnb数据分析系统")
+    st.markdown("""
+    本系统基于纽约市Airbnb开放数据，提供以下功能:
+    
+    - **房源空间分布与社区特征**: 在地图上可视化房源分布，分析不同社区的特征
+    - **价格特征分析**: 分析不同区域、房型的价格分布和趋势
+    - **用户评价与口碑分析**: 探索用户评价数据，了解房源口碑情况
+    
+    ### 数据来源
+    数据来自Inside Airbnb的纽约市开放数据集:
+    [https://insideairbnb.com/get-the-data/](https://insideairbnb.com/get-the-data/)
+    """)
+
+    # 首页指标读取与数据集一同保存的概要，不解析数据文件，也不导入地图等重依赖
+    try:
+        source = select_data_source()
+        summary = dataset_summary.read_summary(source)
+        if summary is None:
+            # 概要缺失或已过期（如旧版本生成的数据）时加载一次数据并补写概要
+            from app_pages.shared import load_shared_data
+
+            with st.spinner('正在加载数据...'):
+                summary = dataset_summary.compute_summary(load_shared_data(source))
+            dataset_summary.write_summary(summary, source)
+
+        # 添加真实数据概览
+        col1, col2 = st.columns(2)
+        with col1:
+            st.subheader("数据概览")
+            st.metric("总房源数", f"{summary['rows']:,}")
+
+            # 平均价格
+            if summary['mean_price'] is not None:
+                st.metric("平均价格", f"${summary['mean_price']:.2f}")
+            else:
+                st.metric("平均价格", "N/A")
+
+            # 平均评分
+            if summary['mean_rating'] is not None:
+                st.metric("平均评分", f"{summary['mean_rating']:.2f}/5")
+            else:
+                st.metric("平均评分", "N/A")
+
+    except Exception as e:
+        # 如果加载失败，显示占位数据
+        col1, col2 = st.columns(2)
+        with col1:
+            st.subheader("数据概览")
+            st.metric("总房源数", "N/A")
+            st.metric("平均价格", "N/A")
+            st.metric("平均评分", "N/A")
+
+    with col2:
+        st.subheader("快速导航")
+        st.info("使用左侧菜单导航到不同功能页面")
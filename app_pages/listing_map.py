@@ -0,0 +1,272 @@
+import streamlit as st
+from streamlit_folium import st_folium
+
+import boundaries
+import dataset_store
+import export
+import instrumentation
+import map_visualization as mv
+from app_pages import DATA_FILE, SHARED_CACHE_ENTRIES
+from app_pages.shared import (
+    _load_shared_data, _load_shared_filter_index, _load_shared_refresh, load_shared_data, load_shared_filter_index,
+)
+from app_pages.source import select_data_source
+from spatial_index import ListingSpatialIndex, build_spatial_index
+
+
+def map_extent(path: str) -> dict:
+    """
+    返回数据文件对应的地图范围：分区存储中的城市使用由数据计算的范围与该城市的边界文件，默认数据文件使用纽约。
+    """
+    extent = dataset_store.partition_extent(path)
+    if extent is None:
+        return {
+            'city': None,
+            'bounds': mv.NYC_BOUNDS,
+            'center': mv.NYC_CENTER,
+            'boundary_path': boundaries.DEFAULT_BOUNDARY_PATH,
+        }
+    return extent
+
+
+@st.cache_resource(max_entries=SHARED_CACHE_ENTRIES, show_spinner=False)
+def _load_shared_heatmap_bins(path: str, version: str) -> mv.HeatmapBins:
+    """
+    与共享数据集配套的热力图预聚合网格，按数据版本缓存；增量刷新后在修补前的网格上只重新计算修补的行。
+    """
+    refreshed = _load_shared_refresh(path, version)
+    if refreshed is not None:
+        base_bins = _load_shared_heatmap_bins(path, mv.base_dataset_version(version))
+        return base_bins.patched(refreshed.df, refreshed.source_positions)
+    # 流水线的 map_bins 阶段预先计算过同一份数据的网格时直接读取
+    df = _load_shared_data(path, version)
+    bounds = map_extent(path)['bounds']
+    bins = mv.read_heatmap_bins(df, path, bounds)
+    return bins if bins is not None else mv.build_heatmap_bins(df, bounds=bounds)
+
+
+def load_shared_heatmap_bins(path: str = DATA_FILE) -> mv.HeatmapBins:
+    """
+    获取共享数据集的热力图预聚合网格。
+    """
+    return _load_shared_heatmap_bins(path, mv.dataset_version(path))
+
+
+@st.cache_resource(max_entries=SHARED_CACHE_ENTRIES, show_spinner=False)
+def _load_shared_spatial_index(path: str, version: str) -> ListingSpatialIndex:
+    """
+    与共享数据集配套的经纬度网格索引，按数据版本缓存。
+    """
+    return build_spatial_index(_load_shared_data(path, version))
+
+
+def load_shared_spatial_index(path: str = DATA_FILE) -> ListingSpatialIndex:
+    """
+    获取共享数据集的经纬度网格索引。
+    """
+    return _load_shared_spatial_index(path, mv.dataset_version(path))
+
+
+# 按筛选条件缓存的热力图个数（每个约数百 KB）
+HEATMAP_CACHE_ENTRIES = 32
+
+
+@st.cache_data(max_entries=HEATMAP_CACHE_ENTRIES, show_spinner=False)
+def _cached_heatmap(
+        path: str,
+        version: str,
+        neighborhood: str,
+        room_type: str,
+        price_range: tuple,
+        cluster_type: str,
+):
+    """
+    按 (数据版本, 筛选条件) 缓存构建好的热力图：重复或恢复到之前的筛选组合时直接取出，不再筛选与重建地图。
+
+    st.cache_data 每次返回一个副本，st_folium 渲染时对地图对象的修改不会影响缓存。
+    """
+    filtered_df = mv.filter_listings(
+        _load_shared_data(path, version),
+        neighborhood=neighborhood,
+        room_type=room_type,
+        price_range=price_range,
+        cluster_type=cluster_type,
+        index=_load_shared_filter_index(path, version),
+    )
+    extent = map_extent(path)
+    return mv.create_nyc_folium_heatmap(
+        filtered_df,
+        title=f"{extent['city']} 房源热力图" if extent['city'] else "纽约房源热力图",
+        bins=_load_shared_heatmap_bins(path, version),
+        center=extent['center'],
+        bounds=extent['bounds'],
+        boundary_path=extent['boundary_path'],
+    )
+
+
+@st.fragment
+def _heatmap_section(source: str, df, filtered_df, filters: tuple, neighborhood_col) -> None:
+    """
+    热力图与点击位置附近的房源。作为独立片段运行：点击地图只重新运行本片段，不会重新执行整个页面。
+    """
+    st.subheader("房源分布热力图")
+    if len(filtered_df) == 0:
+        st.warning("没有找到符合条件的房源数据，无法生成热力图")
+        return
+
+    with instrumentation.span('create_heatmap', rows_in=len(filtered_df)):
+        heatmap = _cached_heatmap(source, mv.dataset_version(source), *filters)
+    # 仅在开发者面板开启时额外渲染一次，统计发送到浏览器的 HTML 大小
+    payload_bytes = None
+    if instrumentation.tracing_enabled():
+        payload_bytes = len(heatmap.get_root().render().encode('utf-8'))
+
+    # 使用st_folium显示地图，设置合适的宽度和高度
+    with instrumentation.span('st_folium', rows_in=len(filtered_df)) as stage:
+        map_data = st_folium(
+            heatmap,
+            width=1200,
+            height=600,
+            key="heatmap"
+        )
+        stage.payload_bytes = payload_bytes
+
+    # 添加地图交互信息：列出点击位置附近的房源（仅在当前筛选结果中查找）
+    if map_data and map_data.get('last_clicked'):
+        clicked = map_data['last_clicked']
+        st.write(f"最后点击位置: {clicked}")
+
+        positions = mv.subset_positions(df.index, filtered_df)
+        if positions is not None:
+            with instrumentation.span('nearest_listings', rows_in=len(positions)) as stage:
+                nearby_rows, nearby_distances = load_shared_spatial_index(source).nearest(
+                    clicked['lat'], clicked['lng'], k=10, positions=positions
+                )
+                stage.rows_out = len(nearby_rows)
+            nearby_df = df.iloc[nearby_rows].copy()
+            nearby_df.insert(0, '距离(米)', nearby_distances.round(0))
+            st.subheader("点击位置附近的房源")
+            nearby_columns = ['距离(米)'] + [
+                col for col in [neighborhood_col, 'name', 'room_type', 'price', 'review_scores_rating']
+                if col and col in nearby_df.columns
+            ]
+            st.dataframe(nearby_df[nearby_columns], use_container_width=True)
+
+
+@st.fragment
+def _table_section(filtered_df, neighborhood_col) -> None:
+    """
+    筛选结果表格与导出。作为独立片段运行：切换导出格式只重新运行本片段，不会触及地图。
+    """
+    # 显示数据表格 - 检查列是否存在
+    st.subheader("筛选结果数据")
+    display_columns = []
+    # 修改部分开始：使用确定的列名
+    if neighborhood_col:
+        display_columns.append(neighborhood_col)
+    # 修改部分结束
+
+    for col in ['name', 'room_type', 'price', 'review_scores_rating']:
+        if col in filtered_df.columns:
+            display_columns.append(col)
+
+    if display_columns and len(filtered_df) > 0:
+        # 使用st.dataframe替代st.table，并设置高度和滚动
+        st.dataframe(
+            filtered_df[display_columns],
+            height=400,  # 设置固定高度
+            use_container_width=True
+        )
+
+        # 添加下载按钮：导出文件只在点击下载时才分块生成
+        formats = export.available_formats()
+        export_format = st.radio(
+            "导出格式", list(formats), format_func=lambda key: formats[key][0],
+            horizontal=True, key="export_format",
+        )
+        export_df = filtered_df[display_columns]
+        st.download_button(
+            label=f"下载筛选数据 ({formats[export_format][0]})",
+            data=lambda: export.export_file(export_df, export_format),
+            file_name=export.export_filename("filtered_airbnb_listings", export_format),
+            mime=formats[export_format][2],
+            on_click="ignore",
+        )
+    else:
+        st.warning("没有可显示的数据")
+
+
+def render() -> None:
+    st.header("房源空间分布与社区特征")
+    st.markdown("""
+    本页面展示纽约市Airbnb房源的地理分布情况，包括:
+    - 各行政区的房源密度
+    - 不同房型的空间分布
+    - 社区特征分析
+    """)
+
+    # 筛选选项
+    st.subheader("数据筛选")
+    col1, col2, col3, col4 = st.columns(4)
+
+    # 先加载数据来获取可用的选项
+    try:
+        source = select_data_source()
+        with st.spinner('正在加载数据...'):# 显示加载提示
+            df = load_shared_data(source)# 调用数据加载函数
+        st.success('数据加载成功!')
+
+        filter_index = load_shared_filter_index(source)
+
+        # 获取可用的选项（直接取自筛选索引中的类别，不再逐行扫描）
+        available_neighborhoods = ["全部"]
+
+        neighborhood_col = filter_index.neighborhood_col
+        if neighborhood_col:
+            available_neighborhoods.extend(filter_index.categories(neighborhood_col))
+            st.sidebar.info(f"使用社区列: {neighborhood_col}")  # 可选：显示使用的列名
+        else:
+            st.sidebar.warning("未找到社区相关的列")
+
+        available_room_types = ["全部"]
+        available_room_types.extend(filter_index.categories('room_type'))
+
+        available_cluster_types = ["全部"]
+        available_cluster_types.extend(filter_index.categories('cluster_type'))
+
+        with col1:# 在第一列添加社区选择下拉框
+            neighborhood = st.selectbox("选择社区", available_neighborhoods)
+        with col2:
+            room_type = st.selectbox("选择房型", available_room_types)
+        with col3:
+            cluster_type = st.selectbox("聚类类别", available_cluster_types)
+        with col4:
+            max_price = int(df['price'].max()) if 'price' in df.columns else 1000
+            price_range = st.slider("价格范围", 0, max_price, (50, min(300, max_price)))
+
+        # 显示筛选结果
+        st.write(f"已选择: {neighborhood}, {room_type}, 价格${price_range[0]}-${price_range[1]}, 聚类: {cluster_type}")
+
+        # 调用筛选函数，根据选择条件过滤数据
+        filtered_df = mv.filter_listings(
+            df,
+            neighborhood=neighborhood if neighborhood != "全部" else "全部",# 如果选择"全部"则传递"全部"
+            room_type=room_type if room_type != "全部" else "全部",
+            price_range=price_range,
+            cluster_type=cluster_type if cluster_type != "全部" else "全部",
+            index=filter_index,
+        )
+
+        st.success(f"找到 {len(filtered_df)} 个符合条件的房源")
+
+        # 热力图与表格各自作为独立片段运行；地图按 (数据版本, 筛选条件) 缓存
+        filters = (neighborhood, room_type, tuple(price_range), cluster_type)
+        _heatmap_section(source, df, filtered_df, filters, neighborhood_col)
+        _table_section(filtered_df, neighborhood_col)
+
+    except Exception as e:
+        st.error(f"数据加载或处理出错: {str(e)}")
+        st.info("请确保数据文件存在且格式正确")
+        # 显示详细的错误信息
+        import traceback
+        st.code(traceback.format_exc())
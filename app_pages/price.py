@@ -0,0 +1,111 @@
+import os
+
+import streamlit as st
+
+import chart_assets
+import instrumentation
+import map_visualization as mv
+import price_analysis as pa
+from app_pages import DATA_FILE, SHARED_CACHE_ENTRIES
+from app_pages.source import select_data_source
+from app_pages.shared import _load_shared_data, _load_shared_refresh
+
+
+@st.cache_resource(max_entries=SHARED_CACHE_ENTRIES, show_spinner=False)
+def _load_shared_price_cube(path: str, version: str) -> pa.PriceCube:
+    """
+    与共享数据集配套的价格聚合立方体，每个数据版本只构建一次；增量刷新后在修补前的立方体上只重新汇总受影响的分组。
+    """
+    refreshed = _load_shared_refresh(path, version)
+    if refreshed is not None:
+        base_cube = _load_shared_price_cube(path, mv.base_dataset_version(version))
+        return pa.patch_price_cube(base_cube, refreshed.df, refreshed.touched)
+    return pa.build_price_cube(_load_shared_data(path, version))
+
+
+def load_shared_price_cube(path: str = DATA_FILE) -> pa.PriceCube:
+    """
+    获取共享数据集的价格聚合立方体。
+    """
+    return _load_shared_price_cube(path, mv.dataset_version(path))
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _price_chart_payload(path: str, version: str, area: str, room_type: str, statistic: str) -> dict:
+    """
+    价格图表的配置项 JSON，按 (数据版本, 切片条件) 缓存，重复的交互不再重新生成图表。
+    """
+    price_cube = _load_shared_price_cube(path, version)
+
+    # 选择单个区域时横轴改为聚类类别，否则按区域对比
+    x_dimension = 'neighbourhood' if area == "全部" else 'cluster_type'
+    price_table = price_cube.table(
+        x_dimension, 'room_type', statistic,
+        where={'neighbourhood': area, 'room_type': room_type},
+    )
+    bar = pa.build_grouped_bar_chart(
+        price_table.round(2),
+        title=f"各区域不同房型的价格{pa.STATISTIC_LABELS[statistic]}",
+        x_name="区域" if x_dimension == 'neighbourhood' else "聚类类别",
+        y_name=pa.statistic_axis_name(statistic),
+    )
+    return chart_assets.chart_payload(bar)
+
+
+def price_chart_payload(area: str, room_type: str, statistic: str, path: str = DATA_FILE) -> dict:
+    """
+    获取当前切片条件下价格图表的配置项，数据更新后自动失效。
+    """
+    return _price_chart_payload(path, mv.dataset_version(path), area, room_type, statistic)
+
+
+def render() -> None:
+    st.header("价格特征分析")
+    st.markdown("""
+    本页面分析纽约市Airbnb房源的价格特征，包括:
+    - 不同区域的价格对比
+    - 不同房型的价格分布
+    """)
+
+    try:
+        source = select_data_source()
+        price_cube = load_shared_price_cube(source)
+
+        # 切片条件：选择行政区、房型与统计量，图表直接由聚合立方体生成
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            price_area = st.selectbox("选择区域", ["全部"] + price_cube.categories['neighbourhood'], key="price_area")
+        with col2:
+            price_room_type = st.selectbox("选择房型", ["全部"] + price_cube.categories['room_type'], key="price_room_type")
+        with col3:
+            statistic = st.selectbox(
+                "统计量", ['median', 'mean', 'std', 'count'],
+                format_func=lambda key: pa.STATISTIC_LABELS[key], key="price_statistic",
+            )
+
+        st.subheader(f"各区域不同房型的价格{pa.STATISTIC_LABELS[statistic]}")
+        # 前端与 ECharts 脚本只加载一次，之后的交互只发送新的配置项
+        with instrumentation.span('price_chart', statistic=statistic) as stage:
+            payload = price_chart_payload(price_area, price_room_type, statistic, source)
+            stage.payload_bytes = len(payload['options'])
+            chart_assets.render_chart(payload, key="price_chart")
+
+        # 添加一些说明
+        st.markdown("""
+        **图表说明：**
+        - 价格已按区域和房型剔除 800 美元以上的房源，并将超过均值 3 倍标准差的价格修正为均值
+        - 您可以使用图表右上角的工具栏进行缩放、保存图片等操作
+        - 将鼠标悬停在柱状图上可以查看具体数值
+        """)
+
+    except Exception as e:
+        st.error(f"生成价格分析图表时出错: {str(e)}")
+
+        # 回退为显示预先生成的图表文件
+        chart_path = "price_analysis.html"
+        if os.path.exists(chart_path):
+            html_content = chart_assets.read_html(chart_path)
+            st.subheader("各社区不同房型的均价分布")
+            st.components.v1.html(html_content, height=850, scrolling=True)
+        else:
+            st.info("请确保数据文件或 price_analysis.html 文件存在于当前目录下")
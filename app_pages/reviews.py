@@ -0,0 +1,83 @@
+import os
+
+import streamlit as st
+
+import chart_assets
+import instrumentation
+import map_visualization as mv
+import review_analysis as ra
+from app_pages.shared import load_shared_data, load_shared_filter_index
+from app_pages.source import select_data_source
+
+
+def render() -> None:
+    st.header("用户评价与口碑分析")
+    st.markdown("""
+    本页面分析用户对Airbnb房源的评价，包括:
+    - 评分分布情况
+    - 口碑与价格的关系
+    """)
+
+    try:
+        source = select_data_source()
+        df = load_shared_data(source)
+        filter_index = load_shared_filter_index(source)
+
+        # 筛选条件与综合指数参数，地图按当前条件实时生成（相同条件的结果会被缓存）
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            review_room_type = st.selectbox(
+                "选择房型", ["全部"] + filter_index.categories('room_type'), key="review_room_type"
+            )
+        with col2:
+            review_cluster = st.selectbox(
+                "聚类类别", ["全部"] + filter_index.categories('cluster_type'), key="review_cluster_type"
+            )
+        with col3:
+            min_reviews = st.number_input(
+                "最少评价数", min_value=0, value=ra.MIN_REVIEWS, step=1, key="review_min_reviews"
+            )
+        with col4:
+            price_weight = st.slider(
+                "价格权重", min_value=0.0, max_value=1.0, value=ra.PRICE_WEIGHT, step=0.1, key="review_price_weight"
+            )
+
+        filtered_df = mv.filter_listings(
+            df,
+            neighborhood="全部",
+            room_type=review_room_type,
+            price_range=None,
+            cluster_type=review_cluster,
+            index=filter_index,
+        )
+        with instrumentation.span('review_map', rows_in=len(filtered_df)) as stage:
+            review_html_content = ra.build_review_map_html(
+                filtered_df,
+                min_reviews=int(min_reviews),
+                price_weight=price_weight,
+                rating_weight=1.0 - price_weight,
+            )
+            stage.payload_bytes = len(review_html_content)
+
+        st.subheader("用户评价分析图表")
+        st.components.v1.html(review_html_content, height=850, scrolling=True)
+
+        # 添加图表说明
+        st.markdown(f"""
+        **图表说明：**
+        - 每个社区显示一个点，位置为社区内房源的平均经纬度，点击可查看均价、评分与综合指数
+        - 综合指数 = {price_weight:.1f} × 价格反向归一化 + {1.0 - price_weight:.1f} × 评分归一化
+        - 使用右上角的图层控件切换价格、评分与综合维度
+        """)
+
+    except Exception as e:
+        st.error(f"生成评价分析图表时出错: {str(e)}")
+
+        # 回退为显示预先生成的图表文件
+        review_chart_path = "review_analysis.html"
+        if os.path.exists(review_chart_path):
+            review_html_content = chart_assets.read_html(review_chart_path)
+            st.subheader("用户评价分析图表")
+            st.components.v1.html(review_html_content, height=850, scrolling=True)
+        else:
+            st.info("请确保数据文件或 review_analysis.html 文件存在于当前目录下")
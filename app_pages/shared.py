@@ -0,0 +1,62 @@
+from typing import Optional
+
+import streamlit as st
+import pandas as pd
+
+import map_visualization as mv
+from app_pages import DATA_FILE, SHARED_CACHE_ENTRIES
+
+
+@st.cache_resource(max_entries=SHARED_CACHE_ENTRIES, show_spinner=False)
+def _load_shared_base(path: str, base_version: str) -> pd.DataFrame:
+    """
+    数据文件本身（不含增量刷新的修补）的共享数据，按数据文件的版本缓存，刷新后仍保留供合并修补使用。
+    """
+    return mv.load_cleaned_clustered_listings(path, apply_delta=False)
+
+
+@st.cache_resource(max_entries=SHARED_CACHE_ENTRIES, show_spinner=False)
+def _load_shared_refresh(path: str, version: str) -> Optional[mv.RefreshedListings]:
+    """
+    数据版本包含增量刷新的修补时，在修补前的共享数据上合并修补（不重新读取数据文件）；没有修补时返回 None。
+    """
+    base_version = mv.base_dataset_version(version)
+    if base_version == version:
+        return None
+    delta = mv.read_listings_delta(path, mv.DASHBOARD_COLUMNS)
+    if delta is None:
+        return None
+    return mv.apply_listings_delta(_load_shared_base(path, base_version), delta)
+
+
+def _load_shared_data(path: str, version: str) -> pd.DataFrame:
+    """
+    进程级共享的只读数据集：所有会话共用同一份 DataFrame。
+    version 随源文件（及修补文件）变化而变化，数据更新后旧条目会被自动淘汰。
+    """
+    refreshed = _load_shared_refresh(path, version)
+    if refreshed is None:
+        return _load_shared_base(path, mv.base_dataset_version(version))
+    return refreshed.df
+
+
+def load_shared_data(path: str = DATA_FILE) -> pd.DataFrame:
+    """
+    获取共享数据集，源文件变化时自动重新加载。
+    """
+    return _load_shared_data(path, mv.dataset_version(path))
+
+
+@st.cache_resource(max_entries=SHARED_CACHE_ENTRIES, show_spinner=False)
+def _load_shared_filter_index(path: str, version: str) -> mv.ListingFilterIndex:
+    """
+    与共享数据集配套的筛选索引，同样按数据版本缓存，每个进程只构建一次。
+    """
+    return mv.build_filter_index(_load_shared_data(path, version))
+
+
+def load_shared_filter_index(path: str = DATA_FILE) -> mv.ListingFilterIndex:
+    """
+    获取共享数据集的筛选索引。
+    """
+    return _load_shared_filter_index(path, mv.dataset_version(path))
@@ -0,0 +1,17 @@
+import streamlit as st
+
+import dataset_store
+from app_pages import DATA_FILE
+
+
+def select_data_source() -> str:
+    """
+    返回当前页面使用的数据文件：分区存储中有数据时在侧边栏选择城市与快照（只加载所选分区），
+    否则使用默认数据文件 DATA_FILE。
+    """
+    available_cities = dataset_store.cities()
+    if not available_cities:
+        return DATA_FILE
+    city = st.sidebar.selectbox("城市", available_cities, key="data_city")
+    snapshot = st.sidebar.selectbox("快照日期", dataset_store.snapshots(city), key="data_snapshot")
+    return dataset_store.partition_path(city, snapshot)
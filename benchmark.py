@@ -0,0 +1,325 @@
+import os
+import gc
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，最大常驻内存记为 None
+    resource = None
+
+import boundaries
+import map_visualization as mv
+import price_analysis as pa
+import review_analysis as ra
+
+# 默认的数据规模、每个阶段的计时次数（取最小值）与结果文件
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+DEFAULT_REPEAT = 3
+DEFAULT_OUTPUT_PATH = "benchmark_results.json"
+
+# 超过该行数时不再生成 Excel 源文件（写入过慢且接近 Excel 行数上限），加载阶段只测列式缓存
+EXCEL_MAX_ROWS = 100_000
+
+# 合成数据：各行政区的中心、分布范围（度）与房源占比，以及每个行政区的社区数
+BOROUGHS = {
+    'Manhattan': ((40.7831, -73.9712), (0.030, 0.015), 0.42),
+    'Brooklyn': ((40.6782, -73.9442), (0.035, 0.040), 0.38),
+    'Queens': ((40.7282, -73.7949), (0.040, 0.060), 0.14),
+    'Bronx': ((40.8448, -73.8648), (0.025, 0.030), 0.04),
+    'Staten Island': ((40.5795, -74.1502), (0.030, 0.040), 0.02),
+}
+NEIGHBOURHOODS_PER_BOROUGH = 40
+ROOM_TYPES = {'Entire home/apt': 0.55, 'Private room': 0.40, 'Shared room': 0.02, 'Hotel room': 0.03}
+
+# 替代网络下载的合成行政边界：每个行政区一个多边形及其顶点数
+STUB_BOUNDARY_VERTICES = 4000
+
+
+def synthetic_listings(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    生成与“清洗并聚类后的房源数据”列结构一致的纽约风格合成数据（结果只由 n_rows 与 seed 决定）。
+    """
+    rng = np.random.default_rng(seed)
+    names = list(BOROUGHS)
+    shares = np.array([BOROUGHS[name][2] for name in names])
+    borough = rng.choice(len(names), size=n_rows, p=shares / shares.sum())
+
+    centers = np.array([BOROUGHS[name][0] for name in names])
+    spreads = np.array([BOROUGHS[name][1] for name in names])
+    lat = centers[borough, 0] + rng.normal(0, 1, n_rows) * spreads[borough, 0]
+    lng = centers[borough, 1] + rng.normal(0, 1, n_rows) * spreads[borough, 1]
+    (lat_min, lat_max), (lng_min, lng_max) = mv.NYC_BOUNDS
+    lat = np.clip(lat, lat_min + 0.01, lat_max - 0.01)
+    lng = np.clip(lng, lng_min + 0.01, lng_max - 0.01)
+
+    room_types = list(ROOM_TYPES)
+    room = rng.choice(len(room_types), size=n_rows, p=list(ROOM_TYPES.values()))
+    price = np.round(np.exp(rng.normal(5.0, 0.7, n_rows)) * np.where(room == 0, 1.6, 1.0)).clip(10, 50_000)
+    rating = np.round(np.clip(rng.normal(4.7, 0.35, n_rows), 1, 5), 2)
+    accommodates = np.clip(rng.poisson(2.5, n_rows) + 1, 1, 16)
+    number_of_reviews = rng.geometric(0.03, n_rows)
+
+    # 聚类类别按价格三分位近似（不运行 KMeans，避免基准被聚类耗时主导）
+    cluster_label = np.digitize(price, np.quantile(price, [1 / 3, 2 / 3]))
+    cluster_names = np.array(['经济型', '中档型', '高档型'])
+
+    neighbourhood_no = rng.integers(0, NEIGHBOURHOODS_PER_BOROUGH, n_rows)
+    return pd.DataFrame({
+        'id': np.arange(1, n_rows + 1, dtype=np.int64),
+        'name': [f"Listing {i}" for i in range(n_rows)],
+        'host_id': rng.integers(1, max(n_rows // 2, 2), n_rows),
+        'neighbourhood_cleansed': [f"{names[b]} {k}" for b, k in zip(borough, neighbourhood_no)],
+        'neighbourhood': np.array(names, dtype=object)[borough],
+        'latitude': lat,
+        'longitude': lng,
+        'room_type': np.array(room_types, dtype=object)[room],
+        'accommodates': accommodates,
+        'price': price.astype(np.int64),
+        'minimum_nights': rng.integers(1, 31, n_rows),
+        'number_of_reviews': number_of_reviews,
+        'review_scores_rating': rating,
+        'reviews_per_month': np.round(rng.gamma(1.2, 1.0, n_rows), 2),
+        'cluster_label': cluster_label,
+        'cluster_type': cluster_names[cluster_label],
+    })
+
+
+def synthetic_raw_listings(listings: pd.DataFrame) -> pd.DataFrame:
+    """
+    将合成数据转换为 Inside Airbnb 原始 listings.csv 的形式（价格为 "$1,234.00" 文本，带长文本描述列）。
+    """
+    return pd.DataFrame({
+        'id': listings['id'],
+        'name': listings['name'],
+        'description': "Sunny room close to the subway. " * 8,
+        'neighbourhood_cleansed': listings['neighbourhood_cleansed'],
+        'neighbourhood_group_cleansed': listings['neighbourhood'],
+        'latitude': listings['latitude'],
+        'longitude': listings['longitude'],
+        'room_type': listings['room_type'],
+        'price': listings['price'].map('${:,.2f}'.format),
+        'review_scores_rating': listings['review_scores_rating'],
+        'number_of_reviews': listings['number_of_reviews'],
+        'accommodates': listings['accommodates'],
+    })
+
+
+def stub_boundaries(path: str) -> str:
+    """
+    写入合成的行政区边界 GeoJSON（每个行政区一个高顶点数多边形），代替从纽约开放数据平台下载。
+    """
+    angles = np.linspace(0, 2 * np.pi, STUB_BOUNDARY_VERTICES)
+    features = []
+    for name, ((lat, lng), (d_lat, d_lng), _) in BOROUGHS.items():
+        ring = np.column_stack([lng + 2 * d_lng * np.cos(angles), lat + 2 * d_lat * np.sin(angles)])
+        ring[-1] = ring[0]
+        features.append({
+            'type': 'Feature',
+            'properties': {'boro_name': name},
+            'geometry': {'type': 'Polygon', 'coordinates': [ring.round(6).tolist()]},
+        })
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'type': 'FeatureCollection', 'features': features}, f)
+    return path
+
+
+def _measure(func: Callable[[], object], repeat: int) -> Tuple[float, float, object]:
+    """
+    返回 (最短耗时（秒）, 峰值内存（MB）, 函数结果)：先计时 repeat 次，再单独用 tracemalloc 运行一次测量峰值内存
+    （Python 对象与 NumPy / pandas 缓冲区的分配）。
+    """
+    timings = []
+    result = None
+    for _ in range(max(repeat, 1)):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(timings), peak / 1024 / 1024, result
+
+
+def _max_rss_mb() -> Optional[float]:
+    """
+    进程目前为止的最大常驻内存（MB），无法获取时为 None。tracemalloc 统计不到 Arrow 内存池等原生分配，可用此值辅助判断。
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 下单位为 KB，macOS 下为字节
+    return usage / 1024 / 1024 if platform.system() == 'Darwin' else usage / 1024
+
+
+def _html_bytes(html: Optional[str]) -> Optional[int]:
+    return len(html.encode('utf-8')) if html is not None else None
+
+
+def run_size(n_rows: int, workdir: str, repeat: int = DEFAULT_REPEAT, seed: int = 0) -> List[Dict[str, object]]:
+    """
+    在 n_rows 行的合成数据上依次测量 加载 → 筛选 → 热力图 → 价格图 → 评价地图 各阶段。
+    """
+    results = []
+
+    def record(stage: str, func: Callable[[], object], rows_in: int, rows_out=None, html=None) -> object:
+        seconds, peak_mb, result = _measure(func, repeat)
+        max_rss = _max_rss_mb()
+        entry = {
+            'rows': n_rows,
+            'stage': stage,
+            'seconds': round(seconds, 6),
+            'peak_mb': round(peak_mb, 3),
+            'rows_in': rows_in,
+            'rows_out': rows_out(result) if rows_out else None,
+            'html_bytes': _html_bytes(html(result)) if html else None,
+            'max_rss_mb': round(max_rss, 1) if max_rss is not None else None,
+        }
+        results.append(entry)
+        print(f"{n_rows:>9,} 行  {stage:<24} {entry['seconds']:>9.3f} 秒  峰值 {entry['peak_mb']:>9.1f} MB"
+              + (f"  HTML {entry['html_bytes']:,} 字节" if entry['html_bytes'] is not None else ""))
+        return result
+
+    listings = synthetic_listings(n_rows, seed)
+
+    # 加载：Excel 源文件（仅较小规模）与列式缓存
+    data_path = os.path.join(workdir, f"listings_{n_rows}.xlsx")
+    if n_rows <= EXCEL_MAX_ROWS:
+        listings.to_excel(data_path, index=False)
+        record('load_excel', lambda: mv.load_cleaned_clustered_listings(data_path, use_cache=False), n_rows, len)
+    else:
+        # 源文件只作为缓存的校验对象，内容不会被解析
+        with open(data_path, 'wb') as f:
+            f.write(b'synthetic')
+    mv.write_listings_cache(listings, data_path)
+    df = record('load_cache', lambda: mv.load_cleaned_clustered_listings(data_path), n_rows, len)
+
+    # 筛选：逐行扫描与位图索引
+    filters = [
+        ('全部', '全部', (0, 10_000), '全部'),
+        ('Manhattan', 'Private room', (50, 300), '全部'),
+        ('Brooklyn', '全部', (100, 500), '中档型'),
+    ]
+    index = record('build_filter_index', lambda: mv.build_filter_index(df), n_rows)
+    record('filter_scan', lambda: [mv.filter_listings(df, *args) for args in filters], n_rows * len(filters),
+           lambda out: sum(len(part) for part in out))
+    filtered = record('filter_index', lambda: [mv.filter_listings(df, *args, index=index) for args in filters],
+                      n_rows * len(filters), lambda out: sum(len(part) for part in out))[0]
+
+    # 热力图：逐点与预聚合网格，含 HTML 渲染
+    bins = record('build_heatmap_bins', lambda: mv.build_heatmap_bins(df), n_rows)
+    record('heatmap_points', lambda: mv.create_nyc_folium_heatmap(filtered).get_root().render(),
+           len(filtered), html=lambda out: out)
+    record('heatmap_bins', lambda: mv.create_nyc_folium_heatmap(filtered, bins=bins).get_root().render(),
+           len(filtered), html=lambda out: out)
+
+    # 价格图：从原始 CSV 生成静态 HTML，以及由聚合立方体生成应用内图表
+    raw_path = os.path.join(workdir, f"listings_{n_rows}.csv")
+    synthetic_raw_listings(listings).to_csv(raw_path, index=False)
+    chart_path = os.path.join(workdir, f"price_analysis_{n_rows}.html")
+
+    def price_chart_html() -> str:
+        pa.generate_grouped_bar_chart(raw_path, chart_path)
+        with open(chart_path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    record('price_chart_csv', price_chart_html, n_rows, html=lambda out: out)
+    cube = record('build_price_cube', lambda: pa.build_price_cube(df), n_rows)
+    record('price_chart_cube', lambda: pa.build_grouped_bar_chart(
+        cube.table('neighbourhood', 'room_type', 'median')).render_embed(), n_rows, html=lambda out: out)
+
+    # 评价地图：每次都清空结果缓存，测量实际生成耗时
+    def review_html() -> str:
+        ra._review_cache.clear()
+        return ra.build_review_map_html(df)
+
+    record('review_map', review_html, n_rows, html=lambda out: out)
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes: Sequence[int] = DEFAULT_SIZES, repeat: int = DEFAULT_REPEAT, seed: int = 0) -> Dict[str, object]:
+    """
+    在各数据规模上运行全部阶段，返回可写入 JSON 的结果（包含提交号与环境信息）。
+
+    行政边界改为读取临时目录中的合成 GeoJSON，整个过程不访问网络。
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        boundary_path = stub_boundaries(os.path.join(workdir, "boroughs.geojson"))
+
+        def stub(zoom: Optional[int] = None, path: Optional[str] = None) -> Optional[dict]:
+            # 忽略调用方传入的边界路径，始终读取合成边界
+            return boundaries.get_borough_boundaries(zoom, boundary_path)
+
+        with mock.patch.object(mv, 'get_borough_boundaries', stub):
+            for n_rows in sizes:
+                results.extend(run_size(n_rows, workdir, repeat, seed))
+
+    return {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare_results(current: Dict[str, object], baseline: Dict[str, object]) -> pd.DataFrame:
+    """
+    按 (规模, 阶段) 对比两次结果，返回耗时、峰值内存与 HTML 大小的比值（当前 / 基线）。
+    """
+    key = ['rows', 'stage']
+    metrics = ['seconds', 'peak_mb', 'html_bytes']
+    merged = pd.DataFrame(current['results']).merge(
+        pd.DataFrame(baseline['results']), on=key, suffixes=('', '_baseline'))
+    for metric in metrics:
+        merged[f'{metric}_ratio'] = (merged[metric] / merged[f'{metric}_baseline']).round(3)
+    return merged[key + [f'{metric}_ratio' for metric in metrics]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="加载 → 筛选 → 渲染 热点路径的基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="合成数据的行数")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="每个阶段的计时次数（取最小值）")
+    parser.add_argument("--seed", type=int, default=0, help="合成数据的随机种子")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT_PATH, help="结果 JSON 路径")
+    parser.add_argument("--compare", default=None, help="与之对比的基线结果 JSON")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.sizes, args.repeat, args.seed)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到 {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(compare_results(report, baseline).to_string(index=False))
@@ -0,0 +1,194 @@
+import os
+import json
+from functools import lru_cache
+from typing import Optional, List
+
+import numpy as np
+
+from instrumentation import get_logger
+
+logger = get_logger(__name__)
+
+# 纽约市行政区边界 GeoJSON：读取与本文件同目录的本地副本。仓库附带一份由纽约市规划局行政区边界（nybb）
+# 转换为经纬度并按缩放级别 15 简化的副本，默认安装即可显示边界；运行 python boundaries.py 可下载开放数据平台的完整精度版本覆盖它
+DEFAULT_BOUNDARY_PATH = os.path.join(os.path.dirname(__file__), "nyc_boroughs.geojson")
+NYC_GEOJSON_URL = "https://data.cityofnewyork.us/api/geospatial/tqmj-j8zm?method=export&format=GeoJSON"
+
+# 本地副本被删除时是否在渲染地图时自动下载（默认关闭，避免首次渲染被网络请求阻塞），设为 1 时开启
+DOWNLOAD_ENV = "AIRBNB_DOWNLOAD_BOUNDARIES"
+
+# 下载超时（秒），避免页面被网络请求无限期阻塞
+DOWNLOAD_TIMEOUT = 10
+
+
+def download_enabled() -> bool:
+    return os.environ.get(DOWNLOAD_ENV, '').strip().lower() in ('1', 'true', 'yes')
+
+
+def _download_boundaries(path: str) -> Optional[dict]:
+    """
+    从纽约开放数据平台下载边界数据并保存到本地，失败时返回 None。
+    """
+    try:
+        import requests  # 仅在需要下载时才导入
+
+        response = requests.get(NYC_GEOJSON_URL, timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        geojson = response.json()
+    except Exception as e:
+        logger.warning("下载行政边界数据失败: %s", e)
+        return None
+
+    try:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(geojson, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning("保存行政边界数据失败（不影响本次使用）: %s", e)
+    return geojson
+
+
+@lru_cache(maxsize=None)
+def _read_boundaries(path: str, mtime_ns: int) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_borough_boundaries(path: str = DEFAULT_BOUNDARY_PATH, allow_download: Optional[bool] = None) -> Optional[dict]:
+    """
+    读取纽约行政区边界 GeoJSON（解析结果按 (路径, 修改时间) 在进程内缓存）。
+
+    本地文件不存在且允许下载时（allow_download 为 None 时由环境变量 AIRBNB_DOWNLOAD_BOUNDARIES 决定），
+    带超时下载并保存；仍无法获取时返回 None。失败不缓存，文件补上后下次调用即可读取。
+    """
+    if os.path.exists(path):
+        return _read_boundaries(os.path.abspath(path), os.stat(path).st_mtime_ns)
+    if allow_download is None:
+        allow_download = download_enabled()
+    if allow_download:
+        return _download_boundaries(path)
+    return None
+
+
+def _simplify_line(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Douglas-Peucker 折线简化：保留与首尾连线距离超过 tolerance 的顶点。
+    """
+    if len(points) < 3:
+        return points
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = points[end] - points[start]
+        offsets = points[start + 1:end] - points[start]
+        length = np.hypot(*segment)
+        if length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return points[keep]
+
+
+def _simplify_ring(ring: List[List[float]], tolerance: float) -> List[List[float]]:
+    """
+    简化多边形的一个环，简化后顶点过少（不足以构成多边形）时保留原环。
+    """
+    points = np.asarray(ring, dtype=float)
+    simplified = _simplify_line(points, tolerance)
+    if len(simplified) < 4:
+        return ring
+    return simplified.tolist()
+
+
+def _simplify_geometry(geometry: dict, tolerance: float) -> dict:
+    if geometry is None:
+        return geometry
+    geometry_type = geometry.get('type')
+    coordinates = geometry.get('coordinates')
+    if geometry_type == 'Polygon':
+        coordinates = [_simplify_ring(ring, tolerance) for ring in coordinates]
+    elif geometry_type == 'MultiPolygon':
+        coordinates = [[_simplify_ring(ring, tolerance) for ring in polygon] for polygon in coordinates]
+    elif geometry_type in ('LineString', 'MultiLineString'):
+        lines = [coordinates] if geometry_type == 'LineString' else coordinates
+        lines = [_simplify_line(np.asarray(line, dtype=float), tolerance).tolist() for line in lines]
+        coordinates = lines[0] if geometry_type == 'LineString' else lines
+    else:
+        return geometry
+    return {**geometry, 'coordinates': coordinates}
+
+
+def simplify_geojson(geojson: dict, tolerance: float) -> dict:
+    """
+    按给定容差（单位：度）简化 GeoJSON 中的面和线，返回新的 GeoJSON，原对象不被修改。
+    """
+    if geojson.get('type') == 'FeatureCollection':
+        features = [
+            {**feature, 'geometry': _simplify_geometry(feature.get('geometry'), tolerance)}
+            for feature in geojson.get('features', [])
+        ]
+        return {**geojson, 'features': features}
+    if geojson.get('type') == 'Feature':
+        return {**geojson, 'geometry': _simplify_geometry(geojson.get('geometry'), tolerance)}
+    return _simplify_geometry(geojson, tolerance)
+
+
+def zoom_tolerance(zoom: int) -> float:
+    """
+    返回某缩放级别下约一个像素对应的经度跨度，作为简化容差（小于一个像素的细节看不出来）。
+    """
+    return 360.0 / (256 * 2 ** zoom)
+
+
+@lru_cache(maxsize=32)
+def _cached_boundaries(zoom: Optional[int], path: str, mtime_ns: int) -> dict:
+    geojson = _read_boundaries(path, mtime_ns)
+    if zoom is None:
+        return geojson
+    return simplify_geojson(geojson, zoom_tolerance(zoom))
+
+
+def _boundaries_at(zoom: Optional[int], path: str) -> Optional[dict]:
+    """
+    只缓存从本地文件读取的结果；文件不存在时按 load_borough_boundaries 的规则获取，失败（None）不缓存。
+    """
+    if os.path.exists(path):
+        return _cached_boundaries(zoom, os.path.abspath(path), os.stat(path).st_mtime_ns)
+    geojson = load_borough_boundaries(path)
+    if geojson is None or zoom is None:
+        return geojson
+    return simplify_geojson(geojson, zoom_tolerance(zoom))
+
+
+def get_borough_boundaries(zoom: Optional[int] = None, path: str = DEFAULT_BOUNDARY_PATH) -> Optional[dict]:
+    """
+    获取行政区边界：zoom 为空时返回完整精度，否则返回按该缩放级别简化后的版本（结果缓存）。
+
+    folium 渲染时会向每个要素的 properties 写入样式，因此返回要素与属性的浅拷贝，
+    几何坐标仍与缓存共享，避免多个会话互相修改缓存。
+    """
+    geojson = _boundaries_at(zoom, path)
+    if geojson is None or geojson.get('type') != 'FeatureCollection':
+        return geojson
+    features = [
+        {**feature, 'properties': dict(feature.get('properties') or {})}
+        for feature in geojson.get('features', [])
+    ]
+    return {**geojson, 'features': features}
+
+
+if __name__ == "__main__":
+    geojson = load_borough_boundaries(allow_download=True)
+    print(f"行政边界数据已保存到 {DEFAULT_BOUNDARY_PATH}" if geojson is not None else "行政边界数据下载失败")
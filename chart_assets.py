@@ -0,0 +1,89 @@
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+# 图表前端目录：index.html 与本地化的 ECharts 脚本（由 Streamlit 作为静态文件提供，浏览器只需加载一次）
+FRONTEND_DIR = os.path.join(os.path.dirname(__file__), "chart_frontend")
+
+# 随仓库提供的 ECharts 脚本（相对 ASSET_HOST 与 FRONTEND_DIR 的路径），与 pyecharts 使用的主版本一致
+ASSET_HOST = "https://assets.pyecharts.org/assets/v6/"
+VENDORED_SCRIPTS = ["echarts.min.js", "themes/light.js"]
+
+# 下载超时（秒）
+DOWNLOAD_TIMEOUT = 30
+
+# 嵌入页面时图表的默认高度（像素）
+DEFAULT_CHART_HEIGHT = 850
+
+
+def missing_assets() -> List[str]:
+    """
+    返回尚未本地化的脚本列表。
+    """
+    return [name for name in VENDORED_SCRIPTS if not os.path.exists(os.path.join(FRONTEND_DIR, name))]
+
+
+def vendor_assets(force: bool = False) -> List[str]:
+    """
+    下载 ECharts 脚本到 FRONTEND_DIR，返回本次下载的文件列表。脚本已随仓库提供，force 为 True 时重新下载以升级版本。
+    """
+    import requests  # 仅在下载时才需要
+
+    downloaded = []
+    for name in (VENDORED_SCRIPTS if force else missing_assets()):
+        response = requests.get(ASSET_HOST + name, timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+
+        path = os.path.join(FRONTEND_DIR, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(response.content)
+        os.replace(tmp_path, path)
+        downloaded.append(name)
+    return downloaded
+
+
+def chart_payload(chart, height: int = DEFAULT_CHART_HEIGHT) -> Dict[str, object]:
+    """
+    将 pyecharts 图表转换为只包含配置项 JSON 的轻量数据，供 render_chart 使用（可直接放入 st.cache_data）。
+    """
+    return {
+        'options': chart.dump_options_with_quotes(),
+        'theme': chart.theme,
+        'height': int(height),
+    }
+
+
+@lru_cache(maxsize=None)
+def _echarts_component():
+    import streamlit.components.v1 as components  # 仅在应用中渲染时才需要
+
+    return components.declare_component("echarts_chart", path=FRONTEND_DIR)
+
+
+def render_chart(payload: Dict[str, object], key: Optional[str] = None) -> None:
+    """
+    在 Streamlit 页面中渲染图表。
+
+    前端页面与 ECharts 脚本只在首次渲染时加载，之后每次重新运行只向浏览器发送新的配置项 JSON。
+    """
+    _echarts_component()(**payload, key=key, default=None)
+
+
+@lru_cache(maxsize=16)
+def _read_html(path: str, mtime_ns: int) -> str:
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def read_html(path: str) -> str:
+    """
+    读取预先生成的 HTML 文件，内容按 (路径, 修改时间) 缓存在内存中，文件未变化时不再重复读取。
+    """
+    return _read_html(os.path.abspath(path), os.stat(path).st_mtime_ns)
+
+
+if __name__ == "__main__":
+    names = vendor_assets(force=True)
+    print(f"已更新: {', '.join(names)}")
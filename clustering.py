@@ -0,0 +1,188 @@
+import os
+import json
+from typing import Optional, Dict, List, Sequence, Callable, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.preprocessing import StandardScaler
+
+# 用于聚类的特征（价格、评分、可容纳人数）与按聚类中心价格从低到高的类别名称
+CLUSTER_FEATURES = ['price', 'review_scores_rating', 'accommodates']
+CLUSTER_NAMES = ['经济型', '中档型', '高档型']
+
+# 默认的模型文件（与本文件同目录）以及批量分配类别时每批的行数
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), "聚类模型.json")
+ASSIGN_BATCH_SIZE = 100_000
+
+
+class ClusterModel:
+    """
+    可持久化的房源聚类模型：标准化参数、聚类中心（标准化空间）以及聚类编号到类别名称的映射。
+
+    不依赖 sklearn 即可为新房源分配类别，保存为 JSON 文件。
+    """
+
+    def __init__(
+            self,
+            features: Sequence[str],
+            mean: np.ndarray,
+            scale: np.ndarray,
+            centroids: np.ndarray,
+            label_names: Dict[int, str],
+    ):
+        self.features = list(features)
+        self.mean = np.asarray(mean, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        self.centroids = np.asarray(centroids, dtype=float)
+        self.label_names = {int(label): name for label, name in label_names.items()}
+
+    @classmethod
+    def from_estimators(cls, features: Sequence[str], scaler: StandardScaler, kmeans) -> "ClusterModel":
+        """
+        由训练好的 StandardScaler 与 (MiniBatch)KMeans 构建模型，并按聚类中心价格从低到高命名。
+        """
+        centers = pd.DataFrame(scaler.inverse_transform(kmeans.cluster_centers_), columns=list(features))
+        sorted_labels = centers.sort_values('price').index
+        label_names = {int(label): CLUSTER_NAMES[rank] for rank, label in enumerate(sorted_labels)}
+        return cls(features, scaler.mean_, scaler.scale_, kmeans.cluster_centers_, label_names)
+
+    def cluster_centers(self) -> pd.DataFrame:
+        """
+        返回原始尺度下的聚类中心（行：聚类编号）。
+        """
+        return pd.DataFrame(self.centroids * self.scale + self.mean, columns=self.features)
+
+    def predict(self, df: pd.DataFrame, batch_size: int = ASSIGN_BATCH_SIZE) -> pd.Series:
+        """
+        按最近聚类中心为每行分配聚类编号；特征缺失的行为缺失值。
+        """
+        values = df[self.features].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+        labels = np.full(len(values), -1, dtype=np.int64)
+        complete = ~np.isnan(values).any(axis=1)
+        rows = np.flatnonzero(complete)
+
+        # 分批计算到各中心的距离，控制临时数组大小
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            scaled = (values[batch] - self.mean) / self.scale
+            distances = ((scaled[:, None, :] - self.centroids[None, :, :]) ** 2).sum(axis=2)
+            labels[batch] = distances.argmin(axis=1)
+
+        return pd.Series(labels, index=df.index, dtype='int64').where(complete).astype('Int64')
+
+    def save(self, path: str = DEFAULT_MODEL_PATH) -> None:
+        """
+        将模型保存为 JSON 文件。
+        """
+        payload = {
+            'features': self.features,
+            'mean': self.mean.tolist(),
+            'scale': self.scale.tolist(),
+            'centroids': self.centroids.tolist(),
+            'label_names': {str(label): name for label, name in self.label_names.items()},
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+
+
+def load_cluster_model(path: str = DEFAULT_MODEL_PATH) -> ClusterModel:
+    """
+    读取 ClusterModel.save 保存的模型文件。
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"未找到聚类模型文件: {path}")
+    with open(path, 'r', encoding='utf-8') as f:
+        payload = json.load(f)
+    return ClusterModel(
+        payload['features'],
+        payload['mean'],
+        payload['scale'],
+        payload['centroids'],
+        {int(label): name for label, name in payload['label_names'].items()},
+    )
+
+
+def fit_cluster_model(
+        df: pd.DataFrame,
+        features: Sequence[str] = CLUSTER_FEATURES,
+        mode: str = 'full',
+        batch_size: int = 4096,
+        random_state: int = 42,
+) -> Tuple[ClusterModel, pd.Series]:
+    """
+    在内存中的数据上训练聚类模型，返回 (模型, 训练数据每行的聚类编号)。
+
+    mode='full' 使用 KMeans（与原清洗脚本结果一致）；mode='minibatch' 使用 MiniBatchKMeans，适合大规模快照。
+    特征缺失的行不参与训练，其聚类编号为缺失值。
+    """
+    features = list(features)
+    cluster_data = df[features].dropna()
+
+    # 数据标准化（使各特征权重一致）
+    scaler = StandardScaler()
+    scaled_features = scaler.fit_transform(cluster_data)
+
+    # 分为3类：经济型、中档型、高档型；random_state确保结果可复现
+    if mode == 'full':
+        kmeans = KMeans(n_clusters=len(CLUSTER_NAMES), random_state=random_state)
+    elif mode == 'minibatch':
+        kmeans = MiniBatchKMeans(n_clusters=len(CLUSTER_NAMES), batch_size=batch_size, random_state=random_state)
+    else:
+        raise ValueError(f"不支持的聚类模式: {mode}")
+    labels = kmeans.fit_predict(scaled_features)
+
+    model = ClusterModel.from_estimators(features, scaler, kmeans)
+    return model, pd.Series(labels, index=cluster_data.index).reindex(df.index).astype('Int64')
+
+
+def fit_cluster_model_streaming(
+        make_batches: Callable[[], Iterable[pd.DataFrame]],
+        features: Sequence[str] = CLUSTER_FEATURES,
+        random_state: int = 42,
+) -> ClusterModel:
+    """
+    以流式方式训练聚类模型，适合无法一次装入内存的快照。
+
+    make_batches 每次调用都返回一个新的批次迭代器（例如 lambda: ingest.iter_listings(path)）：
+    第一遍只累计标准化参数，第二遍用 MiniBatchKMeans.partial_fit 逐批更新聚类中心。
+    """
+    features = list(features)
+    scaler = StandardScaler()
+    for batch in make_batches():
+        values = batch[features].dropna()
+        if len(values):
+            scaler.partial_fit(values)
+
+    kmeans = MiniBatchKMeans(n_clusters=len(CLUSTER_NAMES), random_state=random_state)
+    pending: List[np.ndarray] = []
+    for batch in make_batches():
+        values = batch[features].dropna()
+        if len(values) == 0:
+            continue
+        pending.append(scaler.transform(values))
+        # partial_fit 的每批样本数不能少于聚类数，过小的批次先暂存再合并
+        if sum(len(part) for part in pending) >= len(CLUSTER_NAMES):
+            kmeans.partial_fit(np.vstack(pending))
+            pending = []
+    if pending and hasattr(kmeans, 'cluster_centers_'):
+        kmeans.partial_fit(np.vstack(pending))
+    if not hasattr(kmeans, 'cluster_centers_'):
+        raise ValueError("可用于聚类的数据不足")
+
+    return ClusterModel.from_estimators(features, scaler, kmeans)
+
+
+def assign_cluster(
+        df: pd.DataFrame,
+        model: Optional[ClusterModel] = None,
+        batch_size: int = ASSIGN_BATCH_SIZE,
+) -> pd.DataFrame:
+    """
+    使用已保存的聚类模型为新增或变化的房源分配 cluster_label 与 cluster_type，返回带这两列的新 DataFrame。
+
+    model 为空时读取默认模型文件；特征缺失的行两列均为缺失值。
+    """
+    model = model or load_cluster_model()
+    labels = model.predict(df, batch_size=batch_size)
+    return df.assign(cluster_label=labels, cluster_type=labels.map(model.label_names))
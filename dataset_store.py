@@ -0,0 +1,294 @@
+import os
+import re
+import json
+import shutil
+import argparse
+import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# 分区存储的布局：<根目录>/<城市>/<快照日期>/listings.parquet，城市目录下可放该城市的行政边界 boundaries.geojson；
+# 根目录下的 catalog.json 记录全部分区（行数、列、经纬度范围与地图中心）
+DEFAULT_STORE_ROOT = os.path.join(os.path.dirname(__file__), "listings_store")
+PARTITION_FILE = "listings.parquet"
+BOUNDARY_FILE = "boundaries.geojson"
+CATALOG_FILE = "catalog.json"
+CATALOG_FORMAT_VERSION = "1"
+
+# 分区文件元数据中保存分区信息的键
+PARTITION_METADATA_KEY = b"listing_partition"
+
+# 城市名只允许小写字母、数字、下划线与连字符（直接作为目录名）
+CITY_PATTERN = re.compile(r'^[a-z0-9][a-z0-9_-]*$')
+
+# 由数据计算地图范围：先取两端各去掉 EXTENT_QUANTILE 的主体范围，再向外扩展 EXTENT_PADDING 倍（不超过实际坐标范围），
+# 城市外围的房源都会包含在内，而少量明显错误的坐标不会撑大范围
+EXTENT_QUANTILE = 0.005
+EXTENT_PADDING = 0.5
+
+# 本模块读取目录时只依赖标准库：应用选择城市与快照时无需导入 pandas；写入与加载分区时才按需导入
+
+
+def _check_city(city: str) -> str:
+    if not CITY_PATTERN.match(city):
+        raise ValueError(f"城市名只能包含小写字母、数字、下划线与连字符: {city}")
+    return city
+
+
+def _check_snapshot(snapshot: str) -> str:
+    try:
+        datetime.date.fromisoformat(snapshot)
+    except ValueError:
+        raise ValueError(f"快照日期必须是 YYYY-MM-DD 格式: {snapshot}")
+    return snapshot
+
+
+def partition_path(city: str, snapshot: str, root: str = DEFAULT_STORE_ROOT) -> str:
+    """
+    返回某城市某快照的分区文件路径。
+    """
+    return os.path.join(root, _check_city(city), _check_snapshot(snapshot), PARTITION_FILE)
+
+
+def boundary_path(city: str, root: str = DEFAULT_STORE_ROOT) -> Optional[str]:
+    """
+    返回城市的行政边界文件路径；该城市没有边界文件时返回 None。
+    """
+    path = os.path.join(root, _check_city(city), BOUNDARY_FILE)
+    return path if os.path.exists(path) else None
+
+
+def data_extent(df: "pd.DataFrame") -> Dict[str, List]:
+    """
+    由房源经纬度计算地图范围：{'bounds': [[纬度下限, 纬度上限], [经度下限, 经度上限]], 'center': [纬度, 经度]}。
+    """
+    import numpy as np
+    import pandas as pd
+
+    lat = pd.to_numeric(df['latitude'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    lng = pd.to_numeric(df['longitude'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    valid = ~np.isnan(lat) & ~np.isnan(lng) & ~((lat == 0) & (lng == 0))
+    if not valid.any():
+        raise ValueError("数据中没有有效的经纬度")
+
+    bounds = []
+    for values in (lat[valid], lng[valid]):
+        low, high = np.quantile(values, [EXTENT_QUANTILE, 1 - EXTENT_QUANTILE])
+        pad = max(high - low, 0.01) * EXTENT_PADDING
+        low, high = max(low - pad, values.min()), min(high + pad, values.max())
+        bounds.append([round(float(low), 6), round(float(high), 6)])
+    center = [round(float(np.median(lat[valid])), 6), round(float(np.median(lng[valid])), 6)]
+    return {'bounds': bounds, 'center': center}
+
+
+def write_partition(
+        df: "pd.DataFrame",
+        city: str,
+        snapshot: str,
+        root: str = DEFAULT_STORE_ROOT,
+        boundaries: Optional[str] = None,
+) -> str:
+    """
+    将一个城市一个快照的清洗并聚类后数据写入分区（Parquet，按 LISTING_SCHEMA 使用紧凑类型），并更新目录。
+
+    分区信息（行数、地图范围）同时写入分区文件的元数据，目录可随时由分区文件重建。
+    boundaries 为该城市的行政边界 GeoJSON，会被复制到城市目录中。返回分区文件路径。
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    import dataset_summary
+    import map_visualization as mv
+
+    path = partition_path(city, snapshot, root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df = mv.apply_listing_schema(df)
+
+    info = {'city': city, 'snapshot': snapshot, 'rows': int(len(df)), **data_extent(df)}
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[PARTITION_METADATA_KEY] = json.dumps(info, ensure_ascii=False).encode('utf-8')
+    table = table.replace_schema_metadata(metadata)
+
+    # 先写临时文件再替换，避免应用读取到写了一半的分区
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+    dataset_summary.write_summary(dataset_summary.compute_summary(df), path)
+
+    if boundaries:
+        shutil.copyfile(boundaries, os.path.join(root, city, BOUNDARY_FILE))
+    rebuild_catalog(root)
+    return path
+
+
+def _partition_info(path: str) -> Optional[dict]:
+    """
+    从分区文件的元数据读取分区信息（只读取文件尾部的元数据，不读取数据）。
+    """
+    import pyarrow.parquet as pq
+
+    try:
+        schema = pq.read_schema(path)
+        info = json.loads((schema.metadata or {})[PARTITION_METADATA_KEY].decode('utf-8'))
+    except (OSError, KeyError, ValueError):
+        return None
+    info['columns'] = [name for name in schema.names if not name.startswith('__')]
+    return info
+
+
+def rebuild_catalog(root: str = DEFAULT_STORE_ROOT) -> Dict[str, object]:
+    """
+    扫描根目录下的全部分区文件并重写目录文件，返回新的目录。
+    """
+    partitions = []
+    if os.path.isdir(root):
+        for city in sorted(os.listdir(root)):
+            city_dir = os.path.join(root, city)
+            if not os.path.isdir(city_dir) or not CITY_PATTERN.match(city):
+                continue
+            for snapshot in sorted(os.listdir(city_dir)):
+                path = os.path.join(city_dir, snapshot, PARTITION_FILE)
+                info = _partition_info(path) if os.path.exists(path) else None
+                if info is not None:
+                    info['path'] = os.path.relpath(path, root)
+                    partitions.append(info)
+
+    catalog = {'format': CATALOG_FORMAT_VERSION, 'partitions': partitions}
+    os.makedirs(root, exist_ok=True)
+    catalog_path = os.path.join(root, CATALOG_FILE)
+    tmp_path = f"{catalog_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(catalog, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, catalog_path)
+    return catalog
+
+
+def read_catalog(root: str = DEFAULT_STORE_ROOT) -> Dict[str, object]:
+    """
+    读取目录；目录不存在或已损坏时返回不含分区的空目录。
+    """
+    try:
+        with open(os.path.join(root, CATALOG_FILE), 'r', encoding='utf-8') as f:
+            catalog = json.load(f)
+    except (OSError, ValueError):
+        return {'format': CATALOG_FORMAT_VERSION, 'partitions': []}
+    if catalog.get('format') != CATALOG_FORMAT_VERSION:
+        return {'format': CATALOG_FORMAT_VERSION, 'partitions': []}
+    return catalog
+
+
+def cities(root: str = DEFAULT_STORE_ROOT) -> List[str]:
+    """
+    返回存储中的全部城市（按名称排序）。
+    """
+    return sorted({part['city'] for part in read_catalog(root)['partitions']})
+
+
+def snapshots(city: str, root: str = DEFAULT_STORE_ROOT) -> List[str]:
+    """
+    返回某城市的全部快照日期（从新到旧）。
+    """
+    return sorted((part['snapshot'] for part in read_catalog(root)['partitions'] if part['city'] == city), reverse=True)
+
+
+def select_partitions(
+        cities: Optional[Iterable[str]] = None,
+        snapshots: Union[str, Iterable[str], None] = 'latest',
+        root: str = DEFAULT_STORE_ROOT,
+) -> List[dict]:
+    """
+    按城市与快照从目录中选出分区：cities 为 None 表示全部城市；
+    snapshots 为 'latest' 时每个城市只取最新快照，为 None 时取全部快照，也可指定日期列表。
+    """
+    partitions = read_catalog(root)['partitions']
+    if cities is not None:
+        wanted_cities = set(cities)
+        partitions = [part for part in partitions if part['city'] in wanted_cities]
+    if snapshots == 'latest':
+        latest: Dict[str, str] = {}
+        for part in partitions:
+            latest[part['city']] = max(latest.get(part['city'], ''), part['snapshot'])
+        partitions = [part for part in partitions if part['snapshot'] == latest[part['city']]]
+    elif snapshots is not None:
+        wanted_snapshots = {snapshots} if isinstance(snapshots, str) else set(snapshots)
+        partitions = [part for part in partitions if part['snapshot'] in wanted_snapshots]
+    return partitions
+
+
+def partition_extent(path: str, root: str = DEFAULT_STORE_ROOT) -> Optional[Dict[str, List]]:
+    """
+    返回分区文件对应的城市（city）、地图范围（bounds、center）与城市边界文件（boundary_path）；不是存储中的分区时返回 None。
+    """
+    try:
+        relative = os.path.relpath(os.path.abspath(path), os.path.abspath(root))
+    except ValueError:  # 不同盘符
+        return None
+    for part in read_catalog(root)['partitions']:
+        if os.path.normpath(part['path']) == os.path.normpath(relative):
+            return {
+                'city': part['city'],
+                'bounds': part['bounds'],
+                'center': part['center'],
+                'boundary_path': boundary_path(part['city'], root),
+            }
+    return None
+
+
+def load_partitions(
+        cities: Optional[Iterable[str]] = None,
+        snapshots: Union[str, Iterable[str], None] = 'latest',
+        columns: Optional[Sequence[str]] = None,
+        root: str = DEFAULT_STORE_ROOT,
+) -> "pd.DataFrame":
+    """
+    只读取所选城市与快照的分区（以及 columns 中的列，为 None 时读取全部列），合并为一个 DataFrame。
+
+    结果增加 city 与 snapshot 两个类别列；内存与读取时间只与所选分区有关，与整个存储的大小无关。
+    """
+    import pandas as pd
+
+    import ingest
+    import map_visualization as mv
+
+    partitions = select_partitions(cities, snapshots, root)
+    if not partitions:
+        raise FileNotFoundError("存储中没有符合条件的分区")
+
+    frames = []
+    for part in partitions:
+        df = mv.read_parquet_listings(os.path.join(root, part['path']), columns)
+        frames.append(df.assign(
+            city=pd.Categorical([part['city']] * len(df)),
+            snapshot=pd.Categorical([part['snapshot']] * len(df)),
+        ))
+    return ingest.concat_batches(frames)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="多城市、多快照的房源分区存储")
+    parser.add_argument("--root", default=DEFAULT_STORE_ROOT, help="存储根目录")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = commands.add_parser("add", help="将清洗并聚类后的数据文件写入为一个分区")
+    add_parser.add_argument("data_path", help="清洗并聚类后的数据文件（xlsx 或 parquet）")
+    add_parser.add_argument("--city", required=True, help="城市名（如 nyc）")
+    add_parser.add_argument("--snapshot", required=True, help="快照日期（YYYY-MM-DD）")
+    add_parser.add_argument("--boundaries", default=None, help="该城市的行政边界 GeoJSON")
+
+    commands.add_parser("list", help="列出全部分区")
+    commands.add_parser("rebuild", help="由分区文件重建目录")
+    args = parser.parse_args()
+
+    if args.command == "add":
+        import map_visualization as mv
+
+        listings = mv.load_cleaned_clustered_listings(args.data_path, columns=None)
+        print(write_partition(listings, args.city, args.snapshot, args.root, args.boundaries))
+    elif args.command == "rebuild":
+        print(f"分区数: {len(rebuild_catalog(args.root)['partitions'])}")
+    else:
+        for part in read_catalog(args.root)['partitions']:
+            print(f"{part['city']}\t{part['snapshot']}\t{part['rows']} 行\t中心 {part['center']}")
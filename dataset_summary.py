@@ -0,0 +1,97 @@
+import os
+import json
+from typing import Dict, Optional
+
+# 数据集概要文件后缀（与数据源放在同一目录），以及首页平均评分使用的候选列
+SUMMARY_SUFFIX = ".summary.json"
+RATING_COLUMNS = ['review_scores_rating', 'rating', 'review_score']
+
+# 本模块只依赖标准库：首页读取概要时无需导入 pandas、folium 等重依赖，也无需解析数据文件
+
+
+def summary_path(data_path: str) -> str:
+    """
+    返回数据源对应的概要文件路径。
+    """
+    return f"{data_path}{SUMMARY_SUFFIX}"
+
+
+def _source_stamp(data_path: str) -> Dict[str, int]:
+    stat = os.stat(data_path)
+    return {'source_mtime_ns': stat.st_mtime_ns, 'source_size': stat.st_size}
+
+
+def compute_summary(df) -> Dict[str, object]:
+    """
+    计算首页展示的概要指标：房源数、平均价格、平均评分（缺少对应列时为 None）。
+    """
+    rating_column = next((col for col in RATING_COLUMNS if col in df.columns), None)
+    price_sum, price_count = _totals(df, 'price')
+    rating_sum, rating_count = _totals(df, rating_column)
+    return _summary(int(len(df)), price_sum, price_count, rating_column, rating_sum, rating_count)
+
+
+def _totals(df, column: Optional[str]):
+    if column is None or column not in df.columns:
+        return 0.0, 0
+    return float(df[column].sum()), int(df[column].count())
+
+
+def _summary(rows, price_sum, price_count, rating_column, rating_sum, rating_count):
+    # 同时保存求和与计数，增量刷新时可直接在旧概要上修补（见 patch_summary），无需重新读取全部数据
+    return {
+        'rows': rows,
+        'mean_price': price_sum / price_count if price_count else None,
+        'rating_column': rating_column,
+        'mean_rating': rating_sum / rating_count if rating_column and rating_count else None,
+        'price_sum': price_sum,
+        'price_count': price_count,
+        'rating_sum': rating_sum,
+        'rating_count': rating_count,
+    }
+
+
+def patch_summary(summary: Dict[str, object], removed, added) -> Optional[Dict[str, object]]:
+    """
+    在已有概要上减去 removed 中的行、加上 added 中的行（增量刷新时使用）；
+    旧概要缺少求和字段（由旧版本写入）时返回 None，由调用方重新完整计算。
+    """
+    if any(key not in summary for key in ('price_sum', 'price_count', 'rating_sum', 'rating_count')):
+        return None
+    rating_column = summary['rating_column']
+    totals = {}
+    for name, column in (('price', 'price'), ('rating', rating_column)):
+        old_sum, old_count = _totals(removed, column)
+        new_sum, new_count = _totals(added, column)
+        totals[name] = (summary[f'{name}_sum'] - old_sum + new_sum, summary[f'{name}_count'] - old_count + new_count)
+    return _summary(int(summary['rows']) - len(removed) + len(added), *totals['price'], rating_column, *totals['rating'])
+
+
+def write_summary(summary: Dict[str, object], data_path: str) -> None:
+    """
+    将概要与数据源的修改时间、大小一起写入概要文件；写入失败不影响调用方。
+    """
+    path = summary_path(data_path)
+    try:
+        payload = {**summary, **_source_stamp(data_path)}
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def read_summary(data_path: str) -> Optional[Dict[str, object]]:
+    """
+    读取数据源的概要；概要不存在、已损坏或数据源已变化时返回 None。
+    """
+    try:
+        with open(summary_path(data_path), 'r', encoding='utf-8') as f:
+            summary = json.load(f)
+        stamp = _source_stamp(data_path)
+    except (OSError, ValueError):
+        return None
+    if any(summary.get(key) != value for key, value in stamp.items()):
+        return None
+    return summary
@@ -0,0 +1,87 @@
+import io
+import gzip
+from typing import IO, Dict, Iterator, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # 未安装 pyarrow 时不提供 Parquet 格式
+    pa = None
+    pq = None
+
+# 支持的导出格式：格式键 -> (显示名称, 文件扩展名, MIME 类型)
+EXPORT_FORMATS: Dict[str, Tuple[str, str, str]] = {
+    'csv': ('CSV', '.csv', 'text/csv'),
+    'csv.gz': ('CSV (gzip)', '.csv.gz', 'application/gzip'),
+    'parquet': ('Parquet', '.parquet', 'application/vnd.apache.parquet'),
+}
+
+# 每次写出的行数
+EXPORT_CHUNK_ROWS = 50_000
+
+
+def available_formats() -> Dict[str, Tuple[str, str, str]]:
+    """
+    返回当前环境可用的导出格式（未安装 pyarrow 时不含 Parquet）。
+    """
+    return {key: value for key, value in EXPORT_FORMATS.items() if key != 'parquet' or pq is not None}
+
+
+def iter_csv_chunks(df: pd.DataFrame, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    """
+    分块生成 CSV 内容（UTF-8 编码），拼接结果与 df.to_csv(index=False) 相同；表头只在第一块中输出。
+    """
+    if len(df) == 0:
+        yield df.to_csv(index=False).encode('utf-8')
+        return
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(index=False, header=(start == 0)).encode('utf-8')
+
+
+def write_export(df: pd.DataFrame, fmt: str, fileobj: IO[bytes], chunk_rows: int = EXPORT_CHUNK_ROWS) -> None:
+    """
+    按 fmt 将 df 分块写入二进制文件对象，不在内存中生成完整的导出内容。
+    """
+    if fmt == 'csv':
+        for chunk in iter_csv_chunks(df, chunk_rows):
+            fileobj.write(chunk)
+    elif fmt == 'csv.gz':
+        with gzip.GzipFile(fileobj=fileobj, mode='wb') as compressed:
+            for chunk in iter_csv_chunks(df, chunk_rows):
+                compressed.write(chunk)
+    elif fmt == 'parquet':
+        if pq is None:
+            raise ValueError("导出 Parquet 需要安装 pyarrow")
+        writer = None
+        try:
+            for start in range(0, max(len(df), 1), chunk_rows):
+                table = pa.Table.from_pandas(df.iloc[start:start + chunk_rows], preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(fileobj, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+
+
+def export_file(df: pd.DataFrame, fmt: str = 'csv', chunk_rows: int = EXPORT_CHUNK_ROWS) -> io.BytesIO:
+    """
+    分块生成导出文件，返回定位到开头的 BytesIO。
+
+    适合作为 st.download_button 的 data 回调（Streamlit 只接受 bytes / BytesIO 等类型）：只有点击下载时才会生成。
+    """
+    fileobj = io.BytesIO()
+    write_export(df, fmt, fileobj, chunk_rows)
+    fileobj.seek(0)
+    return fileobj
+
+
+def export_filename(stem: str, fmt: str) -> str:
+    """
+    返回带对应扩展名的导出文件名。
+    """
+    return stem + EXPORT_FORMATS[fmt][1]
@@ -0,0 +1,242 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Iterator, Sequence, Dict, List, Callable, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from instrumentation import get_logger
+
+logger = get_logger(__name__)
+
+# Inside Airbnb 原始 listings 中各分析脚本实际用到的列及其紧凑类型（其余自由文本列一律不读取）
+LISTING_DTYPES: Dict[str, str] = {
+    'id': 'int64',
+    'neighbourhood_cleansed': 'category',
+    'neighbourhood_group_cleansed': 'category',
+    'latitude': 'float64',
+    'longitude': 'float64',
+    'room_type': 'category',
+    'price': 'float64',
+    'accommodates': 'float32',
+    'review_scores_rating': 'float32',
+    'number_of_reviews': 'float32',
+}
+DEFAULT_COLUMNS: List[str] = list(LISTING_DTYPES)
+
+# 每批读取的行数
+DEFAULT_CHUNKSIZE = 100_000
+
+# 网址匹配正则表达式（与清洗脚本原有规则一致），以及文本列数达到多少时改为多线程并行匹配
+URL_PATTERN = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
+PARALLEL_MIN_COLUMNS = 4
+
+
+def parse_price(values: pd.Series) -> pd.Series:
+    """
+    将 "$1,234.00" 形式的价格文本解析为浮点数：与价格分析脚本相同，先去除数字和小数点以外的字符，无法解析的值为 NaN。
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype('float64')
+    text = values.astype('string').str.replace(r'[^\d.]', '', regex=True)
+    parsed = pd.to_numeric(text, errors='coerce').astype('float64')
+    unparsed = int((values.notna() & parsed.isna()).sum())
+    if unparsed:
+        # 这些行之后会和没有价格的行一样被删除，记录下来以免静默丢失
+        logger.warning("有 %d 个价格无法解析，按缺失值处理", unparsed)
+    return parsed
+
+
+def _apply_dtypes(batch: pd.DataFrame, compact: bool = True) -> pd.DataFrame:
+    """
+    按 LISTING_DTYPES 将一批数据转换为紧凑类型；未登记的列保持原样。compact 为 False 时只解析价格。
+    """
+    for col in batch.columns:
+        dtype = LISTING_DTYPES.get(col)
+        if col == 'price':
+            batch[col] = parse_price(batch[col])
+        elif not compact:
+            continue
+        elif dtype == 'category':
+            batch[col] = batch[col].astype('category')
+        elif dtype is not None:
+            values = pd.to_numeric(batch[col], errors='coerce')
+            if np.issubdtype(np.dtype(dtype), np.integer) and values.isna().any():
+                # 整数列出现缺失值时退回浮点，避免转换失败
+                dtype = 'float64'
+            batch[col] = values.astype(dtype)
+    return batch
+
+
+def _iter_csv(path: str, columns: Optional[Sequence[str]], chunksize: int, compact: bool) -> Iterator[pd.DataFrame]:
+    # 文本类列先按字符串读入，数值列交给 _apply_dtypes 转换，避免脏数据导致整批读取失败
+    known = columns if columns is not None else list(LISTING_DTYPES)
+    dtype = {
+        col: 'string' for col in known
+        if (compact and LISTING_DTYPES.get(col) in ('category', None)) or col == 'price'
+    }
+    reader = pd.read_csv(
+        path,
+        usecols=(lambda col: col in set(columns)) if columns is not None else None,
+        dtype=dtype,
+        chunksize=chunksize,
+        low_memory=True,
+    )
+    for batch in reader:
+        yield batch
+
+
+def _iter_excel(path: str, columns: Optional[Sequence[str]], chunksize: int, sheet_name: Optional[str]) -> Iterator[pd.DataFrame]:
+    from openpyxl import load_workbook  # 仅读取 Excel 时才需要
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = [str(col).strip() if col is not None else '' for col in next(rows, ())]
+        picked = [i for i, col in enumerate(header) if columns is None or col in columns]
+        names = [header[i] for i in picked]
+
+        buffer = []
+        for row in rows:
+            buffer.append([row[i] if i < len(row) else None for i in picked])
+            if len(buffer) >= chunksize:
+                yield pd.DataFrame(buffer, columns=names)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=names)
+    finally:
+        workbook.close()
+
+
+def iter_listings(
+        path: str,
+        columns: Optional[Sequence[str]] = DEFAULT_COLUMNS,
+        chunksize: int = DEFAULT_CHUNKSIZE,
+        sheet_name: Optional[str] = None,
+        clean: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+        compact: bool = True,
+) -> Iterator[pd.DataFrame]:
+    """
+    分批读取原始房源数据（CSV、CSV.GZ 或 XLSX），只读取 columns 中的列（为 None 时读取全部列），逐批返回已转换类型的 DataFrame。
+
+    price 列会被解析为数值；compact 为 False 时其余列保留 pandas 默认类型（不转为类别 / float32）。
+    clean 可对每批做逐行清洗（如删除无价格的行），空批次不返回。
+    每批的类别列各自独立编码，需要合并时请使用 concat_batches。
+    峰值内存只与批大小和所选列有关，与文件总大小无关。
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"未找到数据文件: {path}")
+    columns = list(columns) if columns is not None else None
+
+    if path.lower().endswith(('.xlsx', '.xlsm')):
+        batches = _iter_excel(path, columns, chunksize, sheet_name)
+    else:
+        batches = _iter_csv(path, columns, chunksize, compact)
+
+    for batch in batches:
+        batch = _apply_dtypes(batch, compact)
+        if clean is not None:
+            batch = clean(batch)
+        if len(batch):
+            yield batch
+
+
+def concat_batches(batches: Sequence[pd.DataFrame]) -> pd.DataFrame:
+    """
+    合并多批数据：类别列通过 union_categoricals 合并，保持类别类型而不退化为对象列。
+    """
+    batches = list(batches)
+    if not batches:
+        return pd.DataFrame()
+    if len(batches) == 1:
+        return batches[0].reset_index(drop=True)
+
+    merged = {}
+    for col in batches[0].columns:
+        parts = [batch[col] for batch in batches]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            merged[col] = pd.Series(union_categoricals(parts), name=col)
+        else:
+            merged[col] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(merged)
+
+
+def read_listings(
+        path: str,
+        columns: Optional[Sequence[str]] = DEFAULT_COLUMNS,
+        chunksize: int = DEFAULT_CHUNKSIZE,
+        sheet_name: Optional[str] = None,
+        clean: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+        compact: bool = True,
+) -> pd.DataFrame:
+    """
+    分批读取、清洗并合并为一个 DataFrame（只包含所需列，类型紧凑）。
+    """
+    return concat_batches(iter_listings(path, columns, chunksize, sheet_name, clean, compact))
+
+
+def _text_columns(df: pd.DataFrame) -> List[str]:
+    """
+    返回可能包含文本的列：对象列、字符串列以及类别列。
+    """
+    return [
+        col for col in df.columns
+        if pd.api.types.is_object_dtype(df[col])
+        or pd.api.types.is_string_dtype(df[col])
+        or isinstance(df[col].dtype, pd.CategoricalDtype)
+    ]
+
+
+def _contains_url(values: pd.Series) -> np.ndarray:
+    """
+    返回每个单元格是否包含网址的布尔数组；非字符串值视为不包含。
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # 类别列只需匹配各个类别一次，再按编码展开
+        categories = values.cat.categories
+        if not (pd.api.types.is_object_dtype(categories) or pd.api.types.is_string_dtype(categories)):
+            return np.zeros(len(values), dtype=bool)
+        matched = categories.to_series().str.contains(URL_PATTERN, regex=True, na=False).to_numpy(dtype=bool)
+        codes = values.cat.codes.to_numpy()
+        return np.where(codes >= 0, matched[codes], False)
+    try:
+        return values.str.contains(URL_PATTERN, regex=True, na=False).to_numpy(dtype=bool, na_value=False)
+    except AttributeError:
+        # 对象列中没有任何字符串（如全是数字）时 .str 不可用
+        return np.zeros(len(values), dtype=bool)
+
+
+def find_url_rows(
+        df: pd.DataFrame,
+        columns: Optional[Sequence[str]] = None,
+        max_workers: Optional[int] = None,
+) -> Tuple[np.ndarray, Dict[str, int]]:
+    """
+    一次性检查所有文本列中是否包含网址，返回 (任一列含网址的行的布尔数组, 各列匹配行数)。
+
+    文本列较多时按列分配到线程池并行匹配（Arrow 字符串列的正则匹配会释放 GIL，可利用多核）。
+    """
+    columns = list(columns) if columns is not None else _text_columns(df)
+    if len(columns) >= PARALLEL_MIN_COLUMNS and max_workers != 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            matches = list(pool.map(lambda col: _contains_url(df[col]), columns))
+    else:
+        matches = [_contains_url(df[col]) for col in columns]
+
+    has_url = np.logical_or.reduce(matches) if matches else np.zeros(len(df), dtype=bool)
+    counts = {col: int(match.sum()) for col, match in zip(columns, matches)}
+    return has_url, counts
+
+
+def drop_url_rows(
+        df: pd.DataFrame,
+        columns: Optional[Sequence[str]] = None,
+        max_workers: Optional[int] = None,
+) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    删除任一文本列包含网址的行，返回 (剩余数据, 各列匹配行数)。
+    """
+    has_url, counts = find_url_rows(df, columns, max_workers)
+    return df[~has_url], counts
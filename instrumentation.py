@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# 日志器名称前缀与控制日志级别的环境变量（默认只输出警告及以上）
+LOGGER_NAME = "airbnb"
+LOG_LEVEL_ENV = "AIRBNB_LOG_LEVEL"
+DEFAULT_LOG_LEVEL = "WARNING"
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s %(message)s"
+
+# 单次记录最多保留的阶段数，避免异常情况下无限增长
+MAX_SPANS = 1000
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    返回本项目的模块日志器（统一挂在 LOGGER_NAME 下，便于整体控制级别）。
+    """
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+logger = get_logger(__name__)
+
+
+def configure_logging(level: Optional[str] = None) -> None:
+    """
+    按 level（为空时读取环境变量 AIRBNB_LOG_LEVEL）设置日志级别，并在首次调用时添加输出到 stderr 的处理器。
+    """
+    root = logging.getLogger(LOGGER_NAME)
+    root.setLevel((level or os.environ.get(LOG_LEVEL_ENV) or DEFAULT_LOG_LEVEL).upper())
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        root.addHandler(handler)
+        root.propagate = False
+
+
+def _current_rss_bytes() -> Optional[int]:
+    """
+    当前进程的常驻内存（字节）；仅在 Linux 上可用，其他平台返回 None。
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class Span:
+    """
+    一个被记录的阶段：耗时、输入 / 输出行数、负载字节数、常驻内存变化以及其他属性。
+
+    代码在 with span(...) 块内可设置 rows_out、payload_bytes 或向 attrs 写入任意属性。
+    """
+
+    __slots__ = ('name', 'start', 'duration', 'rows_in', 'rows_out', 'payload_bytes', 'rss_delta',
+                 'attrs', 'depth', 'thread_id', 'enabled')
+
+    def __init__(self, name: str, rows_in: Optional[int] = None, attrs: Optional[dict] = None, enabled: bool = True):
+        self.name = name
+        self.start = 0.0
+        self.duration = 0.0
+        self.rows_in = rows_in
+        self.rows_out: Optional[int] = None
+        self.payload_bytes: Optional[int] = None
+        self.rss_delta: Optional[int] = None
+        self.attrs = dict(attrs or {})
+        self.depth = 0
+        self.thread_id = threading.get_ident()
+        self.enabled = enabled
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            'name': self.name,
+            'depth': self.depth,
+            'duration_ms': round(self.duration * 1000, 3),
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'payload_bytes': self.payload_bytes,
+            'rss_delta_mb': round(self.rss_delta / 1024 / 1024, 3) if self.rss_delta is not None else None,
+            **{f'attr.{key}': value for key, value in self.attrs.items()},
+        }
+
+
+class Tracer:
+    """
+    收集一次运行（如 Streamlit 的一次页面重新运行）中的全部阶段。
+    """
+
+    def __init__(self, max_spans: int = MAX_SPANS):
+        self.spans: List[Span] = []
+        self.max_spans = max_spans
+        self.origin = time.perf_counter()
+
+    def add(self, item: Span) -> None:
+        if len(self.spans) < self.max_spans:
+            self.spans.append(item)
+
+    def to_frame(self) -> "pd.DataFrame":
+        """
+        以表格形式返回各阶段（按开始时间排序）。
+        """
+        import pandas as pd  # 只在显示开发者面板时需要
+
+        return pd.DataFrame([item.to_dict() for item in sorted(self.spans, key=lambda s: s.start)])
+
+    def to_chrome_trace(self) -> str:
+        """
+        导出为 Chrome Trace Event 格式的 JSON，可在 chrome://tracing 或 Perfetto 中查看。
+        """
+        events = []
+        for item in self.spans:
+            args = {key: value for key, value in item.to_dict().items() if value is not None and key != 'name'}
+            events.append({
+                'name': item.name,
+                'ph': 'X',
+                'ts': round((item.start - self.origin) * 1e6, 1),
+                'dur': round(item.duration * 1e6, 1),
+                'pid': os.getpid(),
+                'tid': item.thread_id,
+                'args': {key: value if isinstance(value, (int, float, str, bool)) else str(value)
+                         for key, value in args.items()},
+            })
+        return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'}, ensure_ascii=False)
+
+
+_current_tracer: ContextVar[Optional[Tracer]] = ContextVar('current_tracer', default=None)
+_current_depth: ContextVar[int] = ContextVar('current_depth', default=0)
+
+
+def start_tracing() -> Tracer:
+    """
+    在当前线程（上下文）开始记录，返回新的 Tracer。
+    """
+    tracer = Tracer()
+    _current_tracer.set(tracer)
+    return tracer
+
+
+def stop_tracing() -> None:
+    _current_tracer.set(None)
+
+
+def tracing_enabled() -> bool:
+    """
+    当前是否在记录阶段（未记录时调用方可跳过只为统计而做的额外计算，如计算负载大小）。
+    """
+    return _current_tracer.get() is not None
+
+
+@contextmanager
+def span(name: str, rows_in: Optional[int] = None, **attrs) -> Iterator[Span]:
+    """
+    记录一个阶段。既未开始记录、也未开启 DEBUG 日志时只返回一个不计时的空对象，开销可以忽略。
+    """
+    tracer = _current_tracer.get()
+    log_debug = logger.isEnabledFor(logging.DEBUG)
+    if tracer is None and not log_debug:
+        yield Span(name, rows_in, attrs, enabled=False)
+        return
+
+    item = Span(name, rows_in, attrs)
+    item.depth = _current_depth.get()
+    depth_token = _current_depth.set(item.depth + 1)
+    rss_before = _current_rss_bytes()
+    item.start = time.perf_counter()
+    try:
+        yield item
+    finally:
+        item.duration = time.perf_counter() - item.start
+        rss_after = _current_rss_bytes()
+        if rss_before is not None and rss_after is not None:
+            item.rss_delta = rss_after - rss_before
+        _current_depth.reset(depth_token)
+        if tracer is not None:
+            tracer.add(item)
+        if log_debug:
+            logger.debug(
+                "span=%s duration_ms=%.1f rows_in=%s rows_out=%s payload_bytes=%s %s",
+                name, item.duration * 1000, item.rows_in, item.rows_out, item.payload_bytes,
+                " ".join(f"{key}={value}" for key, value in item.attrs.items()),
+            )
@@ -1,65 +1,400 @@
 import os
+import json
+import hashlib
+import numpy as np
 import pandas as pd
-from typing import Optional, Tuple, Dict, Iterable
-import folium
-from folium import GeoJson
-from folium.plugins import HeatMap
+from typing import Optional, Tuple, Dict, Iterable, Sequence, TYPE_CHECKING
+
+if TYPE_CHECKING:  # folium（连同 requests 等依赖）只在生成地图时才导入
+    import folium
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # 未安装 pyarrow 时退化为每次直接读取 Excel
+    pa = None
+    pq = None
+
+import dataset_summary
+from boundaries import DEFAULT_BOUNDARY_PATH, get_borough_boundaries, zoom_tolerance
+from instrumentation import get_logger, span
 
 # 默认数据源：清洗并聚类后的房源数据.xlsx（与本文件同目录）
 DEFAULT_DATA_PATH = os.path.join(os.path.dirname(__file__), "清洗并聚类后的房源数据.xlsx")
 
-# 在map_visualization.py中添加以下代码
-import requests  # 需要导入requests库用于from folium import GeoJson  # 导入GeoJson组件
+# 列式缓存文件后缀，缓存与源文件放在同一目录；缓存内容的格式版本（类型规则变化时递增，使旧缓存失效）
+CACHE_SUFFIX = ".cache.parquet"
+CACHE_FORMAT_VERSION = "3"
+
+# 增量刷新写出的修补文件后缀（与数据文件同目录，见 refresh.py），修补文件中各行的内容哈希列，以及房源的唯一键
+DELTA_SUFFIX = ".delta.parquet"
+DELTA_HASH_COLUMN = "_row_hash"
+LISTING_KEY = 'id'
+
+# 各列在内存中的紧凑类型：'category' 为低基数文本列，'integer' 为按取值范围自动缩小的整数列，
+# 'float32' 为无需高精度的浮点列，'float64' 为需要保留精度的列（经纬度、价格、评分）；未登记的列保持原样。
+# 缩小后的整数列在刷新合并新数据时会按需放宽（见 merge_listing_rows），不会溢出
+LISTING_SCHEMA: Dict[str, str] = {
+    'id': 'integer',
+    'host_id': 'integer',
+    'host_location': 'category',
+    'host_neighbourhood': 'category',
+    'neighborhood': 'category',
+    'neighbourhood': 'category',
+    'neighbourhood_cleansed': 'category',
+    'neighbourhood_group_cleansed': 'category',
+    'latitude': 'float64',
+    'longitude': 'float64',
+    'room_type': 'category',
+    'accommodates': 'integer',
+    'price': 'float64',
+    'minimum_nights': 'integer',
+    'maximum_nights': 'integer',
+    'number_of_reviews': 'integer',
+    'review_scores_rating': 'float64',
+    'reviews_per_month': 'float32',
+    'cluster_label': 'integer',
+    'cluster_type': 'category',
+}
+
+# 仪表盘实际读取的列；加载时默认只保留这些列（房源名称、描述、执照等长文本按需通过 columns 参数读取）
+DASHBOARD_COLUMNS = [
+    'id', 'name', 'neighborhood', 'neighbourhood', 'neighbourhood_cleansed',
+    'latitude', 'longitude', 'room_type', 'accommodates', 'price',
+    'number_of_reviews', 'review_scores_rating', 'cluster_label', 'cluster_type',
+]
+
+# 社区列的候选列名（按顺序取第一个存在的列）；筛选索引中另外为以下类别列建立位图
+NEIGHBORHOOD_COLUMNS = ['neighborhood', 'neighbourhood', 'neighbourhood_cleansed']
+INDEXED_CATEGORY_COLUMNS = ['room_type', 'cluster_type']
+
+# 纽约大致经纬度范围 ((纬度下限, 纬度上限), (经度下限, 经度上限)) 与地图默认中心；其他城市的范围由数据计算（见 dataset_store）
+NYC_BOUNDS = ((40.4, 41.0), (-74.5, -73.5))
+NYC_CENTER = (40.7128, -74.0060)
+
+# 热力图预聚合：预先计算的缩放级别、每个网格的像素边长、发送到浏览器的最大网格数
+HEATMAP_BIN_ZOOMS = tuple(range(8, 16))
+HEATMAP_CELL_PIXELS = 4
+HEATMAP_MAX_CELLS = 5000
+
+# 流水线预先计算的热力图网格文件后缀（与数据文件同目录，见 pipeline.py 的 map_bins 阶段）
+HEATMAP_BINS_SUFFIX = ".bins.npz"
+
+logger = get_logger(__name__)
+
+
+def _valid_coordinates(df: pd.DataFrame, bounds=NYC_BOUNDS) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    返回 (纬度数组, 经度数组, 是否为 bounds 范围内有效坐标的布尔数组)。
+    """
+    lat = pd.to_numeric(df['latitude'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    lng = pd.to_numeric(df['longitude'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+
+    # NaN 参与比较结果为 False，因此范围判断同时完成了缺失值过滤
+    (lat_min, lat_max), (lng_min, lng_max) = bounds
+    mask = (lat >= lat_min) & (lat <= lat_max) & (lng >= lng_min) & (lng <= lng_max)
+    return lat, lng, mask
+
+
+def _heat_weights(df: pd.DataFrame, weight_column: str) -> np.ndarray:
+    """
+    将权重列除以其 99 分位数并截断到 [0, 1]（避免极端值压低其余点），缺失值保留为 NaN。
+    """
+    weight = pd.to_numeric(df[weight_column], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    valid = weight[~np.isnan(weight)]
+    scale = np.percentile(valid, 99) if len(valid) else 0
+    if scale > 0:
+        return np.clip(weight / scale, 0, 1)
+    return np.where(np.isnan(weight), np.nan, 1.0)
+
+
+def heat_points(df: pd.DataFrame, weight_column: Optional[str] = None, bounds=NYC_BOUNDS) -> np.ndarray:
+    """
+    提取热力图点 [纬度, 经度, 权重]，返回 (n, 3) 数组。
+
+    经纬度缺失或超出 bounds（默认纽约大致范围）的行被剔除；weight_column 为空时权重固定为 1，
+    否则使用该列数值除以其 99 分位数并截断到 [0, 1]（避免极端值压低其余点），该列缺失的行同样剔除。
+    """
+    if 'latitude' not in df.columns or 'longitude' not in df.columns:
+        return np.empty((0, 3))
+
+    lat, lng, mask = _valid_coordinates(df, bounds)
+    if weight_column:
+        weight = _heat_weights(df, weight_column)
+        mask &= ~np.isnan(weight)
+        weight = weight[mask]
+    else:
+        weight = np.ones(int(mask.sum()))
+
+    return np.column_stack([lat[mask], lng[mask], weight])
+
+
+def subset_positions(full_index: pd.Index, subset: pd.DataFrame) -> Optional[np.ndarray]:
+    """
+    将子集（如 filter_listings 的结果）的行映射为完整数据中的行位置；无法一一对应时返回 None。
+    """
+    if not full_index.is_unique:
+        return None
+    positions = full_index.get_indexer(subset.index)
+    if (positions < 0).any():
+        return None
+    return positions
+
+
+class HeatmapBins:
+    """
+    热力图空间预聚合：加载数据时为每个缩放级别预先计算每行所属的经纬度网格。
+
+    筛选后只需按网格累加命中行的权重（np.bincount），浏览器收到的是网格而不是逐个房源。
+    网格边长约为 HEATMAP_CELL_PIXELS 个像素，小于 Leaflet.heat 自身的聚合单元（(radius + blur) / 2），
+    因此在对应缩放级别下热力图外观与逐点绘制一致。
+    """
+
+    def __init__(self, df: pd.DataFrame, zoom_levels: Iterable[int] = HEATMAP_BIN_ZOOMS, bounds=NYC_BOUNDS):
+        self.bounds = bounds
+        lat, lng, mask = _valid_coordinates(df, bounds)
+        lat, lng = np.where(mask, lat, 0.0), np.where(mask, lng, 0.0)
+        keys = {zoom: self._cell_keys(lat, lng, zoom) for zoom in sorted(zoom_levels)}
+        self._set_rows(df.index, lat, lng, mask, keys)
+
+    @staticmethod
+    def _cell_keys(lat: np.ndarray, lng: np.ndarray, zoom: int) -> np.ndarray:
+        size = zoom_tolerance(zoom) * HEATMAP_CELL_PIXELS
+        return np.floor(lat / size).astype(np.int64) * 1_000_000_007 + np.floor(lng / size).astype(np.int64)
+
+    def _set_rows(
+            self,
+            index: pd.Index,
+            lat: np.ndarray,
+            lng: np.ndarray,
+            mask: np.ndarray,
+            keys: Dict[int, np.ndarray],
+    ) -> None:
+        self.index = index
+        self.lat = lat
+        self.lng = lng
+        self.valid = mask
+        self.cell_keys = keys
+
+        # 每个缩放级别：(每行的网格编号，无效坐标为 -1；网格总数)
+        self.cell_codes: Dict[int, Tuple[np.ndarray, int]] = {}
+        for zoom, zoom_keys in keys.items():
+            cell_ids, uniques = pd.factorize(zoom_keys[mask])
+            codes = np.full(len(mask), -1, dtype=np.int32)
+            codes[mask] = cell_ids
+            self.cell_codes[zoom] = (codes, len(uniques))
+
+    def patched(self, df: pd.DataFrame, source_positions: np.ndarray) -> "HeatmapBins":
+        """
+        为更新后的数据生成新的网格：source_positions[i] 为第 i 行在原数据中的位置（-1 表示新增或已变化），
+        未变化的行直接复用原有网格键，只为新增或变化的行重新计算。
+        """
+        source_positions = np.asarray(source_positions, dtype=np.int64)
+        reused = source_positions >= 0
+        fresh = np.flatnonzero(~reused)
+
+        lat = np.zeros(len(df))
+        lng = np.zeros(len(df))
+        mask = np.zeros(len(df), dtype=bool)
+        lat[reused] = self.lat[source_positions[reused]]
+        lng[reused] = self.lng[source_positions[reused]]
+        mask[reused] = self.valid[source_positions[reused]]
+
+        fresh_lat, fresh_lng, fresh_mask = _valid_coordinates(df.iloc[fresh], self.bounds)
+        lat[fresh] = np.where(fresh_mask, fresh_lat, 0.0)
+        lng[fresh] = np.where(fresh_mask, fresh_lng, 0.0)
+        mask[fresh] = fresh_mask
+
+        keys = {}
+        for zoom, old_keys in self.cell_keys.items():
+            zoom_keys = np.zeros(len(df), dtype=np.int64)
+            zoom_keys[reused] = old_keys[source_positions[reused]]
+            zoom_keys[fresh] = self._cell_keys(lat[fresh], lng[fresh], zoom)
+            keys[zoom] = zoom_keys
+
+        bins = HeatmapBins.__new__(HeatmapBins)
+        bins.bounds = self.bounds
+        bins._set_rows(df.index, lat, lng, mask, keys)
+        return bins
+
+    def positions_of(self, subset: pd.DataFrame) -> Optional[np.ndarray]:
+        """
+        将筛选结果映射回完整数据中的行位置；无法对应（例如不是同一份数据的子集）时返回 None。
+        """
+        return subset_positions(self.index, subset)
+
+    def aggregate(
+            self,
+            positions: np.ndarray,
+            weights: Optional[np.ndarray] = None,
+            zoom: int = HEATMAP_BIN_ZOOMS[-1],
+            max_cells: int = HEATMAP_MAX_CELLS,
+    ) -> np.ndarray:
+        """
+        按网格汇总指定行，返回 (k, 3) 的 [纬度, 经度, 权重之和]，网格位置取其中房源的加权中心。
+
+        从 zoom 开始，若非空网格数超过 max_cells，则逐级改用更粗的网格。
+        weights 与 positions 一一对应，缺省时每个房源权重为 1，缺失权重按 0 处理。
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        if weights is None:
+            weights = np.ones(len(positions))
+        else:
+            weights = np.nan_to_num(np.asarray(weights, dtype=float), nan=0.0)
+
+        keep = self.valid[positions] & (weights > 0)
+        positions, weights = positions[keep], weights[keep]
+
+        zooms = [z for z in sorted(self.cell_codes, reverse=True) if z <= zoom] or [min(self.cell_codes)]
+        for level in zooms:
+            codes, n_cells = self.cell_codes[level]
+            cells = codes[positions]
+            totals = np.bincount(cells, weights=weights, minlength=n_cells)
+            occupied = np.flatnonzero(totals)
+            if len(occupied) <= max_cells or level == zooms[-1]:
+                break
+
+        lat_sum = np.bincount(cells, weights=weights * self.lat[positions], minlength=n_cells)
+        lng_sum = np.bincount(cells, weights=weights * self.lng[positions], minlength=n_cells)
+        totals = totals[occupied]
+        return np.column_stack([lat_sum[occupied] / totals, lng_sum[occupied] / totals, totals])
+
+
+def build_heatmap_bins(df: pd.DataFrame, bounds=NYC_BOUNDS) -> HeatmapBins:
+    """
+    为房源数据构建热力图网格（建议在加载数据后调用一次并与数据一起缓存）；bounds 为城市的经纬度范围。
+    """
+    return HeatmapBins(df, bounds=bounds)
+
+
+def heatmap_bins_path(data_path: str) -> str:
+    """
+    返回数据文件对应的预计算热力图网格文件路径。
+    """
+    root, _ = os.path.splitext(data_path)
+    return root + HEATMAP_BINS_SUFFIX
+
+
+def _rows_fingerprint(df: pd.DataFrame) -> str:
+    """
+    房源 id 与经纬度（按行顺序）的内容哈希：预计算的网格只有在行顺序与坐标都一致时才能复用。
+    """
+    digest = hashlib.sha256()
+    digest.update(df[LISTING_KEY].to_numpy(dtype='<i8').tobytes())
+    for col in ('latitude', 'longitude'):
+        digest.update(pd.to_numeric(df[col], errors='coerce').to_numpy(dtype='<f8', na_value=np.nan).tobytes())
+    return digest.hexdigest()
+
+
+def write_heatmap_bins(bins: HeatmapBins, df: pd.DataFrame, data_path: str) -> None:
+    """
+    将 df 的热力图网格写入数据文件旁的 .bins.npz，并记录 df 的行指纹（数据文件可以稍后再写出）。
+    """
+    arrays = {f"keys_{zoom}": keys for zoom, keys in bins.cell_keys.items()}
+    path = heatmap_bins_path(data_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(
+            f,
+            fingerprint=np.array(_rows_fingerprint(df)),
+            bounds=np.asarray(bins.bounds, dtype=float),
+            lat=bins.lat,
+            lng=bins.lng,
+            valid=bins.valid,
+            **arrays,
+        )
+    os.replace(tmp_path, path)
+
+
+def read_heatmap_bins(df: pd.DataFrame, data_path: str, bounds=NYC_BOUNDS) -> Optional[HeatmapBins]:
+    """
+    读取预计算的热力图网格；文件不存在、行指纹或经纬度范围与 df / bounds 不一致时返回 None（由调用方重新构建）。
+    """
+    path = heatmap_bins_path(data_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as stored:
+            if (str(stored['fingerprint']) != _rows_fingerprint(df)
+                    or not np.array_equal(stored['bounds'], np.asarray(bounds, dtype=float))):
+                return None
+            keys = {int(name[len('keys_'):]): stored[name] for name in stored.files if name.startswith('keys_')}
+            lat, lng, valid = stored['lat'], stored['lng'], stored['valid']
+    except Exception as e:
+        logger.warning("读取预计算的热力图网格时出错，将重新构建: %s", e)
+        return None
+    bins = HeatmapBins.__new__(HeatmapBins)
+    bins.bounds = bounds
+    bins._set_rows(df.index, lat, lng, valid, keys)
+    return bins
+
+
+def _boundary_style(feature: dict) -> dict:
+    # 模块级函数而非 lambda：生成的地图可以被序列化（如由 st.cache_data 缓存）
+    return {
+        'color': 'black',  # 边界线颜色
+        'weight': 2,       # 线宽
+        'fillOpacity': 0   # 填充透明度（0表示不填充）
+    }
+
 
 def create_nyc_folium_heatmap(
         df: pd.DataFrame,
-        title: str = "纽约房源热力图"
-) -> folium.Map:
+        title: str = "纽约房源热力图",
+        weight_column: Optional[str] = None,
+        zoom_start: int = 11,
+        bins: Optional[HeatmapBins] = None,
+        center: Optional[Sequence[float]] = None,
+        bounds=NYC_BOUNDS,
+        boundary_path: Optional[str] = DEFAULT_BOUNDARY_PATH,
+) -> "folium.Map":
     """
     使用 Folium 创建纽约房源热力图，包含行政边界
+
+    weight_column 可指定按某列（如 price、number_of_reviews）加权，默认每个房源权重为 1。
+    传入 bins（build_heatmap_bins 的结果，且 df 是其数据的子集）时，热力图按预聚合网格生成，
+    浏览器最多收到 HEATMAP_MAX_CELLS 个网格；否则逐个房源生成热力点。
+    其他城市通过 center、bounds（见 dataset_store.partition_extent）与 boundary_path 指定地图中心、
+    有效坐标范围与行政边界文件；boundary_path 为 None 时不绘制边界。
     """
+    import folium
+    from folium import GeoJson
+    from folium.plugins import HeatMap
+
     # 创建纽约地图
     nyc_map = folium.Map(
-        location=[40.7128, -74.0060],  # 纽约中心坐标 [纬度, 经度]
-        zoom_start=11,
+        location=list(center or NYC_CENTER),  # 地图中心坐标 [纬度, 经度]，默认纽约
+        zoom_start=zoom_start,
         tiles='OpenStreetMap',  # 使用 OpenStreetMap 底图
         width='100%',
         height='100%'
     )
 
-    # 添加纽约行政边界（使用公开的GeoJSON数据源）
+    # 添加纽约行政边界（读取本地缓存的GeoJSON，并按初始缩放级别简化以减小页面体积）
     try:
-        # 纽约市行政区边界GeoJSON数据
-        nyc_geojson_url = "https://data.cityofnewyork.us/api/geospatial/tqmj-j8zm?method=export&format=GeoJSON"
-        response = requests.get(nyc_geojson_url)
-        nyc_geojson = response.json()
-
-        # 添加边界到地图，使用黑色线条
-        GeoJson(
-            nyc_geojson,
-            style_function=lambda x: {
-                'color': 'black',  # 边界线颜色
-                'weight': 2,       # 线宽
-                'fillOpacity': 0   # 填充透明度（0表示不填充）
-            }
-        ).add_to(nyc_map)
+        with span('borough_boundaries', zoom=zoom_start) as stage:
+            nyc_geojson = get_borough_boundaries(zoom=zoom_start, path=boundary_path) if boundary_path else None
+            if nyc_geojson is not None:
+                stage.rows_out = len(nyc_geojson.get('features', []))
+        if nyc_geojson is not None:
+            # 添加边界到地图，使用黑色线条
+            GeoJson(nyc_geojson, style_function=_boundary_style).add_to(nyc_map)
+        elif boundary_path:
+            logger.warning("未找到行政边界数据，地图将不显示边界（运行 python boundaries.py 下载，或设置 AIRBNB_DOWNLOAD_BOUNDARIES=1）")
     except Exception as e:
-        print(f"添加行政边界时出错: {e}")
+        logger.warning("添加行政边界时出错: %s", e)
         # 即使边界加载失败，也继续创建地图
 
-    # 准备热力图数据（保持原有逻辑）
-    heat_data = []
-    for _, row in df.iterrows():
-        if (pd.notna(row.get('latitude')) and
-                pd.notna(row.get('longitude')) and
-                isinstance(row.get('latitude'), (int, float)) and
-                isinstance(row.get('longitude'), (int, float))):
-
-            lat = float(row['latitude'])
-            lng = float(row['longitude'])
-            # 确保坐标在合理范围内（纽约大致范围）
-            if 40.4 <= lat <= 41.0 and -74.5 <= lng <= -73.5:
-                heat_data.append([lat, lng, 1])
+    # 准备热力图数据：优先使用预聚合网格，否则一次性向量化完成缺失值与纽约范围过滤
+    with span('heat_points', rows_in=len(df), weight_column=weight_column) as stage:
+        positions = bins.positions_of(df) if bins is not None else None
+        if positions is not None:
+            weights = _heat_weights(df, weight_column) if weight_column else None
+            heat_data = bins.aggregate(positions, weights).tolist()
+        else:
+            heat_data = heat_points(df, weight_column=weight_column, bounds=bounds).tolist()
+        stage.rows_out = len(heat_data)
+        stage.attrs['binned'] = positions is not None
 
     # 添加热力图（保持原有逻辑）
     if heat_data:
@@ -71,7 +406,7 @@ def create_nyc_folium_heatmap(
             gradient={0.4: 'blue', 0.65: 'lime', 1: 'red'}  # 颜色渐变
         ).add_to(nyc_map)
     else:
-        print("警告：没有有效的热力图数据")
+        logger.warning("没有有效的热力图数据")
 
     # 添加标题（保持原有逻辑）
     title_html = f'''
@@ -82,14 +417,29 @@ def create_nyc_folium_heatmap(
     return nyc_map
 
 
-def load_cleaned_clustered_listings(path: Optional[str] = None) -> pd.DataFrame:
+def _file_sha256(path: str) -> str:
     """
-    读取清洗并聚类后的房源数据 Excel 文件，直接使用已有字段不做额外处理。
+    计算文件内容的 SHA-256，用于判断缓存是否与源文件一致。
     """
-    data_path = path or DEFAULT_DATA_PATH
-    if not os.path.exists(data_path):
-        raise FileNotFoundError(f"未找到数据文件: {data_path}")
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
 
+def listings_cache_path(data_path: str) -> str:
+    """
+    返回源数据文件对应的列式缓存路径（与源文件同目录，扩展名为 .cache.parquet）。
+    """
+    root, _ = os.path.splitext(data_path)
+    return root + CACHE_SUFFIX
+
+
+def _read_listings_source(data_path: str) -> pd.DataFrame:
+    """
+    从 Excel 源文件读取房源数据，并做与缓存一致的基础类型整理。
+    """
     # 直接读取Excel文件
     df = pd.read_excel(data_path)
 
@@ -107,51 +457,539 @@ def load_cleaned_clustered_listings(path: Optional[str] = None) -> pd.DataFrame:
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors="coerce")
 
-    return df
+    # 混合类型的文本列（如 host_name 中夹杂数字）统一转为字符串，保证可写入列式缓存
+    for col in df.select_dtypes(include="object").columns:
+        df[col] = df[col].map(lambda x: x if pd.isna(x) else str(x))
 
-def filter_listings(
+    return apply_listing_schema(df)
+
+
+def apply_listing_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    按 LISTING_SCHEMA 将各列转换为紧凑类型，返回新的 DataFrame。
+
+    整数列含缺失值时保持原样；已经是目标类型的列不会重复转换。
+    """
+    converted = {}
+    for col, kind in LISTING_SCHEMA.items():
+        if col not in df.columns:
+            continue
+        values = df[col]
+        if kind == 'category':
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                converted[col] = values.astype('category')
+        elif kind == 'integer':
+            if pd.api.types.is_integer_dtype(values) and not isinstance(values.dtype, pd.CategoricalDtype):
+                converted[col] = pd.to_numeric(values, downcast='integer')
+        elif pd.api.types.is_numeric_dtype(values) and values.dtype != kind:
+            converted[col] = values.astype(kind)
+    return df.assign(**converted) if converted else df
+
+
+def _project_columns(df: pd.DataFrame, columns: Optional[Iterable[str]]) -> pd.DataFrame:
+    """
+    只保留 columns 中存在的列（保持原有列顺序）；columns 为 None 时返回全部列。
+    """
+    if columns is None:
+        return df
+    wanted = set(columns)
+    return df[[col for col in df.columns if col in wanted]]
+
+
+def read_parquet_listings(path: str, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    读取 Parquet 格式的房源数据，只读取 columns 中存在的列（为 None 时读取全部列），并按 LISTING_SCHEMA 整理类型。
+    """
+    if pq is None:
+        raise ImportError("读取 Parquet 数据需要安装 pyarrow")
+    if columns is not None:
+        wanted = set(columns)
+        columns = [name for name in pq.read_schema(path).names if name in wanted]
+    return apply_listing_schema(pq.read_table(path, columns=columns).to_pandas())
+
+
+def source_stamp_matches(metadata: Dict[bytes, bytes], data_path: str) -> bool:
+    """
+    缓存或修补文件的元数据是否与源文件匹配：格式版本一致，且 mtime 相同或（mtime 变化时）内容哈希相同。
+    """
+    if metadata.get(b"cache_format", b"").decode() != CACHE_FORMAT_VERSION:
+        return False
+    if metadata.get(b"source_mtime_ns", b"").decode() == str(os.stat(data_path).st_mtime_ns):
+        return True
+    # mtime 变化不一定代表内容变化（例如重新拷贝），再用哈希确认
+    return metadata.get(b"source_sha256", b"").decode() == _file_sha256(data_path)
+
+
+def source_stamp_metadata(data_path: str) -> Dict[bytes, bytes]:
+    """
+    返回记录源文件 mtime 与内容哈希的元数据；列式缓存已记录同一 mtime 的哈希时直接沿用，不再重新读取源文件。
+    """
+    mtime = str(os.stat(data_path).st_mtime_ns)
+    sha256 = None
+    cache_path = listings_cache_path(data_path)
+    if pq is not None and os.path.exists(cache_path):
+        try:
+            metadata = pq.read_schema(cache_path).metadata or {}
+            if metadata.get(b"source_mtime_ns", b"").decode() == mtime:
+                sha256 = metadata.get(b"source_sha256", b"").decode() or None
+        except Exception:
+            sha256 = None
+    return {
+        b"source_mtime_ns": mtime.encode(),
+        b"source_sha256": (sha256 or _file_sha256(data_path)).encode(),
+        b"cache_format": CACHE_FORMAT_VERSION.encode(),
+    }
+
+
+def _read_listings_cache(
+        cache_path: str,
+        data_path: str,
+        columns: Optional[Iterable[str]] = None,
+) -> Optional[pd.DataFrame]:
+    """
+    若缓存存在且与源文件匹配（先比较 mtime，不一致时再比较内容哈希），返回缓存数据；否则返回 None。
+
+    columns 不为空时只从缓存中读取这些列（列式存储，未读取的列不占用内存）。
+    """
+    if pq is None or not os.path.exists(cache_path):
+        return None
+    try:
+        schema = pq.read_schema(cache_path)
+        if not source_stamp_matches(schema.metadata or {}, data_path):
+            return None
+        if columns is not None:
+            wanted = set(columns)
+            columns = [name for name in schema.names if name in wanted]
+        return pq.read_table(cache_path, columns=columns).to_pandas()
+    except Exception as e:
+        logger.warning("读取数据缓存时出错，将重新解析源文件: %s", e)
+        return None
+
+
+def _write_listings_cache(df: pd.DataFrame, cache_path: str, data_path: str) -> None:
+    """
+    将整理后的数据写入列式缓存，并在文件元数据中记录源文件的 mtime 与哈希。
+    """
+    if pq is None:
+        return
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata.update(source_stamp_metadata(data_path))
+        table = table.replace_schema_metadata(metadata)
+
+        # 先写临时文件再替换，避免并发读取到写了一半的缓存
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        logger.warning("写入数据缓存时出错（不影响本次加载）: %s", e)
+
+
+def write_listings_cache(df: pd.DataFrame, data_path: Optional[str] = None) -> None:
+    """
+    用已处理好的数据直接写入（或覆盖）源文件对应的列式缓存与首页概要，例如增量刷新后避免重新解析 Excel。
+    """
+    data_path = data_path or DEFAULT_DATA_PATH
+    _write_listings_cache(apply_listing_schema(df), listings_cache_path(data_path), data_path)
+    dataset_summary.write_summary(dataset_summary.compute_summary(df), data_path)
+
+
+def listings_delta_path(data_path: str) -> str:
+    """
+    返回源数据文件对应的增量刷新修补文件路径（与源文件同目录，扩展名为 .delta.parquet）。
+    """
+    root, _ = os.path.splitext(data_path)
+    return root + DELTA_SUFFIX
+
+
+class ListingsDelta:
+    """
+    增量刷新相对于数据文件的修补：upserts 为新增或内容变化的行（id 已在数据文件中时原位替换，否则追加在末尾），
+    removed 为数据文件中已删除的 id（同时出现在 upserts 中的为删除后重新加入的行）。多次刷新在同一修补上累积，数据文件本身保持不变，直到合并（python refresh.py --compact）。
+    """
+
+    def __init__(self, upserts: pd.DataFrame, removed: np.ndarray):
+        self.upserts = upserts
+        self.removed = np.asarray(removed)
+
+    def __len__(self) -> int:
+        return len(self.upserts) + len(self.removed)
+
+
+def read_listings_delta(
+        data_path: str,
+        columns: Optional[Iterable[str]] = None,
+        with_hashes: bool = False,
+) -> Optional[ListingsDelta]:
+    """
+    读取数据文件的修补；修补文件不存在、未安装 pyarrow 或与数据文件不匹配（数据文件已重新生成）时返回 None。
+
+    columns 不为空时只读取这些列（总是包含 LISTING_KEY）；with_hashes 为 True 时保留各行的内容哈希列。
+    """
+    path = listings_delta_path(data_path)
+    if pq is None or not os.path.exists(path):
+        return None
+    try:
+        schema = pq.read_schema(path)
+        metadata = schema.metadata or {}
+        if not source_stamp_matches(metadata, data_path):
+            logger.warning("修补文件与数据文件不匹配（数据文件已重新生成），忽略: %s", path)
+            return None
+        wanted = None if columns is None else set(columns) | {LISTING_KEY}
+        if with_hashes and wanted is not None:
+            wanted.add(DELTA_HASH_COLUMN)
+        names = [
+            name for name in schema.names
+            if (wanted is None or name in wanted) and (with_hashes or name != DELTA_HASH_COLUMN)
+        ]
+        upserts = pq.read_table(path, columns=names).to_pandas()
+        removed = pd.Series(json.loads(metadata.get(b"removed_ids", b"[]")), dtype=upserts[LISTING_KEY].dtype)
+    except Exception as e:
+        logger.warning("读取修补文件时出错，忽略: %s", e)
+        return None
+    return ListingsDelta(upserts, removed.to_numpy())
+
+
+def write_listings_delta(delta: ListingsDelta, data_path: str, hashes: Optional[np.ndarray] = None) -> None:
+    """
+    原子写入数据文件的修补，并记录数据文件的 mtime 与哈希（数据文件重新生成后修补自动失效）。
+
+    hashes 与 delta.upserts 的行一一对应，供下次刷新比较时使用。
+    """
+    if pq is None:
+        raise ImportError("增量刷新需要安装 pyarrow")
+    upserts = apply_listing_schema(delta.upserts)
+    if hashes is not None:
+        upserts = upserts.assign(**{DELTA_HASH_COLUMN: np.asarray(hashes, dtype=np.uint64)})
+    table = pa.Table.from_pandas(upserts, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata.update(source_stamp_metadata(data_path))
+    metadata[b"removed_ids"] = json.dumps(pd.Series(delta.removed).tolist()).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    path = listings_delta_path(data_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _is_plain_numeric(dtype) -> bool:
+    return isinstance(dtype, np.dtype) and dtype.kind in 'iuf'
+
+
+def merge_listing_rows(
+        stored: pd.DataFrame,
+        upserts: pd.DataFrame,
+        removed: Iterable = (),
+        key: str = LISTING_KEY,
+) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    按 key 合并：删除 removed 中的 id，upserts 中已存在的 id 在原位置替换，其余追加在末尾（保持 upserts 中的顺序）；
+    同时出现在 removed 中的 upserts 视为删除后重新加入的行，同样追加在末尾。
+    返回 (合并后的数据, 每行在 stored 中的位置（替换或追加的行为 -1，可用于修补热力图网格等派生结构）)。
+    """
+    removed = np.asarray(list(removed), dtype=object)
+    stale = stored[key].isin(np.concatenate([removed, upserts[key].to_numpy(dtype=object)])).to_numpy()
+    readded = upserts[key].isin(removed).to_numpy()
+    kept = stored[~stale]
+
+    # upserts 对齐到 stored 的列与类型；类别列先合并两边的类别，避免新出现的取值变为缺失值；
+    # 数值列取两边的公共类型（必要时放宽 stored 的列，如 int8 → int64、整数 → 浮点），新值不会被截断或溢出
+    upserts = upserts.reindex(columns=stored.columns)
+    for col in stored.columns:
+        dtype = stored[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            new_values = upserts[col].dropna().unique()
+            dtype = pd.CategoricalDtype(dtype.categories.union(pd.Index(new_values, dtype=dtype.categories.dtype)))
+            kept = kept.assign(**{col: kept[col].astype(dtype)})
+        elif _is_plain_numeric(dtype) and _is_plain_numeric(upserts[col].dtype):
+            dtype = np.result_type(dtype, upserts[col].dtype)
+            if kept[col].dtype != dtype:
+                kept = kept.assign(**{col: kept[col].astype(dtype)})
+        try:
+            upserts[col] = upserts[col].astype(dtype)
+        except (TypeError, ValueError):
+            pass
+
+    # 替换的行保持原有位置，追加的行排在最后
+    stored_positions = pd.Index(stored[key]).get_indexer(pd.concat([kept[key], upserts[key]]))
+    stored_positions[len(kept):][readded] = -1
+    order_key = np.where(stored_positions >= 0, stored_positions, len(stored) + np.arange(len(stored_positions)))
+    merged = pd.concat([kept, upserts], ignore_index=True)
+    order = np.argsort(order_key, kind='stable')
+    merged = merged.iloc[order].reset_index(drop=True)
+
+    source_positions = np.concatenate([np.flatnonzero(~stale), np.full(len(upserts), -1)])[order]
+    return merged, source_positions
+
+
+def delta_touched_rows(base: pd.DataFrame, delta: ListingsDelta, key: str = LISTING_KEY) -> pd.DataFrame:
+    """
+    返回修补涉及的行的新旧两个版本：base 中被替换或删除的行，以及修补中的新行（用于确定需要重新汇总的聚合分组）。
+    """
+    ids = np.concatenate([np.asarray(delta.removed, dtype=object), delta.upserts[key].to_numpy(dtype=object)])
+    return pd.concat([base[base[key].isin(ids)], delta.upserts], ignore_index=True)
+
+
+class RefreshedListings:
+    """
+    在数据文件的数据上合并修补的结果：df 为合并后的数据，source_positions 为各行在修补前数据中的位置（修补的行为 -1），
+    touched 为修补涉及的新旧行。后两者用于在修补前的热力图网格与价格立方体上只修补受影响的部分。
+    """
+
+    def __init__(self, df: pd.DataFrame, source_positions: np.ndarray, touched: pd.DataFrame):
+        self.df = df
+        self.source_positions = source_positions
+        self.touched = touched
+
+
+def apply_listings_delta(base: pd.DataFrame, delta: ListingsDelta, key: str = LISTING_KEY) -> RefreshedListings:
+    """
+    在数据文件的数据 base 上合并修补，耗时与 base 的行数成正比，但无需重新解析或读取数据文件。
+    """
+    df, source_positions = merge_listing_rows(base, delta.upserts, delta.removed, key)
+    return RefreshedListings(df, source_positions, delta_touched_rows(base, delta, key))
+
+
+def load_cleaned_clustered_listings(
+        path: Optional[str] = None,
+        use_cache: bool = True,
+        columns: Optional[Iterable[str]] = DASHBOARD_COLUMNS,
+        apply_delta: bool = True,
+) -> pd.DataFrame:
+    """
+    读取清洗并聚类后的房源数据。
+
+    首次读取时解析 Excel 并在同目录生成列式缓存（Parquet），之后只要源文件未变化就直接读取缓存。
+    各列按 LISTING_SCHEMA 转换为紧凑类型；默认只返回 DASHBOARD_COLUMNS 中的列，
+    需要其他列时通过 columns 指定，columns 为 None 时返回全部列。
+    存在增量刷新的修补文件时合并修补后返回；apply_delta 为 False 时只返回数据文件本身的内容。
+    """
+    data_path = path or DEFAULT_DATA_PATH
+    if not os.path.exists(data_path):
+        raise FileNotFoundError(f"未找到数据文件: {data_path}")
+
+    if data_path.lower().endswith('.parquet'):
+        # 数据文件本身就是列式文件（如 dataset_store 中的分区），直接按列读取，无需再生成缓存
+        with span('load_listings_parquet') as stage:
+            df = read_parquet_listings(data_path, columns)
+            stage.rows_out = len(df)
+        return df
+
+    delta = read_listings_delta(data_path, columns) if apply_delta else None
+    base_columns = columns if delta is None or columns is None else [*columns, LISTING_KEY]
+
+    cache_path = listings_cache_path(data_path)
+    df = None
+    if use_cache:
+        with span('load_listings_cache') as stage:
+            df = _read_listings_cache(cache_path, data_path, base_columns)
+            stage.attrs['hit'] = df is not None
+            if df is not None:
+                stage.rows_out = len(df)
+
+    if df is None:
+        with span('load_listings_excel') as stage:
+            df = _read_listings_source(data_path)
+            stage.rows_out = len(df)
+        if use_cache:
+            # 缓存中保存全部列，之后按需投影
+            with span('write_listings_cache', rows_in=len(df)):
+                _write_listings_cache(df, cache_path, data_path)
+                # 首页指标使用的概要与缓存一同生成（包含修补后的数据）
+                full_delta = read_listings_delta(data_path) if delta is not None else None
+                merged = df if full_delta is None else merge_listing_rows(df, full_delta.upserts, full_delta.removed)[0]
+                dataset_summary.write_summary(dataset_summary.compute_summary(merged), data_path)
+
+    if delta is not None:
+        with span('apply_listings_delta', rows_in=len(delta)):
+            df, _ = merge_listing_rows(df, delta.upserts, delta.removed)
+    return _project_columns(df, columns)
+
+
+def dataset_version(path: Optional[str] = None) -> str:
+    """
+    返回数据文件的版本标识（修改时间 + 文件大小），用于共享缓存的失效判断。
+
+    存在增量刷新的修补文件时追加 "+修补文件的修改时间-大小"；base_dataset_version 去掉这一部分。
+    """
+    path = path or DEFAULT_DATA_PATH
+    stat = os.stat(path)
+    version = f"{stat.st_mtime_ns}-{stat.st_size}"
+    if not path.lower().endswith('.parquet'):
+        try:
+            delta_stat = os.stat(listings_delta_path(path))
+        except FileNotFoundError:
+            return version
+        version += f"+{delta_stat.st_mtime_ns}-{delta_stat.st_size}"
+    return version
+
+
+def base_dataset_version(version: str) -> str:
+    """
+    返回数据文件本身（不含修补）的版本：修补前构建的共享结构以此为键缓存，刷新后在其基础上修补。
+    """
+    return version.partition('+')[0]
+
+
+def _equals_mask(series: pd.Series, value) -> np.ndarray:
+    """
+    返回 series == value 的布尔数组，缺失值视为不匹配。
+    """
+    return series.eq(value).to_numpy(dtype=bool, na_value=False)
+
+
+def filter_listing_positions(
         df: pd.DataFrame,
         neighborhood: str = "全部",
         room_type: str = "全部",
         price_range: Tuple[float, float] = (0, 10_000),
         cluster_type: str = "全部",
-) -> pd.DataFrame:
+) -> np.ndarray:
     """
-    按地区、房型、价格区间、聚类类别过滤房源数据。
+    按地区、房型、价格区间、聚类类别筛选，返回命中行的位置数组（不复制数据）。
     """
-    filtered = df.copy()
-
-    # 调试信息：打印可用的列名
-    print(f"数据列名: {list(filtered.columns)}")
-    print(f"选择的社区: {neighborhood}")
+    mask = np.ones(len(df), dtype=bool)
 
     # 检查社区列是否存在
-    neighborhood_col = None
-    for col in ['neighborhood', 'neighbourhood', 'neighbourhood_cleansed']:
-        if col in filtered.columns:
-            neighborhood_col = col
-            break
+    neighborhood_col = next((col for col in NEIGHBORHOOD_COLUMNS if col in df.columns), None)
 
     if neighborhood_col:
-        print(f"使用社区列: {neighborhood_col}")
-        print(f"可用的社区: {filtered[neighborhood_col].unique()[:10]}")  # 显示前10个社区
-
         if neighborhood and neighborhood != "全部":
-            filtered = filtered[filtered[neighborhood_col] == neighborhood]
-            print(f"筛选后数据量: {len(filtered)}")
+            mask &= _equals_mask(df[neighborhood_col], neighborhood)
     else:
-        print("警告: 未找到社区相关的列")
+        logger.warning("未找到社区相关的列，忽略社区筛选条件")
 
-    if room_type and room_type != "全部" and "room_type" in filtered.columns:
-        filtered = filtered[filtered["room_type"] == room_type]
+    if room_type and room_type != "全部" and "room_type" in df.columns:
+        mask &= _equals_mask(df["room_type"], room_type)
 
     if price_range is not None:
         low, high = price_range
-        filtered = filtered[(filtered["price"] >= low) & (filtered["price"] <= high)]
+        mask &= df["price"].between(low, high).to_numpy(dtype=bool, na_value=False)
 
-    if cluster_type and cluster_type != "全部" and "cluster_type" in filtered.columns:
-        filtered = filtered[filtered["cluster_type"] == cluster_type]
+    if cluster_type and cluster_type != "全部" and "cluster_type" in df.columns:
+        mask &= _equals_mask(df["cluster_type"], cluster_type)
 
     # 严格要求经纬度存在
-    filtered = filtered.dropna(subset=["latitude", "longitude"]).copy()
-    return filtered
\ No newline at end of file
+    mask &= df["latitude"].notna().to_numpy() & df["longitude"].notna().to_numpy()
+    return np.flatnonzero(mask)
+
+
+class ListingFilterIndex:
+    """
+    房源筛选索引：加载数据时构建一次，之后每次筛选只做位图求交。
+
+    - 社区、房型、聚类类别：按类别编码建立压缩位图（np.packbits）
+    - 价格：预先排序，区间查询用二分查找定位
+    - 经纬度：预先计算“坐标完整”位图
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.n_rows = len(df)
+        self.neighborhood_col = next((col for col in NEIGHBORHOOD_COLUMNS if col in df.columns), None)
+
+        # 每个类别列：{类别值: 压缩位图}
+        self.bitmaps: Dict[str, Dict[object, np.ndarray]] = {}
+        for col in [self.neighborhood_col, *INDEXED_CATEGORY_COLUMNS]:
+            if col and col in df.columns:
+                codes, uniques = pd.factorize(df[col])
+                self.bitmaps[col] = {
+                    value: np.packbits(codes == code) for code, value in enumerate(uniques)
+                }
+
+        # 价格排序数组（缺失价格不参与任何区间）
+        prices = df["price"].to_numpy(dtype=float, na_value=np.nan)
+        valid = np.flatnonzero(~np.isnan(prices))
+        order = valid[np.argsort(prices[valid], kind="stable")]
+        self.price_order = order
+        self.sorted_prices = prices[order]
+
+        self.coords_bitmap = np.packbits(
+            df["latitude"].notna().to_numpy() & df["longitude"].notna().to_numpy()
+        )
+
+    def categories(self, column: str) -> list:
+        """
+        返回某个已索引列的全部类别（已排序，不含缺失值）。
+        """
+        return sorted(self.bitmaps.get(column, {}).keys())
+
+    def _category_bitmap(self, column: Optional[str], value) -> Optional[np.ndarray]:
+        if not column or column not in self.bitmaps:
+            return None
+        bitmap = self.bitmaps[column].get(value)
+        if bitmap is None:
+            # 不存在的类别值：与逐行比较一致，结果为空
+            return np.zeros_like(self.coords_bitmap)
+        return bitmap
+
+    def _price_bitmap(self, low: float, high: float) -> np.ndarray:
+        start = np.searchsorted(self.sorted_prices, low, side="left")
+        stop = np.searchsorted(self.sorted_prices, high, side="right")
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.price_order[start:stop]] = True
+        return np.packbits(mask)
+
+    def positions(
+            self,
+            neighborhood: str = "全部",
+            room_type: str = "全部",
+            price_range: Tuple[float, float] = (0, 10_000),
+            cluster_type: str = "全部",
+    ) -> np.ndarray:
+        """
+        返回满足全部条件的行位置（升序），语义与 filter_listing_positions 相同。
+        """
+        bits = self.coords_bitmap.copy()
+        for column, value in [
+            (self.neighborhood_col, neighborhood),
+            ("room_type", room_type),
+            ("cluster_type", cluster_type),
+        ]:
+            if value and value != "全部":
+                bitmap = self._category_bitmap(column, value)
+                if bitmap is not None:
+                    bits &= bitmap
+
+        if price_range is not None:
+            low, high = price_range
+            bits &= self._price_bitmap(low, high)
+
+        return np.flatnonzero(np.unpackbits(bits, count=self.n_rows))
+
+
+def build_filter_index(df: pd.DataFrame) -> ListingFilterIndex:
+    """
+    为房源数据构建筛选索引（建议在加载数据后调用一次并与数据一起缓存）。
+    """
+    return ListingFilterIndex(df)
+
+
+def filter_listings(
+        df: pd.DataFrame,
+        neighborhood: str = "全部",
+        room_type: str = "全部",
+        price_range: Tuple[float, float] = (0, 10_000),
+        cluster_type: str = "全部",
+        index: Optional[ListingFilterIndex] = None,
+) -> pd.DataFrame:
+    """
+    按地区、房型、价格区间、聚类类别过滤房源数据。
+
+    只按位置取出命中行，不再先复制整张表；共享数据在写时复制模式下不会被调用方修改。
+    传入 index（build_filter_index 的结果）时使用位图求交，否则逐行比较。
+    """
+    logger.debug(
+        "filter neighborhood=%s room_type=%s price_range=%s cluster_type=%s indexed=%s",
+        neighborhood, room_type, price_range, cluster_type, index is not None,
+    )
+    with span('filter_listings', rows_in=len(df), indexed=index is not None) as stage:
+        if index is not None:
+            if index.n_rows != len(df):
+                raise ValueError("筛选索引与数据行数不一致，请重新构建索引")
+            positions = index.positions(neighborhood, room_type, price_range, cluster_type)
+        else:
+            positions = filter_listing_positions(df, neighborhood, room_type, price_range, cluster_type)
+        stage.rows_out = len(positions)
+    return df.iloc[positions]
\ No newline at end of file
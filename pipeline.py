@@ -0,0 +1,263 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+import clustering
+import ingest
+import map_visualization as mv
+import price_analysis as pa
+import review_analysis as ra
+import refresh
+from instrumentation import configure_logging, get_logger
+
+logger = get_logger(__name__)
+
+# 各阶段的输出文件名（与原来分别运行各脚本时的文件名一致）
+CLEANED_FILE = "清洗并聚类后的房源数据.xlsx"
+MODEL_FILE = "聚类模型.json"
+PRICE_CHART_FILE = "price_analysis.html"
+REVIEW_MAP_FILE = "review_analysis.html"
+
+# 记录各阶段输入哈希的清单文件（位于输出目录中）
+MANIFEST_FILE = "pipeline_manifest.json"
+
+# 阶段实现发生不兼容变化时递增，使已有清单全部失效
+PIPELINE_VERSION = "2"
+
+# 与 price_analysis / review_analysis 单独读取 CSV 时相同的输入列
+PRICE_COLUMNS = pa.GROUP_COLUMNS + ['price']
+REVIEW_COLUMNS = ra.COMMUNITY_COLUMNS[:1] + ra.VALUE_COLUMNS
+
+
+def _cluster_stage(listings: pd.DataFrame, output_dir: str, cluster_mode: str) -> List[str]:
+    """
+    与清洗脚本相同：删除无价格与含网址的行，训练聚类模型并写出清洗并聚类后的数据。
+
+    同时写出应用读取的列式缓存与首页概要（热力图网格由 map_bins 阶段写出，各索引由应用从缓存直接构建）。
+    """
+    df_clean = refresh.clean_listing_rows(listings)
+    model, cluster_labels = clustering.fit_cluster_model(df_clean, mode=cluster_mode)
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    model.save(model_path)
+
+    df_result = df_clean.assign(
+        cluster_label=cluster_labels,
+        cluster_type=cluster_labels.map(model.label_names),
+    )
+    df_result = df_result.dropna(subset=['cluster_type'])
+    data_path = os.path.join(output_dir, CLEANED_FILE)
+    df_result.to_excel(data_path, index=False)
+    mv.write_listings_cache(df_result, data_path)
+    return [data_path, model_path, mv.listings_cache_path(data_path)]
+
+
+def _map_bins_stage(listings: pd.DataFrame, output_dir: str) -> List[str]:
+    """
+    按与聚类阶段相同的规则筛选行（行顺序与写出的清洗数据一致），预先计算地图页的热力图网格；
+    应用加载同一份数据时直接读取，无需在首次打开地图页时构建。
+    """
+    df = refresh.clean_listing_rows(listings).dropna(subset=clustering.CLUSTER_FEATURES)
+    data_path = os.path.join(output_dir, CLEANED_FILE)
+    mv.write_heatmap_bins(mv.build_heatmap_bins(df), df, data_path)
+    return [mv.heatmap_bins_path(data_path)]
+
+
+def _price_chart_stage(listings: pd.DataFrame, output_dir: str) -> List[str]:
+    output_path = os.path.join(output_dir, PRICE_CHART_FILE)
+    pa.render_price_chart(listings, output_path)
+    return [output_path]
+
+
+def _review_map_stage(listings: pd.DataFrame, output_dir: str) -> List[str]:
+    output_path = os.path.join(output_dir, REVIEW_MAP_FILE)
+    ra.render_review_map(listings, output_path)
+    return [output_path]
+
+
+# 阶段名 -> (阶段函数, 输入列（None 表示全部列）)；各阶段互不依赖，可以并行执行
+STAGES: Dict[str, Tuple[Callable[..., List[str]], Optional[List[str]]]] = {
+    'clustering': (_cluster_stage, None),
+    'map_bins': (_map_bins_stage, None),
+    'price_chart': (_price_chart_stage, PRICE_COLUMNS),
+    'review_map': (_review_map_stage, REVIEW_COLUMNS),
+}
+
+
+def _run_stage(stage: str, listings: pd.DataFrame, output_dir: str, params: dict) -> Tuple[List[str], float]:
+    """
+    在工作进程中执行一个阶段，返回 (输出文件列表, 耗时秒数)。
+    """
+    started = time.perf_counter()
+    func, _ = STAGES[stage]
+    outputs = func(listings, output_dir, **params)
+    return outputs, time.perf_counter() - started
+
+
+class StageResult:
+    """
+    一个阶段的执行结果：status 为 ran（已重新生成）、skipped（输入未变化）或 failed。
+    """
+
+    def __init__(self, output_dir: str, stage: str, status: str, seconds: float = 0.0, error: Optional[str] = None):
+        self.output_dir = output_dir
+        self.stage = stage
+        self.status = status
+        self.seconds = seconds
+        self.error = error
+
+    def summary(self) -> str:
+        text = f"{self.output_dir} {self.stage}: {self.status}"
+        if self.status == 'ran':
+            text += f"（{self.seconds:.1f} 秒）"
+        if self.error:
+            text += f" {self.error}"
+        return text
+
+
+def input_digest(listings: pd.DataFrame, params: Optional[dict] = None) -> str:
+    """
+    返回阶段输入的内容哈希：列名、各列内容与阶段参数，与数据的读取方式和行索引无关。
+    """
+    digest = hashlib.sha256()
+    header = {'version': PIPELINE_VERSION, 'columns': [str(col) for col in listings.columns], 'params': params or {}}
+    digest.update(json.dumps(header, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(listings, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _manifest_path(output_dir: str) -> str:
+    return os.path.join(output_dir, MANIFEST_FILE)
+
+
+def read_manifest(output_dir: str) -> Dict[str, dict]:
+    """
+    读取输出目录的清单；不存在或已损坏时返回空字典（所有阶段都会重新执行）。
+    """
+    try:
+        with open(_manifest_path(output_dir), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(output_dir: str, manifest: Dict[str, dict]) -> None:
+    path = _manifest_path(output_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _is_current(entry: Optional[dict], digest: str) -> bool:
+    """
+    清单记录的输入哈希一致且输出文件都还在时，该阶段无需重新执行。
+    """
+    return bool(entry) and entry.get('digest') == digest and all(os.path.exists(p) for p in entry.get('outputs', []))
+
+
+def run_pipeline(
+        jobs: Sequence[Tuple[str, str]],
+        stages: Sequence[str] = tuple(STAGES),
+        max_workers: Optional[int] = None,
+        force: bool = False,
+        sheet_name: Optional[str] = None,
+        cluster_mode: str = 'full',
+) -> List[StageResult]:
+    """
+    批量重新生成派生产物。jobs 为 (原始快照路径, 输出目录) 列表，例如每个城市一项。
+
+    每个快照只读取一次，按各阶段所需的列分发给进程池并行执行；不同快照的阶段也在同一进程池中并行。
+    阶段输入的内容哈希与上次成功执行时相同（且输出文件仍在）时跳过该阶段，force 为 True 时全部重新执行。
+    """
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        raise ValueError(f"未知的阶段: {', '.join(unknown)}（可选 {', '.join(STAGES)}）")
+    output_dirs = [output_dir for _, output_dir in jobs]
+    if len(set(map(os.path.abspath, output_dirs))) != len(output_dirs):
+        raise ValueError("每个快照必须使用不同的输出目录")
+
+    results: List[StageResult] = []
+    manifests: Dict[str, Dict[str, dict]] = {}
+    pending: List[Tuple[str, str, str, Future]] = []
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        # 主进程读取下一个快照时，进程池中已提交的阶段同时在执行
+        for snapshot_path, output_dir in jobs:
+            os.makedirs(output_dir, exist_ok=True)
+            manifest = manifests[output_dir] = read_manifest(output_dir)
+            # 保留原始类型读取：float32 等紧凑类型会改变写出的清洗数据（如 4.08 变为 4.079999923706055）
+            snapshot = ingest.read_listings(snapshot_path, columns=None, sheet_name=sheet_name, compact=False)
+            logger.info("读取快照 %s rows=%d", snapshot_path, len(snapshot))
+
+            for stage in stages:
+                _, columns = STAGES[stage]
+                params = {'cluster_mode': cluster_mode} if stage == 'clustering' else {}
+                missing = [col for col in columns or [] if col not in snapshot.columns]
+                if missing:
+                    results.append(StageResult(output_dir, stage, 'failed', error=f"快照缺少列: {', '.join(missing)}"))
+                    continue
+                listings = snapshot if columns is None else snapshot[columns]
+                digest = input_digest(listings, params)
+                if not force and _is_current(manifest.get(stage), digest):
+                    results.append(StageResult(output_dir, stage, 'skipped'))
+                    continue
+                future = pool.submit(_run_stage, stage, listings, output_dir, params)
+                pending.append((output_dir, stage, digest, future))
+            del snapshot
+
+        for output_dir, stage, digest, future in pending:
+            try:
+                outputs, seconds = future.result()
+            except Exception as e:
+                logger.warning("阶段 %s（%s）失败: %s", stage, output_dir, e)
+                results.append(StageResult(output_dir, stage, 'failed', error=str(e)))
+                continue
+            manifests[output_dir][stage] = {'digest': digest, 'outputs': outputs}
+            write_manifest(output_dir, manifests[output_dir])
+            results.append(StageResult(output_dir, stage, 'ran', seconds))
+    return results
+
+
+def _default_output_dirs(snapshot_paths: Sequence[str], output_root: str) -> List[str]:
+    """
+    只有一个快照时直接输出到 output_root；多个快照时按快照所在目录名（如城市名）分别输出到 output_root 的子目录。
+    """
+    if len(snapshot_paths) == 1:
+        return [output_root]
+    return [
+        os.path.join(output_root, os.path.basename(os.path.dirname(os.path.abspath(path))))
+        for path in snapshot_paths
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="读取原始快照一次，并行重新生成清洗数据、热力图网格、价格分布图与评价地图")
+    parser.add_argument("snapshots", nargs="+", help="原始快照文件（listings.csv / listings.xlsx），可指定多个城市")
+    parser.add_argument("-o", "--output-dir", default=os.path.dirname(os.path.abspath(__file__)),
+                        help="输出目录；多个快照时按快照所在目录名分别输出到其子目录")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"要执行的阶段（逗号分隔，可选 {', '.join(STAGES)}）")
+    parser.add_argument("--workers", type=int, default=None, help="进程数（默认等于 CPU 核数）")
+    parser.add_argument("--force", action="store_true", help="忽略输入哈希，全部重新生成")
+    parser.add_argument("--sheet", default=None, help="Excel 快照的工作表名称")
+    parser.add_argument("--cluster-mode", default='full', choices=['full', 'minibatch'], help="聚类方式")
+    args = parser.parse_args()
+
+    configure_logging()
+    jobs = list(zip(args.snapshots, _default_output_dirs(args.snapshots, args.output_dir)))
+    results = run_pipeline(
+        jobs,
+        stages=[stage.strip() for stage in args.stages.split(",") if stage.strip()],
+        max_workers=args.workers,
+        force=args.force,
+        sheet_name=args.sheet,
+        cluster_mode=args.cluster_mode,
+    )
+    for result in results:
+        print(result.summary())
+    if any(result.status == 'failed' for result in results):
+        raise SystemExit(1)
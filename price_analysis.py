@@ -1,18 +1,47 @@
+import os
+import copy
+import argparse
+from typing import Optional, Dict, List, Sequence
+
+import numpy as np
 from pyecharts import options as opts
 from pyecharts.charts import Bar
 from pyecharts.globals import ThemeType
 import pandas as pd
 
+import ingest
+
+# 默认输入（Inside Airbnb 原始 listings.csv）与输出路径（与本文件同目录）
+DEFAULT_LISTINGS_PATH = os.path.join(os.path.dirname(__file__), "listings.csv")
+DEFAULT_OUTPUT_PATH = os.path.join(os.path.dirname(__file__), "price_analysis.html")
+
+GROUP_COLUMNS = ['neighbourhood_cleansed', 'room_type']
+
+# 价格聚合立方体的维度（清洗并聚类后的数据中 neighbourhood 为行政区）与中位数直方图的分箱（1 美元一档，覆盖 0-800）
+CUBE_DIMENSIONS = ['neighbourhood', 'room_type', 'cluster_type']
+PRICE_BIN_WIDTH = 1
+PRICE_MAX = 800
+
+STATISTIC_LABELS = {'median': '中位数', 'mean': '均值', 'std': '标准差', 'count': '房源数', 'outliers': '异常值修正数'}
+
+# 以美元计的统计量（其余为个数）
+PRICE_STATISTICS = ('median', 'mean', 'std')
 
-def generate_grouped_bar_chart():
-    # 读取 CSV 文件
-    df = pd.read_csv(r"D:\Users\Lyx\Desktop\listings.csv")
 
+def clean_listing_prices(
+        df: pd.DataFrame,
+        group_columns: Sequence[str] = GROUP_COLUMNS,
+        extra_columns: Sequence[str] = (),
+) -> pd.DataFrame:
+    """
+    清洗价格并修正组内异常值，返回分组列、extra_columns 与 price 列。
+    """
+    group_columns = list(group_columns)
     # 删除 room_type 为 Hotel room 的数据
-    df = df[df['room_type']!= 'Hotel room']
+    df = df[df['room_type'] != 'Hotel room'].copy()
 
     # 对 price 列进行初步清洗，去除非数字字符
-    df['price'] = df['price'].str.replace(r'[^\d.]', '', regex=True)
+    df['price'] = df['price'].astype(str).str.replace(r'[^\d.]', '', regex=True)
 
     # 将清洗后的 price 列转换为数值类型
     df['price'] = pd.to_numeric(df['price'], errors='coerce')
@@ -27,28 +56,44 @@ def generate_grouped_bar_chart():
     df = df[df['price'] <= 800]
 
     # 把 Todt Hill 社区的 Entire room/apt 房型的价格设置为 0
-    df.loc[(df['neighbourhood_cleansed'] == 'Todt Hill') & (df['room_type'] == 'Entire room/apt'), 'price'] = 0
+    if 'neighbourhood_cleansed' in df.columns:
+        df.loc[(df['neighbourhood_cleansed'] == 'Todt Hill') & (df['room_type'] == 'Entire room/apt'), 'price'] = 0
 
-    # 打印设置价格为 0 后 Todt Hill 社区 Entire room/apt 房型的价格
-    todt_hill_price_after_set = df.loc[(df['neighbourhood_cleansed'] == 'Todt Hill') & (df['room_type'] == 'Entire room/apt'), 'price']
+    # 按社区和房型分组，计算均值和标准差（保留两位小数），一次 transform 对齐到每一行
+    grouped = df.groupby(group_columns, observed=True)['price']
+    group_mean = grouped.transform('mean').round(2)
+    group_std = grouped.transform('std').round(2)
 
+    # 假设价格大于均值 + 3 倍标准差为异常值，将其修正为均值
+    outlier = df['price'] > group_mean + 3 * group_std
+    df['price'] = df['price'].where(~outlier, group_mean)
 
-    # 按社区和房型分组，计算均值和标准差（保留两位小数）
-    grouped = df.groupby(['neighbourhood_cleansed', 'room_type'])['price'].agg(['mean','std']).reset_index()
-    grouped['mean'] = grouped['mean'].round(2)
-    grouped['std'] = grouped['std'].round(2)
+    return df[group_columns + list(extra_columns) + ['price']]
 
-    # 假设价格大于均值 + 3 倍标准差为异常值，将其修正为均值，直接在 grouped 数据上操作
-    for index, row in grouped.iterrows():
-        condition = (df['neighbourhood_cleansed'] == row['neighbourhood_cleansed']) & (
-            df['room_type'] == row['room_type']) & (df['price'] > row['mean'] + 3 * row['std'])
-        df.loc[condition, 'price'] = row['mean']
 
-    # 提取需要的列并计算每个社区不同房型的价格中位数
-    final_df = df[['neighbourhood_cleansed', 'room_type', 'price']]
-    grouped_df = final_df.groupby(['neighbourhood_cleansed', 'room_type'])['price'].median().unstack()
+def _drop_unused_price_rows(batch: pd.DataFrame) -> pd.DataFrame:
+    """
+    分批读取时的预过滤：Hotel room 与价格超过 800 的行在 clean_listing_prices 中也会被删除。
+    """
+    return batch[(batch['room_type'] != 'Hotel room') & ~(batch['price'] > 800)]
 
 
+def grouped_price_medians(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    计算每个社区不同房型的价格中位数（行：社区，列：房型）。
+    """
+    return df.groupby(GROUP_COLUMNS, observed=True)['price'].median().unstack()
+
+
+def build_grouped_bar_chart(
+        grouped_df: pd.DataFrame,
+        title: str = "各社区不同房型的均价分布",
+        x_name: str = "社区名称",
+        y_name: str = "房屋均价（美元/月）",
+) -> Bar:
+    """
+    根据社区 × 房型的价格表创建分组柱状图（行作为横轴类别，每列一个系列）。
+    """
     # 创建一个柱状图对象
     bar = (
         Bar(init_opts=opts.InitOpts(theme=ThemeType.LIGHT, width="1600px", height="800px"))
@@ -61,15 +106,229 @@ def generate_grouped_bar_chart():
 
     # 设置全局配置项
     bar.set_global_opts(
-        title_opts=opts.TitleOpts(title="各社区不同房型的均价分布"),
-        xaxis_opts=opts.AxisOpts(name="社区名称", axislabel_opts=opts.LabelOpts(rotate=45)),
-        yaxis_opts=opts.AxisOpts(name="房屋均价（美元/月）", min_=0),
+        title_opts=opts.TitleOpts(title=title),
+        xaxis_opts=opts.AxisOpts(name=x_name, axislabel_opts=opts.LabelOpts(rotate=45)),
+        yaxis_opts=opts.AxisOpts(name=y_name, min_=0),
         legend_opts=opts.LegendOpts(is_show=True),
         toolbox_opts=opts.ToolboxOpts(is_show=True)
     )
+    return bar
+
+
+def statistic_axis_name(statistic: str) -> str:
+    """
+    返回某统计量对应的纵轴名称，例如 median -> "房屋价格中位数（美元/月）"、count -> "房源数（个）"。
+    """
+    if statistic in PRICE_STATISTICS:
+        return f"房屋价格{STATISTIC_LABELS[statistic]}（美元/月）"
+    return f"{STATISTIC_LABELS[statistic]}（个）"
+
+
+class PriceCube:
+    """
+    社区 × 房型 × 聚类类别的价格聚合立方体，每个数据版本构建一次。
+
+    每个单元格保存房源数、价格和、价格平方和、被修正的异常值个数，以及 1 美元一档的价格直方图
+    （作为可合并的中位数概要）。切片时只对选中的单元格求和，不再重新分组。
+    所有统计量基于与 price_analysis 相同的清洗与异常值修正（clean_listing_prices）后的价格。
+    """
+
+    def __init__(self, df: pd.DataFrame, dimensions: Sequence[str]):
+        self.dimensions = list(dimensions)
+        self.categories: Dict[str, List] = {}
+        codes = []
+        for dim in self.dimensions:
+            dim_codes, uniques = pd.factorize(df[dim], sort=True)
+            codes.append(dim_codes)
+            self.categories[dim] = list(uniques)
+
+        # 分组列缺失的行不进入任何单元格（与 groupby 的默认行为一致）
+        valid = np.all(np.stack(codes) >= 0, axis=0) if codes else np.ones(len(df), dtype=bool)
+        shape = tuple(len(self.categories[dim]) for dim in self.dimensions)
+        cells = np.ravel_multi_index([c[valid] for c in codes], shape) if codes else np.zeros(int(valid.sum()), dtype=int)
+        n_cells = int(np.prod(shape))
+
+        price = df['price'].to_numpy(dtype=float)[valid]
+        outlier = df['is_outlier'].to_numpy(dtype=bool)[valid]
+        self.count = np.bincount(cells, minlength=n_cells).reshape(shape).astype(float)
+        self.sum = np.bincount(cells, weights=price, minlength=n_cells).reshape(shape)
+        self.sum_sq = np.bincount(cells, weights=price ** 2, minlength=n_cells).reshape(shape)
+        self.outliers = np.bincount(cells, weights=outlier, minlength=n_cells).reshape(shape)
+
+        n_bins = PRICE_MAX // PRICE_BIN_WIDTH + 1
+        bins = np.clip((price // PRICE_BIN_WIDTH).astype(int), 0, n_bins - 1)
+        self.histogram = np.bincount(cells * n_bins + bins, minlength=n_cells * n_bins).reshape(shape + (n_bins,))
+
+    def _select(self, where: Dict[str, Optional[str]]) -> tuple:
+        """
+        将 {维度: 取值} 转为各轴的下标；取值为空或“全部”表示不限制该维度。
+        """
+        selection = []
+        for dim in self.dimensions:
+            value = where.get(dim)
+            if value is None or value == "全部":
+                selection.append(slice(None))
+            elif value in self.categories[dim]:
+                selection.append([self.categories[dim].index(value)])
+            else:
+                selection.append([])
+        return np.ix_(*[
+            np.arange(len(self.categories[dim]))[sel] for dim, sel in zip(self.dimensions, selection)
+        ])
+
+    def table(
+            self,
+            index: str,
+            columns: str,
+            statistic: str = 'median',
+            where: Optional[Dict[str, Optional[str]]] = None,
+    ) -> pd.DataFrame:
+        """
+        按 index × columns 两个维度切片汇总，返回指定统计量的表格；where 限定其余维度的取值。
+
+        statistic 可选 median、mean、std、count、outliers；无房源的组合为 NaN。
+        """
+        selector = self._select(where or {})
+        keep_axes = [self.dimensions.index(index), self.dimensions.index(columns)]
+        drop_axes = tuple(axis for axis in range(len(self.dimensions)) if axis not in keep_axes)
+
+        def reduce(values: np.ndarray) -> np.ndarray:
+            reduced = values[selector].sum(axis=drop_axes)
+            # 求和后剩余轴按维度原顺序排列，必要时转置为 index × columns
+            return reduced if keep_axes[0] < keep_axes[1] else np.swapaxes(reduced, 0, 1)
+
+        count = reduce(self.count)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if statistic == 'count':
+                values = count
+            elif statistic == 'outliers':
+                values = reduce(self.outliers)
+            elif statistic == 'mean':
+                values = reduce(self.sum) / count
+            elif statistic == 'std':
+                total = reduce(self.sum)
+                variance = (reduce(self.sum_sq) - total ** 2 / count) / (count - 1)
+                values = np.sqrt(np.clip(variance, 0, None))
+            elif statistic == 'median':
+                histogram = self.histogram[selector + (slice(None),)].sum(axis=drop_axes)
+                if keep_axes[0] > keep_axes[1]:
+                    histogram = np.swapaxes(histogram, 0, 1)
+                values = _histogram_median(histogram, count)
+            else:
+                raise ValueError(f"不支持的统计量: {statistic}")
+
+        values = np.where(count > 0, values, np.nan) if statistic not in ('count', 'outliers') else values
+        index_labels = [self.categories[index][i] for i in selector[keep_axes[0]].ravel()]
+        column_labels = [self.categories[columns][i] for i in selector[keep_axes[1]].ravel()]
+        return pd.DataFrame(values, index=pd.Index(index_labels, name=index), columns=pd.Index(column_labels, name=columns))
+
+
+def _histogram_median(histogram: np.ndarray, count: np.ndarray) -> np.ndarray:
+    """
+    由价格直方图计算中位数（偶数个时取中间两个值的平均），误差不超过一个分箱宽度。
+    """
+    cumulative = histogram.cumsum(axis=-1)
+    lower = np.floor((count - 1) / 2)
+    upper = np.floor(count / 2)
+    lower_bin = (cumulative > lower[..., None]).argmax(axis=-1)
+    upper_bin = (cumulative > upper[..., None]).argmax(axis=-1)
+    return (lower_bin + upper_bin) / 2 * PRICE_BIN_WIDTH
+
+
+def _clamped_cube_rows(listings: pd.DataFrame, dimensions: Sequence[str]) -> pd.DataFrame:
+    """
+    按 dimensions 的前两个维度（社区、房型）做与 generate_grouped_bar_chart 相同的异常值修正，并标记被修正的行。
+    """
+    cleaned = clean_listing_prices(listings, group_columns=dimensions[:2], extra_columns=dimensions[2:])
+    original = pd.to_numeric(listings.loc[cleaned.index, 'price'], errors='coerce')
+    return cleaned.assign(is_outlier=cleaned['price'].ne(original) & original.notna())
+
+
+def build_price_cube(listings: pd.DataFrame, dimensions: Sequence[str] = CUBE_DIMENSIONS) -> PriceCube:
+    """
+    从清洗并聚类后的房源数据构建价格聚合立方体。
+
+    先按 dimensions 的前两个维度（社区、房型）做与 generate_grouped_bar_chart 相同的异常值修正，再汇总到各单元格。
+    """
+    dimensions = [dim for dim in dimensions if dim in listings.columns]
+    return PriceCube(_clamped_cube_rows(listings, dimensions), dimensions)
+
+
+def patch_price_cube(cube: PriceCube, listings: pd.DataFrame, changed: pd.DataFrame) -> PriceCube:
+    """
+    数据增量更新后修补价格立方体：只重新计算受影响的（社区, 房型）组。
+
+    listings 为更新后的完整数据，changed 为新增、变化及删除的行（取其新旧两个版本的社区与房型）。
+    异常值修正只依赖组内统计，因此只需用受影响组的全部行重新汇总；出现新的类别值时整体重建。
+    """
+    dims = cube.dimensions
+    group_dims = dims[:2]
+    for dim in dims:
+        known = set(cube.categories[dim])
+        if not set(listings[dim].dropna().unique()) <= known:
+            return build_price_cube(listings, dims)
+
+    affected = changed[group_dims].dropna().drop_duplicates()
+    if affected.empty:
+        return cube
+    in_affected = listings[group_dims].merge(affected.assign(_hit=True), on=group_dims, how='left')['_hit']
+    rows = listings[in_affected.fillna(False).to_numpy(dtype=bool)]
+    clamped = _clamped_cube_rows(rows, dims)
+
+    # 在副本上清空受影响的组，再把重新汇总的结果按类别对齐写回（原立方体可能仍被其他会话使用）
+    patched = copy.copy(cube)
+    group_index = tuple(
+        np.array([cube.categories[dim].index(value) for value in affected[dim]], dtype=int)
+        for dim in group_dims
+    )
+    partial = PriceCube(clamped, dims) if len(clamped) else None
+    if partial is not None:
+        target = np.ix_(*[
+            np.array([cube.categories[dim].index(value) for value in partial.categories[dim]], dtype=int)
+            for dim in dims
+        ])
+    for name in ('count', 'sum', 'sum_sq', 'outliers', 'histogram'):
+        values = getattr(cube, name).copy()
+        values[group_index] = 0
+        if partial is not None:
+            values[target] += getattr(partial, name)
+        setattr(patched, name, values)
+    return patched
+
+
+def generate_grouped_bar_chart(
+        listings_path: str = DEFAULT_LISTINGS_PATH,
+        output_path: Optional[str] = DEFAULT_OUTPUT_PATH,
+) -> pd.DataFrame:
+    """
+    读取 listings.csv，生成各社区不同房型的价格分布图并渲染到 output_path，返回价格中位数表。
+    """
+    # 分批读取 CSV 文件，只读取分组与价格列，并在每批内先剔除不会参与统计的行
+    df = ingest.read_listings(
+        listings_path,
+        columns=GROUP_COLUMNS + ['price'],
+        clean=_drop_unused_price_rows,
+    )
+    return render_price_chart(df, output_path)
+
+
+def render_price_chart(listings: pd.DataFrame, output_path: Optional[str] = DEFAULT_OUTPUT_PATH) -> pd.DataFrame:
+    """
+    由已读取的原始 listings（至少包含 GROUP_COLUMNS 与 price）生成价格分布图并渲染到 output_path，返回价格中位数表。
+    """
+    grouped_df = grouped_price_medians(clean_listing_prices(_drop_unused_price_rows(listings)))
 
     # 渲染图表到 HTML 文件
-    bar.render(r"D:\\python-learn\\price_analysis.html")
+    if output_path:
+        build_grouped_bar_chart(grouped_df).render(output_path)
+    return grouped_df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成各社区不同房型的价格分布图")
+    parser.add_argument("listings_path", nargs="?", default=DEFAULT_LISTINGS_PATH, help="listings.csv 路径")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT_PATH, help="输出 HTML 路径")
+    args = parser.parse_args()
 
-# 调用函数生成图表
-generate_grouped_bar_chart()
\ No newline at end of file
+    # 调用函数生成图表
+    generate_grouped_bar_chart(args.listings_path, args.output)
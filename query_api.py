@@ -0,0 +1,370 @@
+import os
+import json
+import math
+import argparse
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import map_visualization as mv
+import price_analysis as pa
+import review_analysis as ra
+from instrumentation import get_logger
+from spatial_index import ListingSpatialIndex, build_spatial_index
+
+logger = get_logger(__name__)
+
+# 分页参数：默认每页行数与单页上限；NDJSON 流式输出时每次序列化的行数
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 10_000
+NDJSON_CHUNK_ROWS = 1_000
+
+# 响应格式：format 参数取值 -> MIME 类型
+RESPONSE_FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+# 最近邻查询的默认 / 最大返回数
+DEFAULT_NEAREST_K = 10
+MAX_NEAREST_K = 1_000
+
+
+class ListingStore:
+    """
+    查询服务持有的一份常驻数据：房源数据及其筛选索引、经纬度索引与价格聚合立方体。
+
+    每次请求先检查数据文件版本，文件变化后由首个发现变化的请求在锁内同步重新加载并整体替换（期间其他需要新数据的请求等待），
+    已经取得旧快照的请求继续使用旧的快照。
+    增量刷新只改变修补文件时，不重新读取数据文件，而是在保留的修补前数据上合并修补，并修补价格立方体。
+    """
+
+    def __init__(self, data_path: str):
+        self.data_path = data_path
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Dict[str, object]] = None
+        self._base: Optional[Dict[str, object]] = None
+
+    def _load_base(self, base_version: str) -> Dict[str, object]:
+        # 数据文件本身（不含修补）的数据与价格立方体，数据文件不变时在多次刷新之间复用
+        if self._base is None or self._base['version'] != base_version:
+            df = mv.load_cleaned_clustered_listings(self.data_path, apply_delta=False)
+            self._base = {'version': base_version, 'df': df, 'price_cube': pa.build_price_cube(df)}
+        return self._base
+
+    def _build(self, version: str) -> Dict[str, object]:
+        base_version = mv.base_dataset_version(version)
+        base = self._load_base(base_version)
+        delta = None
+        if base_version != version:
+            delta = mv.read_listings_delta(self.data_path, mv.DASHBOARD_COLUMNS)
+        if delta is None:
+            df, price_cube = base['df'], base['price_cube']
+        else:
+            refreshed = mv.apply_listings_delta(base['df'], delta)
+            df, price_cube = refreshed.df, pa.patch_price_cube(base['price_cube'], refreshed.df, refreshed.touched)
+        logger.info("加载数据 rows=%d version=%s", len(df), version)
+        return {
+            'version': version,
+            'df': df,
+            'filter_index': mv.build_filter_index(df),
+            'spatial_index': build_spatial_index(df),
+            'price_cube': price_cube,
+        }
+
+    def snapshot(self) -> Dict[str, object]:
+        """
+        返回当前数据快照（必要时加载），同一时刻只有一个线程执行加载。
+        """
+        version = mv.dataset_version(self.data_path)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot['version'] == version:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or self._snapshot['version'] != version:
+                self._snapshot = self._build(version)
+            return self._snapshot
+
+
+def _bad_request(message: str) -> HTTPException:
+    return HTTPException(status_code=400, detail=message)
+
+
+def _int_param(request: Request, name: str, default: int, minimum: int = 0, maximum: Optional[int] = None) -> int:
+    raw = request.query_params.get(name)
+    if raw is None or raw == '':
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise _bad_request(f"参数 {name} 必须是整数")
+    if value < minimum or (maximum is not None and value > maximum):
+        raise _bad_request(f"参数 {name} 超出范围")
+    return value
+
+
+def _float_param(request: Request, name: str, required: bool = False) -> Optional[float]:
+    raw = request.query_params.get(name)
+    if raw is None or raw == '':
+        if required:
+            raise _bad_request(f"缺少参数 {name}")
+        return None
+    try:
+        value = float(raw)
+    except ValueError:
+        raise _bad_request(f"参数 {name} 必须是数值")
+    if not math.isfinite(value):
+        raise _bad_request(f"参数 {name} 必须是有限数值")
+    return value
+
+
+def _filter_params(request: Request) -> Tuple[str, str, Optional[Tuple[float, float]], str]:
+    """
+    解析与应用相同的筛选条件：neighborhood、room_type、cluster_type（缺省为“全部”）与 price_min / price_max。
+    """
+    params = request.query_params
+    price_min = _float_param(request, 'price_min')
+    price_max = _float_param(request, 'price_max')
+    price_range = None
+    if price_min is not None or price_max is not None:
+        price_range = (price_min if price_min is not None else -np.inf, price_max if price_max is not None else np.inf)
+    return (
+        params.get('neighborhood', '全部'),
+        params.get('room_type', '全部'),
+        price_range,
+        params.get('cluster_type', '全部'),
+    )
+
+
+def _columns_param(request: Request, df: pd.DataFrame) -> Optional[List[str]]:
+    raw = request.query_params.get('columns')
+    if not raw:
+        return None
+    columns = [col.strip() for col in raw.split(',') if col.strip()]
+    unknown = [col for col in columns if col not in df.columns]
+    if unknown:
+        raise _bad_request(f"未知的列: {', '.join(unknown)}")
+    return columns
+
+
+def _format_param(request: Request) -> str:
+    fmt = request.query_params.get('format', 'json')
+    if fmt not in RESPONSE_FORMATS:
+        raise _bad_request(f"不支持的格式: {fmt}（可选 {', '.join(RESPONSE_FORMATS)}）")
+    if fmt == 'arrow' and mv.pa is None:
+        raise _bad_request("Arrow 格式需要安装 pyarrow")
+    return fmt
+
+
+def _iter_ndjson(frame: pd.DataFrame) -> Iterator[bytes]:
+    for start in range(0, len(frame), NDJSON_CHUNK_ROWS):
+        chunk = frame.iloc[start:start + NDJSON_CHUNK_ROWS]
+        lines = chunk.to_json(orient='records', lines=True, force_ascii=False, date_format='iso')
+        yield (lines if lines.endswith('\n') else lines + '\n').encode('utf-8')
+
+
+def _arrow_bytes(frame: pd.DataFrame) -> bytes:
+    table = mv.pa.Table.from_pandas(frame, preserve_index=False)
+    sink = mv.pa.BufferOutputStream()
+    with mv.pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _frame_response(frame: pd.DataFrame, fmt: str, meta: Dict[str, object]) -> Response:
+    """
+    按格式返回数据表：json 为 {元信息..., "rows": [...]}；ndjson / arrow 只含数据行，元信息放在 X-* 响应头中。
+    """
+    if fmt == 'json':
+        records = frame.to_json(orient='records', force_ascii=False, date_format='iso')
+        # 数据行由 pandas 直接序列化为 JSON 文本，再拼入外层对象，避免逐行转成 Python 对象
+        head = json.dumps(meta, ensure_ascii=False)[:-1]
+        body = f'{head}, "rows": {records}}}' if meta else f'{{"rows": {records}}}'
+        return Response(body, media_type=RESPONSE_FORMATS[fmt])
+
+    headers = {f"X-{key.replace('_', '-').title()}": str(value) for key, value in meta.items()}
+    if fmt == 'ndjson':
+        return StreamingResponse(_iter_ndjson(frame), media_type=RESPONSE_FORMATS[fmt], headers=headers)
+    return Response(_arrow_bytes(frame), media_type=RESPONSE_FORMATS[fmt], headers=headers)
+
+
+async def health(request: Request) -> Response:
+    snapshot = await run_in_threadpool(request.app.state.store.snapshot)
+    return JSONResponse({'status': 'ok', 'rows': len(snapshot['df']), 'version': snapshot['version']})
+
+
+async def listings(request: Request) -> Response:
+    """
+    GET /listings：按筛选条件返回房源，支持 offset / limit 分页与 columns 列选择。
+    """
+    snapshot = await run_in_threadpool(request.app.state.store.snapshot)
+    df = snapshot['df']
+    neighborhood, room_type, price_range, cluster_type = _filter_params(request)
+    columns = _columns_param(request, df)
+    offset = _int_param(request, 'offset', 0)
+    limit = _int_param(request, 'limit', DEFAULT_PAGE_SIZE, minimum=1, maximum=MAX_PAGE_SIZE)
+    fmt = _format_param(request)
+
+    def query() -> Tuple[pd.DataFrame, int]:
+        filtered = mv.filter_listings(
+            df, neighborhood, room_type, price_range, cluster_type, index=snapshot['filter_index']
+        )
+        page = filtered.iloc[offset:offset + limit]
+        return (page[columns] if columns else page), len(filtered)
+
+    page, total = await run_in_threadpool(query)
+    return _frame_response(page, fmt, {'total': total, 'offset': offset, 'limit': limit})
+
+
+async def aggregate(request: Request) -> Response:
+    """
+    GET /aggregate：由价格聚合立方体返回 index × columns 的统计表（与价格页面相同的清洗与统计）。
+    """
+    snapshot = await run_in_threadpool(request.app.state.store.snapshot)
+    cube: pa.PriceCube = snapshot['price_cube']
+    params = request.query_params
+    index = params.get('index', 'neighbourhood')
+    columns = params.get('columns', 'room_type')
+    statistic = params.get('statistic', 'median')
+    fmt = _format_param(request)
+    for name, dim in (('index', index), ('columns', columns)):
+        if dim not in cube.dimensions:
+            raise _bad_request(f"参数 {name} 必须是 {', '.join(cube.dimensions)} 之一")
+    if index == columns:
+        raise _bad_request("index 与 columns 不能相同")
+    if statistic not in pa.STATISTIC_LABELS:
+        raise _bad_request(f"不支持的统计量: {statistic}")
+    where = {dim: params[dim] for dim in cube.dimensions if dim in params}
+
+    table = await run_in_threadpool(cube.table, index, columns, statistic, where)
+    if fmt == 'json':
+        values = table.astype(object).where(table.notna(), None).to_numpy().tolist()
+        return JSONResponse({
+            'index': [str(label) for label in table.index],
+            'columns': [str(label) for label in table.columns],
+            'statistic': statistic,
+            'values': values,
+        })
+    # 列式格式返回长表：index, columns, value
+    long_table = table.rename_axis(columns=None).reset_index().melt(id_vars=index, var_name=columns, value_name='value')
+    long_table[[index, columns]] = long_table[[index, columns]].astype(str)
+    return _frame_response(long_table, fmt, {'statistic': statistic})
+
+
+async def nearest(request: Request) -> Response:
+    """
+    GET /nearest：返回距 (lat, lng) 最近的 k 个房源，或 radius（米）范围内的房源（按距离排序，支持 offset / limit 分页），
+    可叠加筛选条件。
+    """
+    snapshot = await run_in_threadpool(request.app.state.store.snapshot)
+    df = snapshot['df']
+    lat = _float_param(request, 'lat', required=True)
+    lng = _float_param(request, 'lng', required=True)
+    radius = _float_param(request, 'radius')
+    if radius is not None and radius < 0:
+        raise _bad_request("参数 radius 超出范围")
+    k = _int_param(request, 'k', DEFAULT_NEAREST_K, minimum=1, maximum=MAX_NEAREST_K)
+    offset = _int_param(request, 'offset', 0)
+    limit = _int_param(request, 'limit', DEFAULT_PAGE_SIZE, minimum=1, maximum=MAX_PAGE_SIZE)
+    neighborhood, room_type, price_range, cluster_type = _filter_params(request)
+    columns = _columns_param(request, df)
+    fmt = _format_param(request)
+
+    def query() -> Tuple[pd.DataFrame, int]:
+        index: mv.ListingFilterIndex = snapshot['filter_index']
+        spatial: ListingSpatialIndex = snapshot['spatial_index']
+        positions = index.positions(neighborhood, room_type, price_range, cluster_type)
+        if radius is not None:
+            rows, distances = spatial.within_radius(lat, lng, radius, positions=positions)
+            total = len(rows)
+            rows, distances = rows[offset:offset + limit], distances[offset:offset + limit]
+        else:
+            rows, distances = spatial.nearest(lat, lng, k=k, positions=positions)
+            total = len(rows)
+        result = df.iloc[rows]
+        if columns:
+            result = result[columns]
+        return result.assign(distance_m=np.round(distances, 1)), total
+
+    result, total = await run_in_threadpool(query)
+    meta = {'total': total}
+    if radius is not None:
+        meta.update(offset=offset, limit=limit)
+    return _frame_response(result, fmt, meta)
+
+
+async def review_stats(request: Request) -> Response:
+    """
+    GET /reviews：按筛选条件计算各社区的平均价格、平均评分与综合指数（与评价分析页面相同）。
+    """
+    snapshot = await run_in_threadpool(request.app.state.store.snapshot)
+    df = snapshot['df']
+    neighborhood, room_type, price_range, cluster_type = _filter_params(request)
+    min_reviews = _int_param(request, 'min_reviews', ra.MIN_REVIEWS)
+    price_weight = _float_param(request, 'price_weight')
+    rating_weight = _float_param(request, 'rating_weight')
+    fmt = _format_param(request)
+
+    def query() -> pd.DataFrame:
+        filtered = mv.filter_listings(
+            df, neighborhood, room_type, price_range, cluster_type, index=snapshot['filter_index']
+        )
+        frame = ra.prepare_review_frame(filtered, min_reviews)
+        if frame.empty:
+            return pd.DataFrame()
+        return ra.community_review_stats(
+            frame,
+            ra.PRICE_WEIGHT if price_weight is None else price_weight,
+            ra.RATING_WEIGHT if rating_weight is None else rating_weight,
+        )
+
+    try:
+        stats = await run_in_threadpool(query)
+    except ValueError as e:
+        raise _bad_request(str(e))
+    if len(stats):
+        stats['社区名'] = stats['社区名'].astype(str)
+    return _frame_response(stats, fmt, {'total': len(stats)})
+
+
+async def _http_error(request: Request, exc: HTTPException) -> Response:
+    return JSONResponse({'error': exc.detail}, status_code=exc.status_code)
+
+
+def create_app(data_path: Optional[str] = None) -> Starlette:
+    """
+    创建查询服务（ASGI 应用）。数据在首次请求时加载，之后常驻内存并在数据文件变化时自动重新加载。
+    """
+    app = Starlette(
+        routes=[
+            Route('/health', health),
+            Route('/listings', listings),
+            Route('/aggregate', aggregate),
+            Route('/nearest', nearest),
+            Route('/reviews', review_stats),
+        ],
+        exception_handlers={HTTPException: _http_error},
+    )
+    app.state.store = ListingStore(data_path or os.environ.get('AIRBNB_DATA_PATH') or mv.DEFAULT_DATA_PATH)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="房源数据查询服务（HTTP/JSON）")
+    parser.add_argument("--data", default=mv.DEFAULT_DATA_PATH, help="清洗并聚类后的数据文件")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8000, help="监听端口")
+    args = parser.parse_args()
+
+    import uvicorn  # 仅直接运行服务时需要
+
+    uvicorn.run(create_app(args.data), host=args.host, port=args.port)
@@ -0,0 +1,342 @@
+import os
+import json
+import argparse
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # 未安装 pyarrow 时退回完整刷新
+    pa = None
+    pq = None
+
+import clustering
+import dataset_summary
+import ingest
+import map_visualization as mv
+from instrumentation import get_logger
+
+logger = get_logger(__name__)
+
+# 房源的唯一键，比较新旧快照时忽略的派生列，以及数据文件各行内容哈希的索引文件后缀（与数据文件同目录）
+LISTING_KEY = mv.LISTING_KEY
+DERIVED_COLUMNS = ['cluster_label', 'cluster_type']
+HASH_INDEX_SUFFIX = ".hashes.parquet"
+
+
+class SnapshotDiff:
+    """
+    新旧快照按房源 id 比较的结果：新增、删除与内容变化的 id。
+    """
+
+    def __init__(self, added: np.ndarray, removed: np.ndarray, changed: np.ndarray, unchanged: int):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+        self.unchanged = unchanged
+
+    def __bool__(self) -> bool:
+        return bool(len(self.added) or len(self.removed) or len(self.changed))
+
+    def summary(self) -> str:
+        return (f"新增 {len(self.added)} 条，删除 {len(self.removed)} 条，"
+                f"变化 {len(self.changed)} 条，未变化 {self.unchanged} 条")
+
+
+def _column_kind(dtype) -> str:
+    """
+    列在比较时的统一表示：datetime、float32、numeric 或 text。
+    """
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'datetime'
+    if dtype == np.float32:
+        # 紧凑存储为 float32 的列按 float32 精度比较，否则新快照中的 float64 值会全部被判为变化
+        return 'float32'
+    if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+        return 'numeric'
+    return 'text'
+
+
+def _normalized(values: pd.Series, kind: str) -> pd.Series:
+    """
+    将一列转换为 kind 对应的统一表示，避免仅因读取方式不同（类别 / 对象 / 数值精度）而误判为变化。
+    """
+    if kind == 'datetime':
+        return pd.to_datetime(values, errors='coerce').astype('datetime64[ns]').astype('int64')
+    if kind == 'float32':
+        return pd.to_numeric(values, errors='coerce').astype('float32').astype('float64')
+    if kind == 'numeric':
+        return pd.to_numeric(values, errors='coerce').astype('float64').round(9)
+    return values.astype(object).where(values.notna(), None).map(lambda x: '' if x is None else str(x))
+
+
+def _row_hashes(df: pd.DataFrame, kinds: Dict[str, str], key: str = LISTING_KEY) -> pd.Series:
+    """
+    按 kinds 中的列（列名 -> 统一表示）计算各行的内容哈希，返回以 key 为索引的 uint64 序列。
+    """
+    normalized = pd.DataFrame({col: _normalized(df[col], kind) for col, kind in kinds.items()}, index=df.index)
+    hashes = pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+    return pd.Series(hashes, index=pd.Index(df[key]))
+
+
+def _diff_hashes(stored: pd.Series, snapshot: pd.Series) -> SnapshotDiff:
+    """
+    比较两组以 id 为索引的行哈希。
+    """
+    added = snapshot.index.difference(stored.index).to_numpy()
+    removed = stored.index.difference(snapshot.index).to_numpy()
+
+    common = snapshot.index.intersection(stored.index)
+    changed = common.to_numpy()[stored.loc[common].to_numpy() != snapshot.loc[common].to_numpy()]
+    return SnapshotDiff(added, removed, changed, len(common) - len(changed))
+
+
+def _compared_kinds(stored: pd.DataFrame, key: str = LISTING_KEY) -> Dict[str, str]:
+    return {col: _column_kind(stored[col].dtype) for col in stored.columns if col not in DERIVED_COLUMNS + [key]}
+
+
+def diff_snapshots(
+        stored: pd.DataFrame,
+        snapshot: pd.DataFrame,
+        key: str = LISTING_KEY,
+        columns: Optional[Sequence[str]] = None,
+) -> SnapshotDiff:
+    """
+    按 key 比较已存储的数据与新快照；columns 为参与比较的列，默认取两者共有的非派生列。
+    """
+    kinds = _compared_kinds(stored, key)
+    if columns is None:
+        columns = [col for col in kinds if col in snapshot.columns]
+    kinds = {col: kinds[col] for col in columns}
+    return _diff_hashes(_row_hashes(stored, kinds, key), _row_hashes(snapshot, kinds, key))
+
+
+def clean_listing_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    与清洗脚本相同的逐行清洗：删除没有价格的行与包含网址的行。
+    """
+    df = df.dropna(subset=['price'])
+    df, _ = ingest.drop_url_rows(df)
+    return df
+
+
+def _reprocess(snapshot: pd.DataFrame, ids: np.ndarray, model: clustering.ClusterModel, key: str) -> pd.DataFrame:
+    candidates = snapshot[snapshot[key].isin(ids)]
+    processed = clustering.assign_cluster(clean_listing_rows(candidates), model)
+    return processed.dropna(subset=['cluster_type'])
+
+
+def refresh_listings(
+        stored: pd.DataFrame,
+        snapshot: pd.DataFrame,
+        model: clustering.ClusterModel,
+        key: str = LISTING_KEY,
+) -> Tuple[pd.DataFrame, SnapshotDiff]:
+    """
+    以增量方式把新快照合并进已存储的数据集，返回 (更新后的数据, 差异)。
+
+    只对新增与变化的行重新清洗并用已保存的聚类模型分配类别，未变化的行原样保留且顺序不变，
+    新增行追加在末尾。
+    注意：清洗时被剔除的房源不会进入数据集，因此每次刷新都会被当作新增行重新检查一次。
+    """
+    diff = diff_snapshots(stored, snapshot, key)
+    processed = _reprocess(snapshot, np.concatenate([diff.added, diff.changed]), model, key)
+    dropped = pd.Index(diff.changed).difference(pd.Index(processed[key]))  # 变化后被清洗剔除的行
+    refreshed, _ = mv.merge_listing_rows(stored, processed, pd.Index(diff.removed).append(dropped), key)
+    return refreshed, diff
+
+
+def hash_index_path(data_path: str) -> str:
+    """
+    返回数据文件各行内容哈希的索引文件路径。
+    """
+    root, _ = os.path.splitext(data_path)
+    return root + HASH_INDEX_SUFFIX
+
+
+def _read_hash_index(data_path: str) -> Optional[Tuple[pd.Series, Dict[str, str]]]:
+    path = hash_index_path(data_path)
+    if pq is None or not os.path.exists(path):
+        return None
+    try:
+        metadata = pq.read_schema(path).metadata or {}
+        if not mv.source_stamp_matches(metadata, data_path):
+            return None
+        table = pq.read_table(path).to_pandas()
+        kinds = json.loads(metadata[b"column_kinds"])
+    except Exception as e:
+        logger.warning("读取行哈希索引时出错，将重新计算: %s", e)
+        return None
+    return pd.Series(table['row_hash'].to_numpy(), index=pd.Index(table[LISTING_KEY])), kinds
+
+
+def _write_hash_index(hashes: pd.Series, kinds: Dict[str, str], data_path: str) -> None:
+    table = pa.table({LISTING_KEY: hashes.index.to_numpy(), 'row_hash': hashes.to_numpy()})
+    metadata = mv.source_stamp_metadata(data_path)
+    metadata[b"column_kinds"] = json.dumps(kinds).encode()
+    path = hash_index_path(data_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table.replace_schema_metadata(metadata), tmp_path)
+    os.replace(tmp_path, path)
+
+
+def base_row_hashes(data_path: str) -> Tuple[pd.Series, Dict[str, str]]:
+    """
+    返回数据文件本身（不含修补）各行的内容哈希（以 id 为索引）与参与比较的列（列名 -> 统一表示）。
+
+    首次调用时读取数据文件计算并保存为索引文件，数据文件不变时之后的刷新直接读取索引。
+    """
+    cached = _read_hash_index(data_path)
+    if cached is not None:
+        return cached
+    base = mv.load_cleaned_clustered_listings(data_path, columns=None, apply_delta=False)
+    kinds = _compared_kinds(base)
+    hashes = _row_hashes(base, kinds)
+    _write_hash_index(hashes, kinds, data_path)
+    return hashes, kinds
+
+
+def _empty_delta(data_path: str) -> mv.ListingsDelta:
+    # 尚无修补时，以数据文件缓存的列与类型构造一个空修补
+    cache_path = mv.listings_cache_path(data_path)
+    if not os.path.exists(cache_path):
+        mv.load_cleaned_clustered_listings(data_path, columns=[LISTING_KEY], apply_delta=False)
+    empty = mv.apply_listing_schema(pq.read_schema(cache_path).empty_table().to_pandas())
+    return mv.ListingsDelta(empty, np.empty(0, dtype=empty[LISTING_KEY].dtype))
+
+
+def _current_rows(data_path: str, delta: mv.ListingsDelta, ids: np.ndarray, columns: Sequence[str]) -> pd.DataFrame:
+    """
+    返回 ids 对应的当前行（修补中的行优先，其余从数据文件缓存中只读取 columns 列）。
+    """
+    in_delta = delta.upserts[LISTING_KEY].isin(ids)
+    base_ids = pd.Index(ids).difference(pd.Index(delta.upserts[LISTING_KEY]))
+    base = mv.load_cleaned_clustered_listings(data_path, columns=[LISTING_KEY, *columns], apply_delta=False)
+    return pd.concat([base[base[LISTING_KEY].isin(base_ids)], delta.upserts.loc[in_delta, base.columns]],
+                     ignore_index=True)
+
+
+def _update_summary(data_path: str, delta: mv.ListingsDelta, stale: np.ndarray, processed: pd.DataFrame) -> None:
+    """
+    在旧概要上减去被替换或删除的行、加上新处理的行（delta 为本次刷新之前的修补）；
+    旧概要不可用时按合并修补后的数据重新计算。须在写出新修补之后调用。
+    """
+    summary = dataset_summary.read_summary(data_path)
+    if summary is not None:
+        columns = [col for col in ('price', summary['rating_column']) if col]
+        summary = dataset_summary.patch_summary(summary, _current_rows(data_path, delta, stale, columns), processed)
+    if summary is None:
+        columns = ['price', *dataset_summary.RATING_COLUMNS]
+        summary = dataset_summary.compute_summary(mv.load_cleaned_clustered_listings(data_path, columns=columns))
+    dataset_summary.write_summary(summary, data_path)
+
+
+def refresh_data_file(
+        snapshot_path: str,
+        data_path: str = mv.DEFAULT_DATA_PATH,
+        model_path: str = clustering.DEFAULT_MODEL_PATH,
+        sheet_name: Optional[str] = None,
+) -> SnapshotDiff:
+    """
+    用新快照增量更新清洗并聚类后的数据：与数据文件各行的内容哈希（保存在索引文件中）及已有修补比较，
+    只对新增与变化的行重新清洗和分配类别，结果累积写入修补文件（<数据文件>.delta.parquet）。
+    数据文件与列式缓存保持不变，写出量与变化量成正比；应用加载时合并修补，
+    并在修补前的热力图网格与价格立方体上只修补受影响的部分。
+    修补累积较多时运行 python refresh.py --compact 合并回数据文件。
+    """
+    snapshot = ingest.read_listings(snapshot_path, columns=None, sheet_name=sheet_name, compact=False)
+    model = clustering.load_cluster_model(model_path)
+    if pq is None:
+        return _full_refresh(snapshot, data_path, model)
+
+    base_hashes, kinds = base_row_hashes(data_path)
+    missing = [col for col in kinds if col not in snapshot.columns]
+    if missing:
+        logger.warning("快照缺少列 %s，改为完整刷新", missing)
+        return _full_refresh(snapshot, data_path, model)
+
+    # 当前各行的哈希 = 数据文件的哈希去掉修补中删除或替换的 id，再加上修补中各行的哈希
+    delta = mv.read_listings_delta(data_path, with_hashes=True)
+    if delta is None:
+        delta, delta_hashes = _empty_delta(data_path), pd.Series([], dtype=np.uint64)
+    else:
+        delta_hashes = pd.Series(delta.upserts[mv.DELTA_HASH_COLUMN].to_numpy(), index=pd.Index(delta.upserts[LISTING_KEY]))
+        delta = mv.ListingsDelta(delta.upserts.drop(columns=mv.DELTA_HASH_COLUMN), delta.removed)
+    current = pd.concat([
+        base_hashes.drop(pd.Index(delta.removed).append(delta_hashes.index), errors='ignore'),
+        delta_hashes,
+    ])
+
+    snapshot_hashes = _row_hashes(snapshot, kinds)
+    diff = _diff_hashes(current, snapshot_hashes)
+    print(diff.summary())
+    if not diff:
+        return diff
+
+    processed = _reprocess(snapshot, np.concatenate([diff.added, diff.changed]), model, LISTING_KEY)
+    processed_ids = pd.Index(processed[LISTING_KEY])
+    stale = np.concatenate([diff.removed, diff.changed])
+
+    # 修补中的行按与 refresh_listings 相同的规则合并；数据文件中被删除的 id 记入 removed，
+    # 此前已删除、本次重新加入的 id 仍保留在 removed 中，加载时追加在末尾而不是回到原位置
+    dropped = pd.Index(stale).difference(processed_ids)
+    upserts, _ = mv.merge_listing_rows(delta.upserts, processed, dropped)
+    removed = pd.Index(delta.removed).union(dropped.intersection(base_hashes.index))
+    hashes = pd.concat([
+        delta_hashes.drop(pd.Index(stale).append(processed_ids), errors='ignore'),
+        snapshot_hashes.loc[processed_ids],
+    ])
+    mv.write_listings_delta(
+        mv.ListingsDelta(upserts, removed.to_numpy()), data_path,
+        hashes=hashes.reindex(pd.Index(upserts[LISTING_KEY])).to_numpy(),
+    )
+    _update_summary(data_path, delta, stale, processed)
+    return diff
+
+
+def _write_data_file(df: pd.DataFrame, data_path: str) -> None:
+    # 整体重写数据文件与列式缓存，旧的修补与行哈希索引随之失效，一并删除
+    df.to_excel(data_path, index=False)
+    mv.write_listings_cache(df, data_path)
+    for path in (mv.listings_delta_path(data_path), hash_index_path(data_path)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _full_refresh(snapshot: pd.DataFrame, data_path: str, model: clustering.ClusterModel) -> SnapshotDiff:
+    stored = mv.load_cleaned_clustered_listings(data_path, columns=None)
+    refreshed, diff = refresh_listings(stored, snapshot, model)
+    print(diff.summary())
+    if diff:
+        _write_data_file(refreshed, data_path)
+    return diff
+
+
+def compact_data_file(data_path: str = mv.DEFAULT_DATA_PATH) -> None:
+    """
+    把累积的修补合并回数据文件：整体重写数据文件与列式缓存并删除修补文件（耗时与数据量成正比，适合在空闲时执行）。
+    """
+    if mv.read_listings_delta(data_path, columns=[]) is None:
+        print("没有需要合并的修补")
+        return
+    _write_data_file(mv.load_cleaned_clustered_listings(data_path, columns=None), data_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="用新的 Inside Airbnb 快照增量更新房源数据")
+    parser.add_argument("snapshot_path", nargs='?', help="新快照文件（listings.csv / listings.xlsx）")
+    parser.add_argument("--data", default=mv.DEFAULT_DATA_PATH, help="清洗并聚类后的数据文件")
+    parser.add_argument("--model", default=clustering.DEFAULT_MODEL_PATH, help="聚类模型文件")
+    parser.add_argument("--sheet", default=None, help="Excel 快照的工作表名称")
+    parser.add_argument("--compact", action='store_true', help="把累积的修补合并回数据文件（可与快照一起使用，先刷新再合并）")
+    args = parser.parse_args()
+    if args.snapshot_path is None and not args.compact:
+        parser.error("需要指定快照文件或 --compact")
+
+    if args.snapshot_path is not None:
+        refresh_data_file(args.snapshot_path, args.data, args.model, args.sheet)
+    if args.compact:
+        compact_data_file(args.data)
@@ -1,142 +1,262 @@
+import os
+import argparse
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
 import pandas as pd
 import folium
 from sklearn.preprocessing import MinMaxScaler
 
-# 步骤 1：数据准备
-# 读取 CSV 文件
-df = pd.read_csv(r"D:\Users\Lyx\Desktop\listings.csv")
-
-# 提取核心字段
-df = df[['neighbourhood_group_cleansed', 'latitude', 'longitude', 'price', 'review_scores_rating', 'number_of_reviews']]
-df.columns = ['社区名', '纬度', '经度', '价格', '评分', '评价数']
-
-# 转换价格列的数据类型，去除 $ 符号并转换为数值
-df['价格'] = df['价格'].str.replace('$', '').str.replace(',', '').astype(float)
-
-# 筛除空值和异常值
-df = df.dropna()
-
-# 保留评价数大于等于 5 条的社区
-df = df[df['评价数'] >= 5]
-
-# 步骤 2：指标计算
-# 按社区分组，求平均价格和平均评分
-community_stats = df.groupby('社区名').agg({'价格': 'mean', '评分': 'mean', '评价数': 'first'}).reset_index()
-
-# 价格反向归一化（低价→高值）
-scaler = MinMaxScaler()
-community_stats['价格归一化'] = 1 - scaler.fit_transform(community_stats[['价格']])
-
-# 评分正向归一化
-community_stats['评分归一化'] = scaler.fit_transform(community_stats[['评分']])
-
-# 计算综合指数
-community_stats['综合指数'] = 0.5 * community_stats['价格归一化'] + 0.5 * community_stats['评分归一化']
-
-# 合并经纬度信息
-community_stats = pd.merge(community_stats, df[['社区名', '纬度', '经度']], on='社区名', how='left').drop_duplicates()
-
-# 步骤 3：选工具与底图
-# 创建地图对象
-m = folium.Map(location=[df['纬度'].mean(), df['经度'].mean()], zoom_start=11, tiles='OpenStreetMap')
-
-# 定义颜色映射函数
-def price_color(price):
-    if price <= 100:
-        return 'crimson'
-    elif 101 <= price <= 300:
-        return 'lightcoral'
-    else:
-        return 'pink'
-
-def rating_color(rating):
-    if rating > 4.8:
-        return 'darkorange'
-    elif 4.3 <= rating <= 4.7:
-        return 'orange'
-    else:
-        return 'palegoldenrod'
-
-def composite_color(index):
-    if index > 0.8:
-        return 'darkviolet'
-    elif 0.6 <= index <= 0.79:
-        return 'purple'
-    else:
-        return 'plum'
-
-# 步骤 4：颜色配置
-# 添加价格维度的图层
-price_layer = folium.FeatureGroup(name='价格维度')
-for _, row in community_stats.iterrows():
-    folium.CircleMarker(
-        location=[row['纬度'], row['经度']],
-        radius=5,
-        popup=f"社区名: {row['社区名']}<br>均价: {row['价格']:.2f}<br>评分: {row['评分']:.2f}<br>综合指数: {row['综合指数']:.2f}<br>评价数: {row['评价数']}",
-        color=price_color(row['价格']),
-        fill=True,
-        fill_color=price_color(row['价格']),
-        fill_opacity=0.7
-    ).add_to(price_layer)
-m.add_child(price_layer)
-
-# 添加评分维度的图层
-rating_layer = folium.FeatureGroup(name='评分维度')
-for _, row in community_stats.iterrows():
-    folium.CircleMarker(
-        location=[row['纬度'], row['经度']],
-        radius=5,
-        popup=f"社区名: {row['社区名']}<br>均价: {row['价格']:.2f}<br>评分: {row['评分']:.2f}<br>综合指数: {row['综合指数']:.2f}<br>评价数: {row['评价数']}",
-        color=rating_color(row['评分']),
-        fill=True,
-        fill_color=rating_color(row['评分']),
-        fill_opacity=0.7
-    ).add_to(rating_layer)
-m.add_child(rating_layer)
-
-# 添加综合维度的图层
-composite_layer = folium.FeatureGroup(name='综合维度')
-for _, row in community_stats.iterrows():
-    folium.CircleMarker(
-        location=[row['纬度'], row['经度']],
-        radius=5,
-        popup=f"社区名: {row['社区名']}<br>均价: {row['价格']:.2f}<br>评分: {row['评分']:.2f}<br>综合指数: {row['综合指数']:.2f}<br>评价数: {row['评价数']}",
-        color=composite_color(row['综合指数']),
-        fill=True,
-        fill_color=composite_color(row['综合指数']),
-        fill_opacity=0.7
-    ).add_to(composite_layer)
-m.add_child(composite_layer)
-
-# 步骤 5：加交互与标注
-# 添加图层切换控件
-folium.LayerControl().add_to(m)
-
-# 添加图例
-legend_html = '''
-<div style="position: fixed; 
-     bottom: 100px; right: 10px; width: 150px; height: 180px; 
-     border:2px solid grey; z-index:9999; font-size:14px;
-     background-color:white;
-     ">&nbsp; 价格维度<br>
-     &nbsp; 低价（≤100）：<i style="background:crimson;opacity:0.7;">&nbsp;&nbsp;&nbsp;&nbsp;</i><br>
-     &nbsp; 中价（101 - 300）：<i style="background:lightcoral;opacity:0.7;">&nbsp;&nbsp;&nbsp;&nbsp;</i><br>
-     &nbsp; 高价（301+）：<i style="background:pink;opacity:0.7;">&nbsp;&nbsp;&nbsp;&nbsp;</i><br><br>
-     &nbsp; 评分维度<br>
-     &nbsp; 极高分（4.8+）：<i style="background:darkorange;opacity:0.7;">&nbsp;&nbsp;&nbsp;&nbsp;</i><br>
-     &nbsp; 高分（4.3 - 4.7）：<i style="background:orange;opacity:0.7;">&nbsp;&nbsp;&nbsp;&nbsp;</i><br>
-     &nbsp; 低分（≤3.5）：<i style="background:palegoldenrod;opacity:0.7;">&nbsp;&nbsp;&nbsp;&nbsp;</i><br><br>
-     &nbsp; 综合维度<br>
-     &nbsp; 最优（0.8+）：<i style="background:darkviolet;opacity:0.7;">&nbsp;&nbsp;&nbsp;&nbsp;</i><br>
-     &nbsp; 优质（0.6 - 0.79）：<i style="background:purple;opacity:0.7;">&nbsp;&nbsp;&nbsp;&nbsp;</i><br>
-     &nbsp; 待优化（<0.4）：<i style="background:plum;opacity:0.7;">&nbsp;&nbsp;&nbsp;&nbsp;</i><br><br>
-     &nbsp; 数据说明：评价数≥5 条
-</div>
-'''
-m.get_root().html.add_child(folium.Element(legend_html))
-
-# 步骤 6：校验优化（手动核对）
-# 这里无法自动随机检查 3-5 个社区，需要手动查看地图进行确认
-
-# 保存地图为 HTML 文件
-m.save('D:\\python-learn\\review_analysis.html')
\ No newline at end of file
+import ingest
+
+# 默认输入（Inside Airbnb 原始 listings.csv）与输出路径（与本文件同目录）
+DEFAULT_LISTINGS_PATH = os.path.join(os.path.dirname(__file__), "listings.csv")
+DEFAULT_OUTPUT_PATH = os.path.join(os.path.dirname(__file__), "review_analysis.html")
+
+# 社区列的候选列名（原始数据为 neighbourhood_group_cleansed，清洗并聚类后的数据为 neighbourhood），以及其余核心字段
+COMMUNITY_COLUMNS = ['neighbourhood_group_cleansed', 'neighbourhood']
+VALUE_COLUMNS = ['latitude', 'longitude', 'price', 'review_scores_rating', 'number_of_reviews']
+FIELD_NAMES = ['社区名', '纬度', '经度', '价格', '评分', '评价数']
+
+# 默认参数：房源最少评价数，综合指数中价格与评分的权重
+MIN_REVIEWS = 5
+PRICE_WEIGHT = 0.5
+RATING_WEIGHT = 0.5
+
+# 按输入哈希缓存的地图 HTML 数量（进程内共享）
+REVIEW_CACHE_SIZE = 32
+
+_review_cache: "OrderedDict[Tuple, str]" = OrderedDict()
+_review_cache_lock = threading.Lock()
+
+
+# 定义颜色映射函数（按列整体计算，区间划分与图例一致）
+def price_color(price: pd.Series) -> np.ndarray:
+    return np.select([price <= 100, (price >= 101) & (price <= 300)], ['crimson', 'lightcoral'], 'pink')
+
+def rating_color(rating: pd.Series) -> np.ndarray:
+    return np.select([rating > 4.8, (rating >= 4.3) & (rating <= 4.7)], ['darkorange', 'orange'], 'palegoldenrod')
+
+def composite_color(index: pd.Series) -> np.ndarray:
+    return np.select([index > 0.8, (index >= 0.6) & (index <= 0.79)], ['darkviolet', 'purple'], 'plum')
+
+
+def _community_column(listings: pd.DataFrame) -> str:
+    column = next((col for col in COMMUNITY_COLUMNS if col in listings.columns), None)
+    if column is None:
+        raise KeyError(f"数据中缺少社区列（{' / '.join(COMMUNITY_COLUMNS)}）")
+    return column
+
+
+def prepare_review_frame(listings: pd.DataFrame, min_reviews: int = MIN_REVIEWS) -> pd.DataFrame:
+    """
+    提取核心字段并改为中文列名，筛除空值以及评价数少于 min_reviews 的房源。
+
+    listings 可以是原始 listings（neighbourhood_group_cleansed）或清洗并聚类后的数据（neighbourhood）。
+    """
+    df = listings[[_community_column(listings)] + VALUE_COLUMNS]
+    df.columns = FIELD_NAMES
+
+    # 筛除空值和异常值
+    df = df.dropna()
+
+    # 保留评价数大于等于 min_reviews 条的房源
+    return df[df['评价数'] >= min_reviews]
+
+
+def community_review_stats(
+        df: pd.DataFrame,
+        price_weight: float = PRICE_WEIGHT,
+        rating_weight: float = RATING_WEIGHT,
+) -> pd.DataFrame:
+    """
+    按社区计算平均价格、平均评分、综合指数与中心点（社区内房源经纬度的均值），每个社区一行。
+
+    综合指数 = 价格权重 × 价格反向归一化 + 评分权重 × 评分归一化，权重会先归一化为和为 1，使指数保持在 [0, 1]。
+    """
+    total_weight = price_weight + rating_weight
+    if total_weight <= 0:
+        raise ValueError("价格与评分的权重之和必须大于 0")
+
+    # 按社区分组，求平均价格和平均评分
+    grouped = df.groupby('社区名', observed=True)
+    community_stats = grouped.agg({'价格': 'mean', '评分': 'mean', '评价数': 'first'}).reset_index()
+
+    # 价格反向归一化（低价→高值）
+    scaler = MinMaxScaler()
+    community_stats['价格归一化'] = 1 - scaler.fit_transform(community_stats[['价格']])
+
+    # 评分正向归一化
+    community_stats['评分归一化'] = scaler.fit_transform(community_stats[['评分']])
+
+    # 计算综合指数
+    community_stats['综合指数'] = (
+        price_weight * community_stats['价格归一化'] + rating_weight * community_stats['评分归一化']
+    ) / total_weight
+
+    # 每个社区只取一个中心点，而不是为每条房源各画一个点
+    centroids = grouped[['纬度', '经度']].mean().reset_index()
+    return community_stats.merge(centroids, on='社区名', how='left')
+
+
+def build_review_map(
+        community_stats: pd.DataFrame,
+        center: Sequence[float],
+        min_reviews: int = MIN_REVIEWS,
+) -> folium.Map:
+    """
+    生成价格、评分、综合三个维度的社区地图（每个维度一个可切换的 GeoJSON 图层）。
+    """
+    # 创建地图对象
+    m = folium.Map(location=list(center), zoom_start=11, tiles='OpenStreetMap')
+
+    # 所有社区点放在同一个 GeoJSON 数据中，弹窗内容与三个维度的颜色都作为要素属性一次性算好
+    popup_fields = {
+        '社区名': community_stats['社区名'].astype(str),
+        '均价': community_stats['价格'].map('{:.2f}'.format),
+        '评分': community_stats['评分'].map('{:.2f}'.format),
+        '综合指数': community_stats['综合指数'].map('{:.2f}'.format),
+        '评价数': community_stats['评价数'].astype(str),
+    }
+    layer_colors = {
+        '价格维度': price_color(community_stats['价格']),
+        '评分维度': rating_color(community_stats['评分']),
+        '综合维度': composite_color(community_stats['综合指数']),
+    }
+    properties = pd.DataFrame({**popup_fields, **layer_colors}).to_dict('records')
+    features = {
+        'type': 'FeatureCollection',
+        'features': [
+            {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [lng, lat]}, 'properties': props}
+            for lng, lat, props in zip(community_stats['经度'].tolist(), community_stats['纬度'].tolist(), properties)
+        ],
+    }
+
+    # 每个维度一个 GeoJSON 图层，颜色由要素属性决定
+    for layer_name in layer_colors:
+        folium.GeoJson(
+            features,
+            name=layer_name,
+            marker=folium.CircleMarker(radius=5, fill=True, fill_opacity=0.7),
+            style_function=lambda feature, key=layer_name: {
+                'color': feature['properties'][key],
+                'fillColor': feature['properties'][key],
+                'fillOpacity': 0.7,
+            },
+            popup=folium.GeoJsonPopup(fields=list(popup_fields), aliases=[f'{name}:' for name in popup_fields]),
+        ).add_to(m)
+
+    # 添加图层切换控件
+    folium.LayerControl().add_to(m)
+
+    # 添加图例
+    legend_html = f'''
+    <div style="position: fixed;
+         bottom: 100px; right: 10px; width: 150px; height: 180px;
+         border:2px solid grey; z-index:9999; font-size:14px;
+         background-color:white;
+         ">&nbsp; 价格维度<br>
+         &nbsp; 低价（≤100）：<i style="background:crimson;opacity:0.7;">&nbsp;&nbsp;&nbsp;&nbsp;</i><br>
+         &nbsp; 中价（101 - 300）：<i style="background:lightcoral;opacity:0.7;">&nbsp;&nbsp;&nbsp;&nbsp;</i><br>
+         &nbsp; 高价（301+）：<i style="background:pink;opacity:0.7;">&nbsp;&nbsp;&nbsp;&nbsp;</i><br><br>
+         &nbsp; 评分维度<br>
+         &nbsp; 极高分（4.8+）：<i style="background:darkorange;opacity:0.7;">&nbsp;&nbsp;&nbsp;&nbsp;</i><br>
+         &nbsp; 高分（4.3 - 4.7）：<i style="background:orange;opacity:0.7;">&nbsp;&nbsp;&nbsp;&nbsp;</i><br>
+         &nbsp; 低分（≤3.5）：<i style="background:palegoldenrod;opacity:0.7;">&nbsp;&nbsp;&nbsp;&nbsp;</i><br><br>
+         &nbsp; 综合维度<br>
+         &nbsp; 最优（0.8+）：<i style="background:darkviolet;opacity:0.7;">&nbsp;&nbsp;&nbsp;&nbsp;</i><br>
+         &nbsp; 优质（0.6 - 0.79）：<i style="background:purple;opacity:0.7;">&nbsp;&nbsp;&nbsp;&nbsp;</i><br>
+         &nbsp; 待优化（<0.4）：<i style="background:plum;opacity:0.7;">&nbsp;&nbsp;&nbsp;&nbsp;</i><br><br>
+         &nbsp; 数据说明：评价数≥{min_reviews} 条
+    </div>
+    '''
+    m.get_root().html.add_child(folium.Element(legend_html))
+    return m
+
+
+def _frame_digest(listings: pd.DataFrame) -> str:
+    """
+    返回参与计算的各列内容的哈希，作为缓存键的一部分。
+    """
+    columns = [_community_column(listings)] + VALUE_COLUMNS
+    row_hashes = pd.util.hash_pandas_object(listings[columns], index=False).to_numpy()
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()
+
+
+def build_review_map_html(
+        listings: pd.DataFrame,
+        min_reviews: int = MIN_REVIEWS,
+        price_weight: float = PRICE_WEIGHT,
+        rating_weight: float = RATING_WEIGHT,
+) -> str:
+    """
+    由房源数据生成评价分析地图的 HTML。
+
+    结果按（数据内容哈希, 参数）缓存在进程内，相同的筛选结果与参数再次请求时直接返回，
+    应用可以针对当前筛选条件实时生成综合指数地图。没有满足条件的房源时抛出 ValueError。
+    """
+    key = (_frame_digest(listings), int(min_reviews), float(price_weight), float(rating_weight))
+    with _review_cache_lock:
+        if key in _review_cache:
+            _review_cache.move_to_end(key)
+            return _review_cache[key]
+
+    df = prepare_review_frame(listings, min_reviews)
+    if df.empty:
+        raise ValueError(f"没有评价数不少于 {min_reviews} 条的房源")
+    community_stats = community_review_stats(df, price_weight, rating_weight)
+    html = build_review_map(community_stats, (df['纬度'].mean(), df['经度'].mean()), min_reviews).get_root().render()
+
+    with _review_cache_lock:
+        _review_cache[key] = html
+        while len(_review_cache) > REVIEW_CACHE_SIZE:
+            _review_cache.popitem(last=False)
+    return html
+
+
+def generate_review_map(
+        listings_path: str = DEFAULT_LISTINGS_PATH,
+        output_path: str = DEFAULT_OUTPUT_PATH,
+        min_reviews: int = MIN_REVIEWS,
+        price_weight: float = PRICE_WEIGHT,
+        rating_weight: float = RATING_WEIGHT,
+) -> pd.DataFrame:
+    """
+    读取 listings.csv，生成评价分析地图并保存到 output_path，返回各社区的统计结果。
+    """
+    # 分批读取 CSV 文件，只读取核心字段（价格在读取时已去除 $ 与千分位并转换为数值）
+    listings = ingest.read_listings(listings_path, columns=COMMUNITY_COLUMNS[:1] + VALUE_COLUMNS)
+    return render_review_map(listings, output_path, min_reviews, price_weight, rating_weight)
+
+
+def render_review_map(
+        listings: pd.DataFrame,
+        output_path: str = DEFAULT_OUTPUT_PATH,
+        min_reviews: int = MIN_REVIEWS,
+        price_weight: float = PRICE_WEIGHT,
+        rating_weight: float = RATING_WEIGHT,
+) -> pd.DataFrame:
+    """
+    由已读取的房源数据生成评价分析地图并保存到 output_path，返回各社区的统计结果。
+    """
+    df = prepare_review_frame(listings, min_reviews)
+    community_stats = community_review_stats(df, price_weight, rating_weight)
+
+    # 保存地图为 HTML 文件
+    build_review_map(community_stats, (df['纬度'].mean(), df['经度'].mean()), min_reviews).save(output_path)
+    return community_stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成各社区价格、评分与综合指数地图")
+    parser.add_argument("listings_path", nargs="?", default=DEFAULT_LISTINGS_PATH, help="listings.csv 路径")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT_PATH, help="输出 HTML 路径")
+    parser.add_argument("--min-reviews", type=int, default=MIN_REVIEWS, help="房源最少评价数")
+    parser.add_argument("--price-weight", type=float, default=PRICE_WEIGHT, help="综合指数中价格的权重")
+    parser.add_argument("--rating-weight", type=float, default=RATING_WEIGHT, help="综合指数中评分的权重")
+    args = parser.parse_args()
+
+    generate_review_map(args.listings_path, args.output, args.min_reviews, args.price_weight, args.rating_weight)
@@ -0,0 +1,174 @@
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 网格边长（米）以及逐圈搜索的最大圈数，超过后直接在候选行中全量计算距离
+GRID_CELL_METERS = 250.0
+MAX_SEARCH_RINGS = 16
+
+# 每度纬度 / 赤道处每度经度对应的米数（等距矩形近似，城市尺度内误差可忽略）
+METERS_PER_DEGREE_LAT = 110_540.0
+METERS_PER_DEGREE_LNG = 111_320.0
+
+
+class ListingSpatialIndex:
+    """
+    房源经纬度网格索引：加载数据时构建一次，用于回答地图点击的最近邻 / 半径查询。
+
+    坐标投影到以数据平均纬度为基准的平面（米），按 GRID_CELL_METERS 划分网格，
+    行按网格编号排序存储，查询时从点击位置所在网格逐圈向外搜索。
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.n_rows = len(df)
+        lat = pd.to_numeric(df['latitude'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        lng = pd.to_numeric(df['longitude'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        self.valid = ~np.isnan(lat) & ~np.isnan(lng)
+
+        ref_lat = float(np.mean(lat[self.valid])) if self.valid.any() else 0.0
+        self._lng_scale = METERS_PER_DEGREE_LNG * np.cos(np.radians(ref_lat))
+        self.x = np.where(self.valid, lng, 0.0) * self._lng_scale
+        self.y = np.where(self.valid, lat, 0.0) * METERS_PER_DEGREE_LAT
+
+        # 按网格编号排序后的行位置，以及每个非空网格在其中的起止位置
+        cell_x = np.floor(self.x / GRID_CELL_METERS).astype(np.int64)
+        cell_y = np.floor(self.y / GRID_CELL_METERS).astype(np.int64)
+        rows = np.flatnonzero(self.valid)
+        keys = self._cell_key(cell_x[rows], cell_y[rows])
+        order = np.argsort(keys, kind='stable')
+        self.sorted_rows = rows[order]
+        self.cell_keys, self.cell_starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+        self.cell_ends = self.cell_starts + counts
+
+    @staticmethod
+    def _cell_key(cell_x: np.ndarray, cell_y: np.ndarray) -> np.ndarray:
+        return cell_x * 10_000_019 + cell_y
+
+    def _project(self, lat: float, lng: float) -> Tuple[float, float]:
+        return lng * self._lng_scale, lat * METERS_PER_DEGREE_LAT
+
+    def _ring_rows(self, center_x: int, center_y: int, ring: int) -> np.ndarray:
+        """
+        返回与中心网格切比雪夫距离恰为 ring 的所有网格中的行位置。
+        """
+        if ring == 0:
+            dx = np.array([0])
+            dy = np.array([0])
+        else:
+            side = np.arange(-ring, ring + 1)
+            inner = side[1:-1]
+            dx = np.concatenate([side, side, np.full(len(inner), -ring), np.full(len(inner), ring)])
+            dy = np.concatenate([np.full(len(side), -ring), np.full(len(side), ring), inner, inner])
+
+        keys = self._cell_key(center_x + dx, center_y + dy)
+        slots = np.searchsorted(self.cell_keys, keys)
+        in_range = slots < len(self.cell_keys)
+        slots, keys = slots[in_range], keys[in_range]
+        slots = slots[self.cell_keys[slots] == keys]
+        if len(slots) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.sorted_rows[a:b] for a, b in zip(self.cell_starts[slots], self.cell_ends[slots])])
+
+    @staticmethod
+    def _sorted_positions(positions: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """
+        将 positions 整理为升序无重复的数组（筛选索引给出的位置通常已有序，此时不复制），
+        之后只对候选行做二分查找，不再为每次查询分配与数据等长的掩码。
+        """
+        if positions is None:
+            return None
+        positions = np.asarray(positions, dtype=np.int64)
+        if len(positions) > 1 and not np.all(positions[1:] > positions[:-1]):
+            positions = np.unique(positions)
+        return positions
+
+    @staticmethod
+    def _keep_allowed(rows: np.ndarray, allowed: Optional[np.ndarray]) -> np.ndarray:
+        if allowed is None or len(rows) == 0:
+            return rows
+        if len(allowed) == 0:
+            return rows[:0]
+        slots = np.minimum(np.searchsorted(allowed, rows), len(allowed) - 1)
+        return rows[allowed[slots] == rows]
+
+    def _valid_rows(self, allowed: Optional[np.ndarray]) -> np.ndarray:
+        return np.flatnonzero(self.valid) if allowed is None else allowed[self.valid[allowed]]
+
+    def _distances(self, rows: np.ndarray, x: float, y: float) -> np.ndarray:
+        return np.hypot(self.x[rows] - x, self.y[rows] - y)
+
+    def nearest(
+            self,
+            lat: float,
+            lng: float,
+            k: int = 10,
+            positions: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        返回距离 (lat, lng) 最近的 k 个房源：(行位置数组, 距离数组（米）)，按距离升序。
+
+        positions 为当前筛选结果在完整数据中的行位置，只在这些行中查找；为空时查找全部房源。
+        """
+        x, y = self._project(lat, lng)
+        center_x = int(np.floor(x / GRID_CELL_METERS))
+        center_y = int(np.floor(y / GRID_CELL_METERS))
+        allowed = self._sorted_positions(positions)
+
+        found = []
+        for ring in range(MAX_SEARCH_RINGS + 1):
+            found.append(self._keep_allowed(self._ring_rows(center_x, center_y, ring), allowed))
+            candidates = np.concatenate(found)
+            if len(candidates) >= k:
+                distances = self._distances(candidates, x, y)
+                kth = np.partition(distances, k - 1)[k - 1]
+                # 第 ring 圈之外的房源距离点击位置至少 ring 个网格边长
+                if kth <= ring * GRID_CELL_METERS:
+                    return self._top_k(candidates, distances, k)
+
+        # 附近太稀疏：直接在全部候选行中计算距离
+        candidates = self._valid_rows(allowed)
+        return self._top_k(candidates, self._distances(candidates, x, y), k)
+
+    @staticmethod
+    def _top_k(rows: np.ndarray, distances: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if len(rows) > k:
+            keep = np.argpartition(distances, k - 1)[:k]
+            rows, distances = rows[keep], distances[keep]
+        order = np.argsort(distances, kind='stable')
+        return rows[order], distances[order]
+
+    def within_radius(
+            self,
+            lat: float,
+            lng: float,
+            radius_m: float,
+            positions: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        返回距离 (lat, lng) 不超过 radius_m 米的全部房源：(行位置数组, 距离数组（米）)，按距离升序。
+        """
+        x, y = self._project(lat, lng)
+        center_x = int(np.floor(x / GRID_CELL_METERS))
+        center_y = int(np.floor(y / GRID_CELL_METERS))
+        allowed = self._sorted_positions(positions)
+
+        rings = int(np.ceil(radius_m / GRID_CELL_METERS))
+        if rings > MAX_SEARCH_RINGS:
+            rows = self._valid_rows(allowed)
+        else:
+            rows = np.concatenate([self._ring_rows(center_x, center_y, ring) for ring in range(rings + 1)])
+            rows = self._keep_allowed(rows, allowed)
+
+        distances = self._distances(rows, x, y)
+        inside = distances <= radius_m
+        rows, distances = rows[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')
+        return rows[order], distances[order]
+
+
+def build_spatial_index(df: pd.DataFrame) -> ListingSpatialIndex:
+    """
+    为房源数据构建经纬度网格索引（建议在加载数据后调用一次并与数据一起缓存）。
+    """
+    return ListingSpatialIndex(df)
@@ -0,0 +1,64 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import map_visualization as mv
+
+
+def baseline_filter_listings(df, neighborhood="全部", room_type="全部", price_range=(0, 10_000), cluster_type="全部"):
+    # 优化前的实现（去掉调试输出）：逐个条件做布尔掩码
+    filtered = df.copy()
+    neighborhood_col = None
+    for col in ['neighborhood', 'neighbourhood', 'neighbourhood_cleansed']:
+        if col in filtered.columns:
+            neighborhood_col = col
+            break
+    if neighborhood_col and neighborhood and neighborhood != "全部":
+        filtered = filtered[filtered[neighborhood_col] == neighborhood]
+    if room_type and room_type != "全部" and "room_type" in filtered.columns:
+        filtered = filtered[filtered["room_type"] == room_type]
+    if price_range is not None:
+        low, high = price_range
+        filtered = filtered[(filtered["price"] >= low) & (filtered["price"] <= high)]
+    if cluster_type and cluster_type != "全部" and "cluster_type" in filtered.columns:
+        filtered = filtered[filtered["cluster_type"] == cluster_type]
+    filtered = filtered.dropna(subset=["latitude", "longitude"]).copy()
+    return filtered
+
+
+@pytest.fixture(scope='module')
+def listings():
+    rng = np.random.default_rng(0)
+    n = 500
+    df = pd.DataFrame({
+        'id': np.arange(n),
+        'neighbourhood': rng.choice(['Brooklyn', 'Manhattan', 'Queens', None], n),
+        'room_type': rng.choice(['Entire home/apt', 'Private room', 'Shared room'], n),
+        'price': np.round(rng.uniform(0, 1000, n), 2),
+        'cluster_type': rng.choice(['经济型', '中档型', '高档型'], n),
+        'latitude': rng.uniform(40.5, 40.9, n),
+        'longitude': rng.uniform(-74.2, -73.7, n),
+    })
+    df.loc[rng.choice(n, 30, replace=False), 'price'] = np.nan
+    df.loc[rng.choice(n, 30, replace=False), 'latitude'] = np.nan
+    df.loc[[0, 1], 'price'] = [100.0, 200.0]  # 区间端点上的值
+    return mv.apply_listing_schema(df)
+
+
+PRICE_RANGES = [(0, 10_000), (100, 200), (250.5, 250.5), (900, 100), None]
+
+
+def test_indexed_filter_matches_baseline(listings):
+    index = mv.build_filter_index(listings)
+    for neighborhood, room_type, price_range, cluster_type in itertools.product(
+            ["全部", "Brooklyn", "Queens", "不存在"],
+            ["全部", "Private room"],
+            PRICE_RANGES,
+            ["全部", "高档型"],
+    ):
+        expected = baseline_filter_listings(listings, neighborhood, room_type, price_range, cluster_type)
+        for idx in (index, None):
+            got = mv.filter_listings(listings, neighborhood, room_type, price_range, cluster_type, index=idx)
+            pd.testing.assert_frame_equal(got, expected)
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import price_analysis as pa
+
+
+def baseline_grouped_prices(df):
+    # 优化前 generate_grouped_bar_chart 的清洗与逐组修正（去掉读取文件与绘图部分）
+    df = df[df['room_type'] != 'Hotel room']
+    df['price'] = df['price'].str.replace(r'[^\d.]', '', regex=True)
+    df['price'] = pd.to_numeric(df['price'], errors='coerce')
+    df['price'] = df['price'].fillna(0)
+    df['price'] = df['price'].replace([float('inf'), float('-inf')], 0)
+    df = df[df['price'] <= 800]
+    df.loc[(df['neighbourhood_cleansed'] == 'Todt Hill') & (df['room_type'] == 'Entire room/apt'), 'price'] = 0
+
+    grouped = df.groupby(['neighbourhood_cleansed', 'room_type'])['price'].agg(['mean', 'std']).reset_index()
+    grouped['mean'] = grouped['mean'].round(2)
+    grouped['std'] = grouped['std'].round(2)
+    for index, row in grouped.iterrows():
+        condition = (df['neighbourhood_cleansed'] == row['neighbourhood_cleansed']) & (
+            df['room_type'] == row['room_type']) & (df['price'] > row['mean'] + 3 * row['std'])
+        df.loc[condition, 'price'] = row['mean']
+
+    final_df = df[['neighbourhood_cleansed', 'room_type', 'price']]
+    return final_df, final_df.groupby(['neighbourhood_cleansed', 'room_type'])['price'].median().unstack()
+
+
+@pytest.fixture
+def raw_listings():
+    rng = np.random.default_rng(2)
+    n = 2000
+    prices = rng.lognormal(4.8, 0.6, n)
+    prices[rng.choice(n, 40, replace=False)] = 750  # 组内异常值
+    text = [f"${value:,.2f}" for value in prices]
+    for i in rng.choice(n, 20, replace=False):
+        text[i] = 'N/A'  # 无法解析，按 0 处理
+    return pd.DataFrame({
+        'neighbourhood_cleansed': rng.choice(['Todt Hill', 'Harlem', 'Astoria', 'Chelsea', 'Solo'], n,
+                                             p=[0.1, 0.4, 0.3, 0.199, 0.001]),
+        'room_type': rng.choice(['Entire room/apt', 'Private room', 'Hotel room'], n, p=[0.5, 0.45, 0.05]),
+        'price': text,
+    })
+
+
+def test_vectorized_clamp_matches_baseline(raw_listings):
+    expected_rows, expected_medians = baseline_grouped_prices(raw_listings.copy())
+    cleaned = pa.clean_listing_prices(raw_listings.copy())
+    pd.testing.assert_frame_equal(cleaned, expected_rows)
+    pd.testing.assert_frame_equal(pa.grouped_price_medians(cleaned), expected_medians)
+
+
+def test_chunked_path_matches_baseline(raw_listings, tmp_path):
+    # 分批读取（价格在读取时解析、批内预过滤）后的结果与一次读入的优化前实现一致
+    path = tmp_path / "listings.csv"
+    raw_listings.to_csv(path, index=False)
+    _, expected_medians = baseline_grouped_prices(pd.read_csv(path))
+    medians = pa.generate_grouped_bar_chart(listings_path=str(path), output_path=None)
+    # 分批读取得到的是类别列，只比较标签与数值
+    plain = medians.set_axis(medians.index.astype(str), axis=0).set_axis(medians.columns.astype(str), axis=1)
+    pd.testing.assert_frame_equal(plain, expected_medians, check_index_type=False, check_column_type=False, check_names=False)
@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import clustering
+import dataset_summary
+import map_visualization as mv
+import price_analysis as pa
+import refresh
+
+NEIGHBOURHOODS = ['Brooklyn', 'Manhattan', 'Queens']
+ROOM_TYPES = ['Entire home/apt', 'Private room']
+
+
+def raw_listings(n, seed, start_id=1_000):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'id': np.arange(start_id, start_id + n, dtype=np.int64),
+        'name': [f"listing {i}" for i in range(n)],
+        'neighbourhood': rng.choice(NEIGHBOURHOODS, n),
+        'latitude': rng.uniform(40.55, 40.85, n),
+        'longitude': rng.uniform(-74.1, -73.8, n),
+        'room_type': rng.choice(ROOM_TYPES, n),
+        'accommodates': rng.integers(1, 8, n),
+        'price': np.round(rng.uniform(40, 700, n), 2),
+        'review_scores_rating': np.round(rng.uniform(3, 5, n), 2),
+        'reviews_per_month': np.round(rng.uniform(0, 4, n), 2),
+        'last_review': pd.to_datetime('2024-01-01') + pd.to_timedelta(rng.integers(0, 300, n), unit='D'),
+    })
+    return df
+
+
+def mutate(snapshot, seed):
+    """
+    在快照上做一次“下一期快照”式的修改：改价、删除、新增、出现含网址的文本，以及一个新社区。
+    """
+    rng = np.random.default_rng(seed)
+    snapshot = snapshot.copy()
+    picked = rng.choice(snapshot.index[10:], 12, replace=False)
+    snapshot.loc[picked[:6], 'price'] += 5
+    snapshot.loc[picked[6], 'name'] = 'now at http://example.org'
+    snapshot = snapshot.drop(index=picked[7:])
+    added = raw_listings(4, seed, start_id=100_000 * seed)
+    added.loc[0, 'neighbourhood'] = f"New {seed}"
+    return pd.concat([snapshot, added], ignore_index=True)
+
+
+def naive_diff(stored, snapshot, columns):
+    # 参照实现：按 id 对齐后逐个单元格比较（缺失值相等、数值按 float32 精度比较、日期按时间比较）
+    old, new = stored.set_index('id'), snapshot.set_index('id')
+    added = sorted(set(new.index) - set(old.index))
+    removed = sorted(set(old.index) - set(new.index))
+
+    def same(a, b):
+        if pd.isna(a) and pd.isna(b):
+            return True
+        if isinstance(a, (int, float, np.number)) and isinstance(b, (int, float, np.number)):
+            return np.float32(a) == np.float32(b)
+        if isinstance(a, pd.Timestamp) or isinstance(b, pd.Timestamp):
+            return pd.Timestamp(a) == pd.Timestamp(b)
+        return str(a) == str(b)
+
+    changed = sorted(
+        key for key in set(old.index) & set(new.index)
+        if not all(same(old.at[key, col], new.at[key, col]) for col in columns)
+    )
+    return added, removed, changed
+
+
+def full_reprocess(snapshot, model):
+    # 优化前的做法：整份快照重新清洗并分配类别
+    cleaned = clustering.assign_cluster(refresh.clean_listing_rows(snapshot), model)
+    return cleaned.dropna(subset=['cluster_type'])
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    raw = raw_listings(300, seed=0)
+    raw.loc[3, 'price'] = np.nan
+    raw.loc[4, 'name'] = 'see https://example.com'
+    model, _ = clustering.fit_cluster_model(refresh.clean_listing_rows(raw))
+    model_path = str(tmp_path / "model.json")
+    model.save(model_path)
+    data_path = str(tmp_path / "data.xlsx")
+    full_reprocess(raw, model).to_excel(data_path, index=False)
+    return raw, model, model_path, data_path
+
+
+def _snapshot_file(tmp_path, snapshot, name):
+    path = tmp_path / name
+    snapshot.to_csv(path, index=False)
+    return str(path), refresh.ingest.read_listings(str(path), columns=None, compact=False)
+
+
+def _sorted(df):
+    return df.sort_values('id').reset_index(drop=True)
+
+
+def test_diff_matches_cell_by_cell_comparison(workspace, tmp_path):
+    raw, model, _, data_path = workspace
+    stored = mv.load_cleaned_clustered_listings(data_path, columns=None)
+    _, snapshot = _snapshot_file(tmp_path, mutate(raw, 1), "s1.csv")
+
+    diff = refresh.diff_snapshots(stored, snapshot)
+    columns = [col for col in stored.columns if col in snapshot.columns and col not in refresh.DERIVED_COLUMNS + ['id']]
+    added, removed, changed = naive_diff(stored, snapshot, columns)
+    assert sorted(diff.added) == added
+    assert sorted(diff.removed) == removed
+    assert sorted(diff.changed) == changed
+    assert len(changed) >= 6  # 改价的行都被识别为变化
+
+
+def test_refresh_matches_full_reprocess(workspace, tmp_path):
+    raw, model, _, data_path = workspace
+    stored = mv.load_cleaned_clustered_listings(data_path, columns=None)
+    _, snapshot = _snapshot_file(tmp_path, mutate(raw, 1), "s1.csv")
+
+    refreshed, _ = refresh.refresh_listings(stored, snapshot, model)
+    expected = full_reprocess(snapshot, model)[refreshed.columns]
+    # 快照从 CSV 读入，日期仍是文本；已存储的数据中为日期类型
+    expected['last_review'] = pd.to_datetime(expected['last_review'])
+    pd.testing.assert_frame_equal(_sorted(refreshed), _sorted(expected), check_dtype=False, check_categorical=False)
+
+
+def test_delta_refresh_matches_in_memory_refresh(workspace, tmp_path):
+    raw, model, model_path, data_path = workspace
+    stored = mv.load_cleaned_clustered_listings(data_path, columns=None)
+    base_bins = mv.build_heatmap_bins(mv.load_cleaned_clustered_listings(data_path))
+    base_cube = pa.build_price_cube(mv.load_cleaned_clustered_listings(data_path))
+
+    # 连续两次刷新：第二次修改第一次新增的行，并重新加入此前删除的房源
+    path_1, snapshot_1 = _snapshot_file(tmp_path, mutate(raw, 1), "s1.csv")
+    expected, _ = refresh.refresh_listings(stored, snapshot_1, model)
+    refresh.refresh_data_file(path_1, data_path, model_path)
+    pd.testing.assert_frame_equal(mv.load_cleaned_clustered_listings(data_path, columns=None), expected,
+                                  check_dtype=False, check_categorical=False)
+
+    snapshot_2 = mutate(snapshot_1, 2)
+    snapshot_2.loc[snapshot_2['id'] >= 100_000, 'price'] += 1
+    snapshot_2 = pd.concat([snapshot_2, raw[~raw['id'].isin(snapshot_1['id'])].iloc[:1]], ignore_index=True)
+    path_2, snapshot_2 = _snapshot_file(tmp_path, snapshot_2, "s2.csv")
+    expected, _ = refresh.refresh_listings(expected, snapshot_2, model)
+    refresh.refresh_data_file(path_2, data_path, model_path)
+    merged = mv.load_cleaned_clustered_listings(data_path, columns=None)
+    pd.testing.assert_frame_equal(merged, expected, check_dtype=False, check_categorical=False)
+
+    # 数据文件与列式缓存不变，修补写在单独的文件中
+    assert refresh.base_row_hashes(data_path)[0].index.equals(pd.Index(stored['id']))
+    summary = dataset_summary.read_summary(data_path)
+    for key, value in dataset_summary.compute_summary(expected).items():
+        assert summary[key] == pytest.approx(value)
+
+    # 在修补前的网格与价格立方体上修补，结果与按合并后的数据重新构建一致
+    base = mv.load_cleaned_clustered_listings(data_path, apply_delta=False)
+    refreshed = mv.apply_listings_delta(base, mv.read_listings_delta(data_path, mv.DASHBOARD_COLUMNS))
+    dashboard = mv.load_cleaned_clustered_listings(data_path)
+    pd.testing.assert_frame_equal(refreshed.df, dashboard)
+
+    patched_bins, rebuilt_bins = base_bins.patched(refreshed.df, refreshed.source_positions), mv.build_heatmap_bins(dashboard)
+    for zoom, (codes, n_cells) in rebuilt_bins.cell_codes.items():
+        np.testing.assert_array_equal(patched_bins.cell_codes[zoom][0], codes)
+        assert patched_bins.cell_codes[zoom][1] == n_cells
+
+    patched_cube = pa.patch_price_cube(base_cube, refreshed.df, refreshed.touched)
+    rebuilt_cube = pa.build_price_cube(dashboard)
+    assert patched_cube.categories == rebuilt_cube.categories
+    for name in ('count', 'sum', 'sum_sq', 'outliers', 'histogram'):
+        np.testing.assert_allclose(getattr(patched_cube, name), getattr(rebuilt_cube, name))
+
+    # 合并回数据文件后内容不变，修补文件被删除
+    refresh.compact_data_file(data_path)
+    assert mv.read_listings_delta(data_path) is None
+    pd.testing.assert_frame_equal(mv.load_cleaned_clustered_listings(data_path, columns=None), expected,
+                                  check_dtype=False, check_categorical=False)
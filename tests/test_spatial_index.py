@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from spatial_index import GRID_CELL_METERS, MAX_SEARCH_RINGS, build_spatial_index
+
+
+def brute_force(index, lat, lng, positions=None):
+    # 参照实现：在全部（或筛选后的）有坐标的行上计算与索引相同投影下的距离并排序
+    rows = np.flatnonzero(index.valid)
+    if positions is not None:
+        rows = np.intersect1d(rows, positions)
+    x, y = index._project(lat, lng)
+    distances = np.hypot(index.x[rows] - x, index.y[rows] - y)
+    order = np.argsort(distances, kind='stable')
+    return rows[order], distances[order]
+
+
+@pytest.fixture(scope='module')
+def listings():
+    rng = np.random.default_rng(1)
+    n = 3000
+    # 市区密集、郊区稀疏，外加少量远离其他房源的孤立点与缺失坐标
+    lat = np.concatenate([rng.normal(40.73, 0.02, n - 20), rng.uniform(40.5, 41.0, 20)])
+    lng = np.concatenate([rng.normal(-73.99, 0.02, n - 20), rng.uniform(-74.3, -73.6, 20)])
+    lat[rng.choice(n, 25, replace=False)] = np.nan
+    return pd.DataFrame({'latitude': lat, 'longitude': lng})
+
+
+QUERIES = [(40.73, -73.99), (40.75, -73.95), (40.55, -74.25), (41.2, -73.0)]
+
+
+@pytest.mark.parametrize('lat, lng', QUERIES)
+@pytest.mark.parametrize('k', [1, 10, 200])
+def test_nearest_matches_brute_force(listings, lat, lng, k):
+    index = build_spatial_index(listings)
+    _, expected = brute_force(index, lat, lng)
+    rows, distances = index.nearest(lat, lng, k=k)
+    np.testing.assert_allclose(distances, expected[:k])
+    # 行位置可能因距离并列而顺序不同，但对应的距离必须一致
+    x, y = index._project(lat, lng)
+    np.testing.assert_allclose(np.hypot(index.x[rows] - x, index.y[rows] - y), distances)
+
+
+@pytest.mark.parametrize('lat, lng', QUERIES)
+@pytest.mark.parametrize('radius', [50.0, 400.0, GRID_CELL_METERS * (MAX_SEARCH_RINGS + 2)])
+def test_within_radius_matches_brute_force(listings, lat, lng, radius):
+    index = build_spatial_index(listings)
+    rows, distances = brute_force(index, lat, lng)
+    got_rows, got_distances = index.within_radius(lat, lng, radius)
+    assert set(got_rows) == set(rows[distances <= radius])
+    np.testing.assert_allclose(got_distances, distances[distances <= radius])
+
+
+def test_queries_respect_filtered_positions(listings):
+    index = build_spatial_index(listings)
+    positions = np.flatnonzero(np.arange(len(listings)) % 3 == 0)
+    for lat, lng in QUERIES:
+        rows, distances = brute_force(index, lat, lng, positions)
+        got_rows, got_distances = index.nearest(lat, lng, k=15, positions=positions)
+        assert set(got_rows) <= set(positions)
+        np.testing.assert_allclose(got_distances, distances[:15])
+        got_rows, _ = index.within_radius(lat, lng, 800.0, positions=positions)
+        assert set(got_rows) == set(rows[distances <= 800.0])
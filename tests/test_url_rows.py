@@ -0,0 +1,57 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ingest
+
+
+def baseline_drop_url_rows(df_clean):
+    # 优化前清洗脚本的 2.2 步：逐列逐单元格匹配网址并依次删除
+    url_pattern = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+    for col in df_clean.select_dtypes(include='object').columns:
+        has_url = df_clean[col].apply(lambda x: isinstance(x, str) and bool(url_pattern.search(x)))
+        df_clean = df_clean[~has_url]
+    return df_clean
+
+
+TEXTS = [
+    'Cozy room', 'see https://example.com/a?b=1', 'http://x.io', 'HTTP://upper.case', 'https:/broken',
+    'email me at a@b.com', 'www.no-scheme.com', '', None, np.nan, 'mid http://y.org text', 'https://',
+]
+
+
+@pytest.fixture(params=[0, 1, 2])
+def listings(request):
+    rng = np.random.default_rng(request.param)
+    n = 400
+    frame = {'id': np.arange(n), 'price': rng.uniform(10, 500, n)}
+    # 文本列多于 PARALLEL_MIN_COLUMNS 时走线程池路径，另含数字与文本混合的对象列
+    for i in range(ingest.PARALLEL_MIN_COLUMNS + 1):
+        frame[f'text_{i}'] = pd.Series(rng.choice(np.array(TEXTS, dtype=object), n, p=_weights()), dtype=object)
+    frame['mixed'] = pd.Series([42 if i % 3 else 'https://m.com' if i % 7 == 0 else 'ok' for i in range(n)], dtype=object)
+    return pd.DataFrame(frame)
+
+
+def _weights():
+    weights = np.full(len(TEXTS), 1.0)
+    weights[0] = 60.0  # 大部分单元格不含网址
+    return weights / weights.sum()
+
+
+@pytest.mark.parametrize('max_workers', [1, None])
+def test_vectorized_url_rows_match_baseline(listings, max_workers):
+    expected = baseline_drop_url_rows(listings)
+    got, counts = ingest.drop_url_rows(listings, max_workers=max_workers)
+    pd.testing.assert_frame_equal(got, expected)
+    assert set(counts) == {col for col in listings.columns if listings[col].dtype == object}
+
+
+def test_category_and_string_columns_match_object_columns(listings):
+    # 紧凑读取得到的类别列、Arrow 字符串列与对象列的匹配结果一致
+    expected, _ = ingest.find_url_rows(listings)
+    for dtype in ('category', 'string'):
+        converted = listings.astype({col: dtype for col in listings.columns if col.startswith('text_')})
+        got, _ = ingest.find_url_rows(converted)
+        np.testing.assert_array_equal(got, expected)